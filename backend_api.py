@@ -1,13 +1,24 @@
 from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-import shutil
+import asyncio
+import hashlib
 import os
 import uuid
 import json
-from src.memory import MemorySystem
-from src.strategies.cloud import CloudMatryoshkaStrategy
-from src.strategies.local import PrivateStrategy, OfflineStrategy, get_siglip_embedding
+from src.cache import ResultCache, normalize_context
+from src.concurrency import Overloaded, model_pool, llm_pool, memory_pool, request_gate, pool_stats
+from src.batch import BatchAnalyzer
+from src.memory import MemorySystem, inject_reference, reference_notice
+from src.incident_writer import IncidentWriter, incident_record, PERSIST_INCIDENTS
+from src.image_input import ImageInput, consumers_for_mode, image_stats
+from src.detector import detectors
+from src.llm_cache import llm_cache
+from src.models import registry, WARMUP_MODELS
+from src.qdrant_backend import backend_info, supports_multiple_processes
+from src.strategies.cloud import CloudMatryoshkaStrategy, CLOUD_PROMPT_VERSION
+from src.strategies.local import PrivateStrategy, OfflineStrategy, aget_siglip_embedding, OLLAMA_PROMPT_VERSION
 
 app = FastAPI()
 
@@ -22,84 +33,405 @@ app.add_middleware(
 
 
 print("Initializing Fix-It Felix Backend...")
-memory = MemorySystem(path="qdrant_db")
+memory = MemorySystem()
 strategies = {
     "cloud": CloudMatryoshkaStrategy(),
     "local": PrivateStrategy(),
     "fast": OfflineStrategy()
 }
+result_cache = ResultCache()
+batch_analyzer = BatchAnalyzer(memory)
+incident_writer = IncidentWriter(memory)
+BATCH_MAX_IMAGES = int(os.environ.get("FELIX_BATCH_MAX_IMAGES", 500))
+API_WORKERS = int(os.environ.get("FELIX_API_WORKERS", 1))
 
-@app.post("/analyze")
-async def analyze_endpoint(request: Request):
+@app.on_event("startup")
+def warmup_models():
+    # Models load lazily; FELIX_WARMUP=yolo,siglip,... preloads them in the background.
+    if WARMUP_MODELS:
+        print(f" Warming up: {', '.join(WARMUP_MODELS)}")
+        registry.warmup_async(WARMUP_MODELS)
+
+@app.on_event("startup")
+def start_incident_writer():
+    # Replays incidents journaled before the last shutdown, then writes new ones in the background.
+    if PERSIST_INCIDENTS:
+        incident_writer.start()
+
+@app.on_event("startup")
+def purge_stale_llm_answers():
+    # Cached LLM answers from an older prompt or model are never served; drop them from disk too.
+    llm_cache.invalidate("ollama", keep_version=OLLAMA_PROMPT_VERSION)
+    llm_cache.invalidate("cloud", keep_version=CLOUD_PROMPT_VERSION)
+
+@app.on_event("shutdown")
+def stop_incident_writer():
+    if PERSIST_INCIDENTS:
+        incident_writer.close()
+
+@app.on_event("shutdown")
+def close_cloud_client():
+    if registry.is_loaded("cloud"):
+        registry.get("cloud").close()
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"status": "error", "message": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+def is_cacheable_analysis(result):
+    if not isinstance(result, dict) or result.get("error"):
+        return False
+    try:
+        issues = json.loads(result.get("analysis", "{}")).get("detected_issues")
+    except (TypeError, ValueError, AttributeError):
+        return False
+    # Ollama outage fallbacks must not be served again once the service is back.
+    return issues not in ("Local AI Unavailable", "Connection Error")
+
+def analysis_cache_key(image_input, mode, context, ref_case=None):
+    # The reference notice goes into the prompt: a new or changed reference case is a new analysis.
+    notice = hashlib.sha256(reference_notice(ref_case).encode("utf-8")).hexdigest()[:16]
+    return f"{image_input.digest if image_input else 'none'}:{mode}:{normalize_context(context)}:{notice}"
+
+def reference_key(image_input):
+    # Keyed on the writer's generation: once new incidents land, lookups are redone.
+    return f"{image_input.digest}:{incident_writer.generation}"
+
+def build_knowledge_base(ref_case):
+    return {
+        "found_match": ref_case["score"] > 0.7 if ref_case else False,
+        "confidence_score": ref_case["score"] if ref_case else 0.0,
+        "reference_solution": ref_case["solution"] if ref_case else "No matching historical case found.",
+        "document_ref": ref_case["file_ref"] if ref_case else "N/A"
+    }
+
+def build_response(incident_id, result, ref_case, image_input=None):
+    try:
+        analysis_data = json.loads(result.get("analysis", "{}"))
+    except:
+        analysis_data = {"analysis": result.get("analysis", "No data")}
+
+    return {
+        "incident_id": incident_id,
+        "status": "success",
+        "analysis": {
+            "detected_issues": analysis_data.get("detected_issues", "Unknown"),
+            "severity": analysis_data.get("severity", "Pending"),
+            "problem_description": analysis_data.get("analysis", "Processing completed."),
+            "repair_solution": analysis_data.get("advice", "Review manual."),
+        },
+        "knowledge_base": build_knowledge_base(ref_case),
+        # Decode size/time and cloud payload bytes saved for this upload.
+        "image": dict(image_input.prep) if image_input else None
+    }
+
+def persist_incident(incident_id, mode, visual_vector, detections, result):
+    """Hands the analyzed incident to the write-behind queue; the response never waits on Qdrant."""
+    if not PERSIST_INCIDENTS or not is_cacheable_analysis(result):
+        return
+    try:
+        record = incident_record(incident_id, mode, visual_vector, detections, result)
+        if not record["visual_vector"] and not record["text_vector"]:
+            # SigLIP failed and there is no cloud embedding: nothing real to search it by.
+            print(f" Warning: incident {incident_id} not persisted, no embedding available.")
+            return
+        incident_writer.submit(record)
+    except Exception as e:
+        print(f" Warning: incident {incident_id} not persisted. {e}")
+
+def image_required_result():
+    return {"analysis": json.dumps({"analysis": "Image required for this mode.", "severity": "low"})}
+
+def needs_image(image_input, mode):
+    # Strategies need to handle a missing image; only cloud and local can work from text alone.
+    return not image_input and mode not in ("cloud", "local")
+
+async def read_form(request: Request):
     form = await request.form()
     image = form.get("image")
+    # The upload stays in memory; every stage shares the same decoded copy.
     mode = form.get("mode", "cloud")
-    context = form.get("context", "")
-    incident_id = str(uuid.uuid4())
-    print(f"Received Request: {incident_id} | Mode: {mode}")
+    image_input = None
+    if image:
+        image_input = ImageInput(await image.read(), name=image.filename, consumers=consumers_for_mode(mode))
+    return image_input, mode, form.get("context", "")
 
+async def retrieve_reference(image_input):
+    digest = image_input.digest
+    # 1. Generate Visual Embedding First (for RAG)
+    # Awaited on the loop, not on model_pool: that pool is left to YOLO.
+    visual_vector = await result_cache.get_or_compute(
+        "siglip", digest, lambda: aget_siglip_embedding(image_input),
+        # A failed embedding (None) is retried on the next request, never cached.
+        cacheable=lambda vector: vector is not None
+    )
+    # 2. Retrieve Historical Context (Knowledge Base)
+    ref_case = await result_cache.get_or_compute(
+        "reference", reference_key(image_input), lambda: memory_pool.run(memory.get_reference_case, visual_vector, 3)
+    )
+    return visual_vector, ref_case
 
-    temp_path = None
-    if image:
-        temp_path = f"temp_{incident_id}.jpg"
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+async def detect_objects(engine, mode, image_input):
+    return await result_cache.get_or_compute(
+        "detections", f"{image_input.digest}:{mode}", lambda: model_pool.run(engine.detect, image_input)
+    )
+
+@app.post("/analyze")
+async def analyze_endpoint(request: Request):
+    with request_gate:
+        return await run_analysis(request)
+
+async def run_analysis(request: Request):
+    image_input, mode, context = await read_form(request)
+    incident_id = str(uuid.uuid4())
+    print(f"Received Request: {incident_id} | Mode: {mode}")
 
     try:
         ref_case = None
-        enhanced_context = context
-
-        if temp_path:
-            # 1. Generate Visual Embedding First (for RAG)
-            visual_vector = get_siglip_embedding(temp_path)
-            
-            # 2. Retrieve Historical Context (Knowledge Base)
-            ref_case = memory.get_reference_case(visual_vector, mode=3)
-            
-            if ref_case and ref_case['score'] > 0.75:
-                print(f" RAG Injection: Found {ref_case['file_ref']} ({ref_case['score']:.2f})")
-                enhanced_context += f"\n[SYSTEM NOTICE]: Auto-detected similar historical incident: '{ref_case['problem_type']}'. Proven solution: '{ref_case['solution']}'."
+        visual_vector = None
+        detections = None
+        engine = strategies.get(mode, strategies["cloud"])
+
+        if image_input:
+            if await result_cache.acontains("reference", reference_key(image_input)):
+                # Repeat upload: the reference case (part of the analysis key) is known,
+                # so YOLO only runs when the analysis itself is not cached.
+                visual_vector, ref_case = await retrieve_reference(image_input)
+                if await result_cache.alookup("analysis", analysis_cache_key(image_input, mode, context, ref_case)) is None:
+                    detections = await detect_objects(engine, mode, image_input)
+            else:
+                # SigLIP + Qdrant retrieval and YOLO detection are independent, run them side by side.
+                (visual_vector, ref_case), detections = await asyncio.gather(
+                    retrieve_reference(image_input),
+                    detect_objects(engine, mode, image_input)
+                )
         else:
              print(" No image provided. Skipping Visual RAG.")
+        analysis_key = analysis_cache_key(image_input, mode, context, ref_case)
+        enhanced_context = inject_reference(context, ref_case)
 
         # 3. Process Analysis (with injected context)
-        engine = strategies.get(mode, strategies["cloud"])
-        
-        # Strategies need to handle None path
-        result = engine.process(temp_path, incident_id, user_context=enhanced_context) if temp_path or mode == "cloud" or mode == "local" else {"analysis": json.dumps({"analysis": "Image required for this mode.", "severity": "low"})}
-
-        try:
-            analysis_data = json.loads(result.get("analysis", "{}"))
-        except:
-            analysis_data = {"analysis": result.get("analysis", "No data")}
-
-        # ref_case is already computed above
-
-        response = {
-            "incident_id": incident_id,
-            "status": "success",
-            "analysis": {
-                "detected_issues": analysis_data.get("detected_issues", "Unknown"),
-                "severity": analysis_data.get("severity", "Pending"),
-                "problem_description": analysis_data.get("analysis", "Processing completed."),
-                "repair_solution": analysis_data.get("advice", "Review manual."),
-            },
-            "knowledge_base": {
-                "found_match": ref_case["score"] > 0.7 if ref_case else False,
-                "confidence_score": ref_case["score"] if ref_case else 0.0,
-                "reference_solution": ref_case["solution"] if ref_case else "No matching historical case found.",
-                "document_ref": ref_case["file_ref"] if ref_case else "N/A"
-            }
-        }
-
-        return response
+        if not needs_image(image_input, mode):
+            async def analyze():
+                result = await llm_pool.run(
+                    engine.process, image_input, incident_id,
+                    user_context=enhanced_context, detections=detections, vector=visual_vector
+                )
+                # Only a fresh analysis is a new incident; cache hits and coalesced callers are not.
+                persist_incident(incident_id, mode, visual_vector, detections, result)
+                return result
+
+            result = await result_cache.get_or_compute(
+                "analysis", analysis_key, analyze, cacheable=is_cacheable_analysis
+            )
+        else:
+            result = image_required_result()
+
+        return build_response(incident_id, result, ref_case, image_input)
 
+    except Overloaded:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/analyze/stream")
+async def analyze_stream_endpoint(request: Request):
+    """
+    Server-sent events variant of /analyze. Emits `accepted`, then `detections`
+    and `reference` as each finishes, `token` events while the LLM writes, and
+    finally `analysis` with the same body /analyze returns.
+    """
+    # Overload is still a 503 before the stream opens. The slot itself is taken
+    # inside the generator: one that never starts (client gone) never releases.
+    request_gate.check()
+    image_input, mode, context = await read_form(request)
+    return StreamingResponse(
+        stream_analysis(image_input, mode, context),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_analysis(image_input, mode, context):
+    try:
+        request_gate.acquire()
+    except Overloaded as e:
+        yield sse("error", {"status": "error", "message": str(e)})
+        return
+    incident_id = str(uuid.uuid4())
+    print(f"Received Stream Request: {incident_id} | Mode: {mode}")
+    tasks = {}
+    try:
+        yield sse("accepted", {"incident_id": incident_id, "mode": mode})
+        ref_case = None
+        visual_vector = None
+        detections = None
+        engine = strategies.get(mode, strategies["cloud"])
+        cached_result = None
+        reference_known = False
+
+        if image_input:
+            # As in /analyze: with the reference known, YOLO only runs on an analysis miss.
+            reference_known = await result_cache.acontains("reference", reference_key(image_input))
+            tasks[asyncio.ensure_future(retrieve_reference(image_input))] = "reference"
+            if not reference_known:
+                tasks[asyncio.ensure_future(detect_objects(engine, mode, image_input))] = "detections"
+            waiting = set(tasks)
+            while waiting:
+                done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if tasks[task] == "detections":
+                        detections = task.result()
+                        yield sse("detections", {"detections": sorted(set(detections or []))})
+                    else:
+                        visual_vector, ref_case = task.result()
+                        yield sse("reference", {**build_knowledge_base(ref_case), "case": ref_case})
+                        if reference_known:
+                            cached_result = await result_cache.alookup(
+                                "analysis", analysis_cache_key(image_input, mode, context, ref_case)
+                            )
+                            if cached_result is None:
+                                detection_task = asyncio.ensure_future(detect_objects(engine, mode, image_input))
+                                tasks[detection_task] = "detections"
+                                waiting.add(detection_task)
+        analysis_key = analysis_cache_key(image_input, mode, context, ref_case)
+        if not reference_known:
+            cached_result = await result_cache.alookup("analysis", analysis_key)
+        enhanced_context = inject_reference(context, ref_case)
+
+        if cached_result is not None:
+            result = cached_result
+        elif needs_image(image_input, mode):
+            result = image_required_result()
+        else:
+            result = None
+            async for kind, value in llm_pool.iterate(
+                engine.stream, image_input, incident_id,
+                user_context=enhanced_context, detections=detections, vector=visual_vector
+            ):
+                if kind == "token":
+                    yield sse("token", {"text": value})
+                else:
+                    result = value
+            if is_cacheable_analysis(result):
+                await result_cache.aset("analysis", analysis_key, result)
+            if result is not None:
+                persist_incident(incident_id, mode, visual_vector, detections, result)
+
+        yield sse("analysis", build_response(incident_id, result or {}, ref_case, image_input))
+    except Exception as e:
+        yield sse("error", {"status": "error", "message": str(e)})
+    finally:
+        for task in tasks:
+            task.cancel()
+        request_gate.release()
+
+@app.post("/analyze/batch")
+async def analyze_batch_endpoint(request: Request):
+    """
+    Many images in one request (form field `images`, repeated). Streams one
+    JSON line per image as it finishes, then a summary line with images/sec.
+    """
+    # As in /analyze/stream: checked here, taken and released by the generator.
+    request_gate.check()
+    form = await request.form()
+    uploads = [f for f in form.getlist("images") if hasattr(f, "read")]
+    if len(uploads) > BATCH_MAX_IMAGES:
+        return JSONResponse(
+            status_code=413,
+            content={"status": "error", "message": f"At most {BATCH_MAX_IMAGES} images per batch."}
+        )
+    mode = form.get("mode", "local")
+    consumers = consumers_for_mode(mode if mode in strategies else "local")
+    images = [ImageInput(await f.read(), name=f.filename, consumers=consumers) for f in uploads]
+    engine = strategies.get(mode, strategies["local"])
+    return StreamingResponse(
+        stream_batch(engine, images, form.get("context", "")),
+        media_type="application/x-ndjson"
+    )
+
+async def stream_batch(engine, images, context):
+    try:
+        request_gate.acquire()
+    except Overloaded as e:
+        yield json.dumps({"status": "error", "message": str(e)}) + "\n"
+        return
+    try:
+        async for item in batch_analyzer.run(engine, images, context):
+            if "summary" in item:
+                line = item
+            elif item.get("fatal"):
+                line = {"status": "error", "message": item["error"]}
+            elif item["error"]:
+                line = {"index": item["index"], "file": item["name"], "incident_id": item["incident_id"],
+                        "status": "error", "message": item["error"]}
+            else:
+                line = {"index": item["index"], "file": item["name"], "detections": item["detections"],
+                        **build_response(item["incident_id"], item["result"], item["ref_case"],
+                                         images[item["index"]])}
+            yield json.dumps(line) + "\n"
     finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        request_gate.release()
+
+@app.get("/ready")
+def readiness():
+    models = registry.status()
+    ready = all(models[name]["state"] == "ready" for name in WARMUP_MODELS if name in models)
+    # Strategies load YOLO through the detector service, not the registry's "yolo" entry.
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "ready": ready, "models": models, "detectors": detectors.stats(), "qdrant": backend_info()
+    })
+
+@app.get("/metrics/embeddings")
+def embedding_metrics():
+    if not registry.is_loaded("siglip"):
+        return {"status": "unavailable"}
+    return registry.get("siglip").stats()
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    return result_cache.stats()
+
+@app.get("/metrics/detectors")
+def detector_metrics():
+    return detectors.stats()
+
+@app.get("/metrics/images")
+def image_metrics():
+    return image_stats()
+
+@app.get("/metrics/cloud")
+def cloud_metrics():
+    if not registry.is_loaded("cloud"):
+        return {"status": "unavailable"}
+    return registry.get("cloud").stats()
+
+@app.get("/metrics/llm")
+def llm_cache_metrics():
+    return llm_cache.stats()
+
+@app.get("/metrics/writes")
+def write_metrics():
+    return incident_writer.stats()
+
+@app.get("/metrics/pools")
+def concurrency_metrics():
+    return pool_stats()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = API_WORKERS
+    if workers > 1 and not supports_multiple_processes():
+        print(f" Warning: {backend_info()['mode']} Qdrant cannot be shared between processes; "
+              f"set QDRANT_URL to run {workers} workers. Starting 1 worker.")
+        workers = 1
+    if workers > 1:
+        uvicorn.run("backend_api:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
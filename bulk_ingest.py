@@ -1,165 +1,275 @@
 import os
 import json
+import time
+import argparse
 import pandas as pd
-from PIL import Image
-import torch
-from transformers import AutoProcessor, AutoModel
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, VectorParams, Distance
+from qdrant_client.models import PointStruct, PointIdsList
 from pypdf import PdfReader
-from fastembed import TextEmbedding
+from src.models import registry
+from src.schema import COLLECTION_IMAGES, COLLECTION_KNOWLEDGE, ensure_collections
+from src.ingest_manifest import IngestManifest, content_point_id
+from src.ingest_pipeline import ImageIngestPipeline, print_report, WRITERS
+from src.qdrant_backend import get_client, backend_info, supports_multiple_processes
+from src.memory import link_related_rules
 
 DATASET_PATH = "datasets"
-COLLECTION_IMAGES = "rail_safety_logs"
-COLLECTION_KNOWLEDGE = "expert_knowledge"
-MODEL_IMAGES = "google/siglip2-base-patch16-224"
-MODEL_TEXT = "BAAI/bge-small-en-v1.5"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+CSV_CHUNK_ROWS = int(os.environ.get("FELIX_CSV_CHUNK_ROWS", 10000))
+DOC_EMBED_BATCH = int(os.environ.get("FELIX_DOC_EMBED_BATCH", 256))
+PDF_CHUNK_CHARS = int(os.environ.get("FELIX_PDF_CHUNK_CHARS", 1500))
+PDF_CHUNK_OVERLAP = int(os.environ.get("FELIX_PDF_CHUNK_OVERLAP", 200))
 
-print(" Starting: Multimodal Ingestion Engine...")
-
-client = QdrantClient(path="qdrant_db")
+# Created in __main__ so decode worker processes can import this module cheaply.
+client = None
+manifest = None
+embedding_service = None
+text_model = None
 
 def setup_collections():
+    ensure_collections(client)
+    print(f" Collections '{COLLECTION_IMAGES}' and '{COLLECTION_KNOWLEDGE}' ready.")
 
-    if not client.collection_exists(COLLECTION_IMAGES):
-        client.create_collection(
-            collection_name=COLLECTION_IMAGES,
-            vectors_config={
-                "fast_lane": VectorParams(size=1536, distance=Distance.COSINE),
-                "offline_lane": VectorParams(size=768, distance=Distance.COSINE)
-            }
-        )
-        print(f" Collection '{COLLECTION_IMAGES}' ready.")
-
-    if not client.collection_exists(COLLECTION_KNOWLEDGE):
-        client.create_collection(
-            collection_name=COLLECTION_KNOWLEDGE,
-            vectors_config={
-                "text_vector": VectorParams(size=384, distance=Distance.COSINE)
-            }
-        )
-        print(f" Collection '{COLLECTION_KNOWLEDGE}' ready.")
-
-setup_collections()
-
-print(f" Loading SigLIP (Images): {MODEL_IMAGES}...")
-processor = AutoProcessor.from_pretrained(MODEL_IMAGES)
-model_img = AutoModel.from_pretrained(MODEL_IMAGES)
-
-print(f" Loading FastEmbed (Text)...")
-text_model = TextEmbedding(model_name=MODEL_TEXT)
-
-def get_image_embedding(image_path):
-    try:
-        image = Image.open(image_path).convert("RGB")
-        inputs = processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = model_img.get_image_features(**inputs)
-        image_vector = outputs / outputs.norm(p=2, dim=-1, keepdim=True)
-        return image_vector[0].tolist()
-    except Exception as e:
-        print(f"   [!] Error image {image_path}: {e}")
-        return None
+def delete_points(collection, point_ids):
+    if point_ids:
+        client.delete(collection, points_selector=PointIdsList(points=list(point_ids)))
 
-def ingest_images():
-    print(f"  Scanning for images in {DATASET_PATH}...")
-    count = 0
-    points = []
+def image_payload(state):
+    root, file = os.path.split(state.path)
+    lower_name = (file + root).lower()
+    status = "OK"
+    action = "PROCEED"
+    if "broken" in lower_name or "crack" in lower_name:
+        status, action = "CRITICAL", "STOP_TRAIN"
+    elif "snow" in lower_name:
+        status, action = "WARNING", "SLOW_DOWN"
+
+    return {
+        "filename": file,
+        "source": "image_dataset",
+        "path": state.path,
+        "sha256": state.sha256,
+        "status": status,
+        "recommended_action": action
+    }
+
+def iter_image_candidates(seen, skipped):
+    """Yields (path, stat) for images whose size/mtime differ from the manifest."""
     for root, _, files in os.walk(DATASET_PATH):
         for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
                 path = os.path.join(root, file)
-                vector = get_image_embedding(path)
-                if vector:
-                    lower_name = (file + root).lower()
-                    status = "OK"
-                    action = "PROCEED"
-                    if "broken" in lower_name or "crack" in lower_name:
-                        status, action = "CRITICAL", "STOP_TRAIN"
-                    elif "snow" in lower_name:
-                        status, action = "WARNING", "SLOW_DOWN"
-
-                    payload = {
-                        "filename": file,
-                        "source": "image_dataset",
-                        "path": path,
-                        "status": status,
-                        "recommended_action": action
-                    }
-                    points.append(PointStruct(id=count, vector={"offline_lane": vector}, payload=payload))
-                    count += 1
-                if len(points) >= 50:
-                    client.upsert(COLLECTION_IMAGES, points)
-                    points = []
-    if points: client.upsert(COLLECTION_IMAGES, points)
-    print(f" {count} images ingested.")
+                seen.add(path)
+                st = manifest.stat_changed(path)
+                if st is None:
+                    skipped[0] += 1
+                    continue
+                yield path, st
+
+def ingest_images():
+    print(f"  Scanning for images in {DATASET_PATH}...")
+    seen = set()
+    skipped = [0]
+    # Embedded and in-memory stores are single-writer; parallel writers pay off against a Qdrant server.
+    writers = WRITERS if supports_multiple_processes() else 1
+    pipeline = ImageIngestPipeline(client, COLLECTION_IMAGES, manifest, embedding_service, image_payload, writers=writers)
+    report = pipeline.run(iter_image_candidates(seen, skipped))
+    print(f"   {skipped[0]} unchanged images skipped.")
+    print_report(report)
+
+    removed = manifest.remove_missing("image", seen)
+    delete_points(COLLECTION_IMAGES, removed)
+    print(f" {report['total']['ingested']} images ingested, {len(removed)} removed.")
+    return report['total']['ingested'] + len(removed)
+
+def csv_row_texts(df):
+    """Vectorized "col: val | col: val" formatting of a CSV chunk."""
+    text = None
+    for col in df.columns:
+        column = f"{col}: " + df[col].astype(str)
+        text = column if text is None else text + " | " + column
+    return text.tolist() if text is not None else []
+
+def chunk_text(text, size=PDF_CHUNK_CHARS, overlap=PDF_CHUNK_OVERLAP):
+    """Splits one page into overlapping windows, preferring to cut on whitespace."""
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut > start:
+                end = cut
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+def incident_text(item):
+    return f"Incident Type: {item.get('type')}. Description: {item.get('visual_description')}. Recommended Action: {item.get('action_taken')}"
+
+def iter_document(root, file):
+    """Yields {"text", "metadata"} records one at a time, so memory does not grow with file size."""
+    path = os.path.join(root, file)
+
+    if file.endswith(".json") and "incident" in file.lower():
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for item in data:
+            yield {"text": incident_text(item), "metadata": item}
+
+    elif file.endswith(".jsonl") and "incident" in file.lower():
+        # Shards written by src/process_real_files.py, read line by line.
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield {"text": incident_text(item), "metadata": item}
+
+    elif file.endswith(".parquet") and "incident" in file.lower():
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=CSV_CHUNK_ROWS):
+            for item in batch.to_pylist():
+                yield {"text": incident_text(item), "metadata": item}
+
+    elif file.endswith(".txt") and "rule" in file.lower():
+        with open(path, 'r', encoding='utf-8') as f:
+            for r in f:
+                if r.strip() and not r.startswith("#"):
+                    yield {"text": r.strip(), "metadata": {"source": "safety_rules", "type": "Regulation"}}
+
+    elif file.endswith(".csv"):
+        metadata = {"source": "csv_logs", "file": file}
+        for df in pd.read_csv(path, chunksize=CSV_CHUNK_ROWS):
+            for text in csv_row_texts(df):
+                yield {"text": text, "metadata": metadata}
+
+    elif file.endswith(".pdf"):
+        reader = PdfReader(path)
+        for i, page in enumerate(reader.pages):
+            text = page.extract_text()
+            if text and len(text.strip()) > 20:
+                for j, chunk in enumerate(chunk_text(text)):
+                    yield {"text": chunk, "metadata": {"source": "pdf_manual", "page": i, "chunk": j}}
+
+def is_document(file):
+    lower = file.lower()
+    return (
+        (file.endswith((".json", ".jsonl", ".parquet")) and "incident" in lower)
+        or (file.endswith(".txt") and "rule" in lower)
+        or file.endswith(".csv")
+        or file.endswith(".pdf")
+    )
+
+def ingest_document(root, file, state):
+    """
+    Streams one document into expert_knowledge in fixed-size embedding
+    batches, each upserted as soon as it is embedded. Returns the number of
+    points written.
+    """
+    count = 0
+    started = time.perf_counter()
+    batch = []
+
+    def flush():
+        nonlocal count, batch
+        vectors = text_model.embed([c["text"] for c in batch], batch_size=len(batch))
+        points = [
+            PointStruct(
+                id=content_point_id(state.sha256, count + i),
+                vector={"text_vector": v.tolist()},
+                payload={
+                    "content": c["text"],
+                    "metadata": c["metadata"],
+                    "file_source": file,
+                    "sha256": state.sha256
+                }
+            )
+            for i, (c, v) in enumerate(zip(batch, vectors))
+        ]
+        client.upsert(COLLECTION_KNOWLEDGE, points)
+        count += len(points)
+        batch = []
+
+    for record in iter_document(root, file):
+        batch.append(record)
+        if len(batch) >= DOC_EMBED_BATCH:
+            flush()
+            elapsed = time.perf_counter() - started
+            print(f"\r   [+] {file}: {count} rows ({count / elapsed:.0f} rows/s)", end="", flush=True)
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    if count:
+        print(f"\r   [+] Processed {file} ({count} entries, {count / elapsed:.0f} rows/s)")
+    return count
 
 def ingest_documents():
     print(f" Scanning for documents in {DATASET_PATH}...")
-    knowledge_points = []
-    global_id = 10000
+    seen = set()
+    skipped = 0
+    changed = 0
 
     for root, _, files in os.walk(DATASET_PATH):
         for file in files:
+            if not is_document(file):
+                continue
             path = os.path.join(root, file)
-            content_list = []
-
-            if file.endswith(".json") and "incident" in file.lower():
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for item in data:
-                        text = f"Incident Type: {item.get('type')}. Description: {item.get('visual_description')}. Recommended Action: {item.get('action_taken')}"
-                        content_list.append({"text": text, "metadata": item})
-
-            elif file.endswith(".txt") and "rule" in file.lower():
-                with open(path, 'r', encoding='utf-8') as f:
-                    rules = [r.strip() for r in f.readlines() if r.strip() and not r.startswith("#")]
-                    for r in rules:
-                        content_list.append({"text": r, "metadata": {"source": "safety_rules", "type": "Regulation"}})
-
-            elif file.endswith(".csv"):
-                try:
-                    df = pd.read_csv(path)
-                    for _, row in df.iterrows():
-                        text = " | ".join([f"{col}: {val}" for col, val in row.items()])
-                        content_list.append({"text": text, "metadata": {"source": "csv_logs", "file": file}})
-                except Exception as e:
-                    print(f"   [!] CSV Error {file}: {e}")
-
-            elif file.endswith(".pdf"):
-                try:
-                    reader = PdfReader(path)
-                    for i, page in enumerate(reader.pages):
-                        text = page.extract_text()
-                        if text and len(text.strip()) > 20:
-                            content_list.append({"text": text[:1500], "metadata": {"source": "pdf_manual", "page": i}})
-                except Exception as e:
-                    print(f"   [!] PDF Error {file}: {e}")
-
-            if content_list:
-                print(f"   [+] Processing {file} ({len(content_list)} entries)")
-                texts = [c["text"] for c in content_list]
-                vectors = list(text_model.embed(texts))
-
-                for i, v in enumerate(vectors):
-                    knowledge_points.append(PointStruct(
-                        id=global_id,
-                        vector={"text_vector": v.tolist()},
-                        payload={
-                            "content": content_list[i]["text"],
-                            "metadata": content_list[i]["metadata"],
-                            "file_source": file
-                        }
-                    ))
-                    global_id += 1
-
-                if len(knowledge_points) >= 100:
-                    client.upsert(COLLECTION_KNOWLEDGE, knowledge_points)
-                    knowledge_points = []
-
-    if knowledge_points: client.upsert(COLLECTION_KNOWLEDGE, knowledge_points)
-    print(f" Documents ingestion complete.")
-
-ingest_images()
-ingest_documents()
-print("\n MULTIMODAL BRAIN READY!")
+            seen.add(path)
+            state = manifest.check(path)
+            if state is None:
+                skipped += 1
+                continue
+
+            try:
+                count = ingest_document(root, file, state)
+            except Exception as e:
+                # Leave it out of the manifest so the next run retries it; the
+                # points already written are overwritten then (same ids).
+                print(f"\n   [!] Error {file}: {e}")
+                continue
+            delete_points(COLLECTION_KNOWLEDGE, manifest.record("document", state, count))
+            changed += 1
+
+    removed = manifest.remove_missing("document", seen)
+    delete_points(COLLECTION_KNOWLEDGE, removed)
+    print(f" Documents ingestion complete ({skipped} unchanged, {len(removed)} stale points removed).")
+    return changed + len(removed)
+
+def link_rules():
+    """Stores the related rules of every incident in its payload (see MemorySystem.get_reference_case)."""
+    linked = link_related_rules(client, text_model)
+    print(f" Related rules linked for {sum(linked.values())} incidents ({len(linked)} distinct summaries).")
+
+def reset():
+    """Drops both collections and the manifest, for a clean full re-ingest."""
+    for name in (COLLECTION_IMAGES, COLLECTION_KNOWLEDGE):
+        if client.collection_exists(name):
+            client.delete_collection(name)
+    manifest.reset()
+    setup_collections()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental ingestion of datasets/ into Qdrant")
+    parser.add_argument("--reset", action="store_true", help="Drop collections and manifest, re-ingest everything")
+    parser.add_argument("--link-rules", action="store_true", help="Recompute related rules even if nothing changed")
+    args = parser.parse_args()
+
+    print(" Starting: Multimodal Ingestion Engine...")
+    print(f" Qdrant backend: {backend_info()}")
+    client = get_client()
+    manifest = IngestManifest()
+    setup_collections()
+    embedding_service = registry.get("siglip")
+    text_model = registry.get("text_embedding")
+
+    if args.reset:
+        print(" Resetting collections and ingest manifest...")
+        reset()
+    changed = ingest_images()
+    changed += ingest_documents()
+    if changed or args.reset or args.link_rules:
+        link_rules()
+    print("\n MULTIMODAL BRAIN READY!")
@@ -1,4 +1,9 @@
+import os
+import sys
+import json
 import uuid
+import asyncio
+import argparse
 from src.strategies.cloud import CloudMatryoshkaStrategy
 from src.strategies.local import PrivateStrategy, OfflineStrategy
 
@@ -8,6 +13,8 @@ strategies = {
     4: OfflineStrategy()
 }
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
 def run_analysis_engine(mode_selection, image_file_path):
     print(f"--- Starting Engine: Mode {mode_selection} ---")
     if mode_selection not in strategies:
@@ -19,4 +26,111 @@ def run_analysis_engine(mode_selection, image_file_path):
         result = engine.process(image_file_path, incident_id)
         return result
     except Exception as e:
-        return f"Error running engine: {e}"
\ No newline at end of file
+        return f"Error running engine: {e}"
+
+def run_batch_analysis(mode_selection, image_file_paths, context="", use_memory=False, on_result=None):
+    """
+    Batch counterpart of run_analysis_engine for whole survey runs: batched
+    SigLIP/YOLO/Qdrant stages, bounded LLM fan-out. `on_result` is called with
+    each per-image result as it finishes; the final summary is returned.
+    """
+    from src.batch import BatchAnalyzer
+    print(f"--- Starting Batch Engine: Mode {mode_selection} | {len(image_file_paths)} images ---")
+    if mode_selection not in strategies:
+        return "Error: Unknown Mode"
+
+    memory = None
+    if use_memory:
+        from src.memory import MemorySystem
+        memory = MemorySystem()
+    analyzer = BatchAnalyzer(memory)
+
+    async def consume():
+        async for item in analyzer.run(strategies[mode_selection], image_file_paths, context):
+            if "summary" in item:
+                return item["summary"]
+            if item.get("fatal"):
+                print(f" Batch aborted: {item['error']}")
+            elif on_result:
+                on_result(item)
+
+    return asyncio.run(consume())
+
+def run_video_inspection(mode_selection, source, context="", use_memory=False, sample_fps=None, method=None,
+                         on_result=None):
+    """
+    Continuous inspection of a video file or frame folder: sampled frames,
+    keyframe dedup, batched SigLIP/YOLO, LLM only for new findings.
+    Returns the summary (sustained fps, frames skipped per reason).
+    """
+    from src.video import VideoInspector, VIDEO_SAMPLE_FPS, KEYFRAME_METHOD
+    print(f"--- Starting Video Inspection: Mode {mode_selection} | {source} ---")
+    if mode_selection not in strategies:
+        return "Error: Unknown Mode"
+
+    memory = None
+    if use_memory:
+        from src.memory import MemorySystem
+        memory = MemorySystem()
+    inspector = VideoInspector(
+        strategies[mode_selection], memory,
+        sample_fps=sample_fps or VIDEO_SAMPLE_FPS, method=method or KEYFRAME_METHOD
+    )
+    return inspector.run(source, context, on_result=on_result)
+
+def collect_images(paths):
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                images.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            images.append(path)
+    return images
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fix-It Felix analysis engine")
+    parser.add_argument("paths", nargs="+", help="Image files or folders of frames, or one video file")
+    parser.add_argument("--mode", type=int, default=3, choices=sorted(strategies))
+    parser.add_argument("--context", default="")
+    parser.add_argument("--rag", action="store_true", help="Look up reference cases in Qdrant")
+    parser.add_argument("--output", default=None, help="Write per-image results as JSON lines")
+    parser.add_argument("--video", action="store_true", help="Inspect a folder of frames as continuous video")
+    parser.add_argument("--fps", type=float, default=None, help="Frames sampled per second of video")
+    parser.add_argument("--keyframes", choices=["phash", "siglip"], default=None, help="Keyframe dedup method")
+    args = parser.parse_args()
+
+    from src.video import is_video
+    if len(args.paths) == 1 and (args.video or is_video(args.paths[0])):
+        out = open(args.output, "w", encoding="utf-8") if args.output else None
+
+        def report_frame(item):
+            status = f"ERROR {item['error']}" if item["error"] else ", ".join(item["detections"]) or "novel scene"
+            print(f" [{item['timestamp']:8.2f}s] {item['name']}: {status}")
+            if out:
+                out.write(json.dumps(item) + "\n")
+
+        summary = run_video_inspection(args.mode, args.paths[0], args.context, use_memory=args.rag,
+                                       sample_fps=args.fps, method=args.keyframes, on_result=report_frame)
+        if out:
+            out.close()
+        print(f"\n {summary}")
+        sys.exit(0)
+
+    images = collect_images(args.paths)
+    if len(images) == 1 and not args.rag:
+        print(run_analysis_engine(args.mode, images[0]))
+        sys.exit(0)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+
+    def report(item):
+        status = f"ERROR {item['error']}" if item["error"] else ", ".join(item["detections"]) or "no detections"
+        print(f" [{item['index']}] {os.path.basename(item['name'] or '')}: {status} ({item['seconds']:.2f}s)")
+        if out:
+            out.write(json.dumps(item) + "\n")
+
+    summary = run_batch_analysis(args.mode, images, args.context, use_memory=args.rag, on_result=report)
+    if out:
+        out.close()
+    print(f"\n {summary}")
@@ -1,10 +1,10 @@
-from qdrant_client import QdrantClient, models
+from qdrant_client import models
+from src.qdrant_backend import get_client
 COLLECTION_NAME = "rail_safety_logs"
 VECTOR_SIZE = 768
-from qdrant_client import QdrantClient, models
 class MemorySystem:
-    def __init__(self, path="qdrant_db"):
-        self.client = QdrantClient(path=path)
+    def __init__(self, path=None):
+        self.client = get_client(mode="embedded" if path else None, path=path)
         self.collection = "rail_safety_logs"
     def save_incident(self, vector, mode, payload):
         lane = "offline_lane" if mode == 3 else "fast_lane"
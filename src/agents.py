@@ -6,7 +6,7 @@ class RailAgent:
         self.memory = MemorySystem()
     def evaluate_risk(self, image_path):
         print(f"\n Analyzing Image: {os.path.basename(image_path)}")
-        is_defect, vision_msg = self.vision.analyze_image(image_path)
+        is_defect, vision_msg, _ = self.vision.analyze_image(image_path)
         if not is_defect:
             return {
                 "status": "SAFE",
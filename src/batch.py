@@ -0,0 +1,118 @@
+import os
+import time
+import uuid
+import asyncio
+
+from src.concurrency import model_pool, llm_pool, memory_pool
+from src.image_input import as_image_input
+from src.memory import inject_reference
+from src.strategies.local import get_siglip_embeddings
+
+BATCH_CHUNK_SIZE = int(os.environ.get("FELIX_BATCH_CHUNK", 16))
+BATCH_LLM_CONCURRENCY = int(os.environ.get("FELIX_BATCH_LLM_CONCURRENCY", 4))
+
+
+class BatchAnalyzer:
+    """
+    Runs a whole survey run through one strategy:
+    images are taken in chunks, each chunk gets one batched SigLIP pass, one
+    batched YOLO predict and one batched Qdrant lookup, then LLM calls fan out
+    with bounded concurrency. Results are yielded in completion order.
+    """
+    def __init__(self, memory=None, chunk_size=BATCH_CHUNK_SIZE, llm_concurrency=BATCH_LLM_CONCURRENCY):
+        self.memory = memory
+        self.chunk_size = max(1, chunk_size)
+        self.llm_concurrency = max(1, llm_concurrency)
+
+    async def run(self, engine, images, context=""):
+        """
+        Yields one dict per image ({"index", "name", "incident_id", "detections",
+        "ref_case", "result", "error", "seconds"}) as it finishes, then a final
+        {"summary": {...}} with images/sec.
+        """
+        images = [as_image_input(image) for image in images]
+        finished = asyncio.Queue()
+        llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        # Backpressure: at most one chunk in the model stage and one waiting on
+        # the LLM beyond the images currently being analyzed.
+        in_flight = asyncio.Semaphore(self.llm_concurrency + 2 * self.chunk_size)
+        started = time.perf_counter()
+        llm_tasks = []
+
+        async def analyze(index, image, vector, detections, ref_case, stage_started):
+            incident_id = str(uuid.uuid4())
+            item = {
+                "index": index, "name": image.name, "incident_id": incident_id,
+                "detections": sorted(set(detections or [])), "ref_case": ref_case,
+                "result": None, "error": None
+            }
+            try:
+                async with llm_slots:
+                    item["result"] = await llm_pool.run(
+                        engine.process, image, incident_id,
+                        user_context=inject_reference(context, ref_case),
+                        detections=detections, vector=vector
+                    )
+            except Exception as e:
+                item["error"] = str(e)
+            finally:
+                in_flight.release()
+            item["seconds"] = time.perf_counter() - stage_started
+            await finished.put(item)
+
+        async def feed():
+            try:
+                for start in range(0, len(images), self.chunk_size):
+                    chunk = images[start:start + self.chunk_size]
+                    for _ in chunk:
+                        await in_flight.acquire()
+                    chunk_started = time.perf_counter()
+                    need_vectors = self.memory is not None or engine.uses_visual_vector
+                    vectors, detections = await asyncio.gather(
+                        model_pool.run(get_siglip_embeddings, chunk) if need_vectors else _none(len(chunk)),
+                        model_pool.run(engine.detect_many, chunk)
+                    )
+                    if self.memory is not None:
+                        refs = await memory_pool.run(self.memory.get_reference_cases, vectors, 3)
+                    else:
+                        refs = [None] * len(chunk)
+                    for offset, image in enumerate(chunk):
+                        llm_tasks.append(asyncio.ensure_future(analyze(
+                            start + offset, image, vectors[offset], detections[offset], refs[offset], chunk_started
+                        )))
+                await asyncio.gather(*llm_tasks)
+            except Exception as e:
+                await finished.put({"error": str(e), "fatal": True})
+            finally:
+                await finished.put(None)
+
+        feeder = asyncio.ensure_future(feed())
+        done = errors = 0
+        try:
+            while True:
+                item = await finished.get()
+                if item is None:
+                    break
+                if item.get("error"):
+                    errors += 1
+                done += 1 if not item.get("fatal") else 0
+                yield item
+        finally:
+            # After a fatal error (or the consumer going away) nothing awaits
+            # the LLM tasks any more: stop them instead of leaving them running.
+            feeder.cancel()
+            for task in llm_tasks:
+                task.cancel()
+            await asyncio.gather(feeder, *llm_tasks, return_exceptions=True)
+
+        elapsed = time.perf_counter() - started
+        yield {"summary": {
+            "images": done,
+            "errors": errors,
+            "seconds": elapsed,
+            "images_per_sec": done / elapsed if elapsed else 0.0,
+        }}
+
+
+async def _none(count):
+    return [None] * count
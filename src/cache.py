@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get("FELIX_CACHE_SIZE", 1024))
+CACHE_TTL = float(os.environ.get("FELIX_CACHE_TTL", 3600))
+CACHE_DIR = os.environ.get("FELIX_CACHE_DIR")
+
+_MISSING = object()
+
+
+class _LeaderCancelled(Exception):
+    """Set on a shared single-flight future whose computing caller was cancelled."""
+
+
+def normalize_context(text):
+    """Case and whitespace-insensitive form of the user context, for cache keys."""
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with a per-entry TTL."""
+    def __init__(self, max_items=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """SQLite-backed tier that survives restarts. Values must be JSON serializable."""
+    def __init__(self, path, ttl=CACHE_TTL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        value, expires = row
+        if expires < time.time():
+            self.delete(key)
+            return _MISSING
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, encoded, time.time() + (ttl or self.ttl))
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key LIKE ?", (prefix.replace("%", "") + "%",))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + optional SQLite) cache split by pipeline stage,
+    e.g. "siglip", "detections", "reference", "analysis".
+    Concurrent misses on the same key are coalesced: the first caller computes,
+    the others await its result.
+    """
+    def __init__(self, max_items=CACHE_SIZE, ttl=CACHE_TTL, cache_dir=CACHE_DIR):
+        self.memory = LRUCache(max_items, ttl)
+        self.disk = DiskCache(os.path.join(cache_dir, "results.sqlite"), ttl) if cache_dir else None
+        self._inflight = {}
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stage, field):
+        with self._stats_lock:
+            counters = self._stats.setdefault(
+                stage, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+            )
+            counters[field] += 1
+
+    def _memory_get(self, stage, full_key):
+        value = self.memory.get(full_key)
+        if value is not _MISSING:
+            self._count(stage, "memory_hits")
+        return value
+
+    def _disk_get(self, stage, full_key):
+        value = self.disk.get(full_key)
+        if value is not _MISSING:
+            self.memory.set(full_key, value)
+            self._count(stage, "disk_hits")
+        return value
+
+    def get(self, stage, key):
+        full_key = f"{stage}:{key}"
+        value = self._memory_get(stage, full_key)
+        if value is _MISSING and self.disk:
+            value = self._disk_get(stage, full_key)
+        return value
+
+    async def aget(self, stage, key):
+        """get() for the event loop: the SQLite tier is read on a worker thread."""
+        full_key = f"{stage}:{key}"
+        value = self._memory_get(stage, full_key)
+        if value is _MISSING and self.disk:
+            value = await asyncio.to_thread(self._disk_get, stage, full_key)
+        return value
+
+    async def acontains(self, stage, key):
+        """Whether (stage, key) is cached, without counting a hit or a miss."""
+        full_key = f"{stage}:{key}"
+        if self.memory.get(full_key) is not _MISSING:
+            return True
+        return bool(self.disk) and await asyncio.to_thread(self.disk.get, full_key) is not _MISSING
+
+    def set(self, stage, key, value):
+        full_key = f"{stage}:{key}"
+        self.memory.set(full_key, value)
+        if self.disk:
+            self.disk.set(full_key, value)
+
+    async def aset(self, stage, key, value):
+        full_key = f"{stage}:{key}"
+        self.memory.set(full_key, value)
+        if self.disk:
+            await asyncio.to_thread(self.disk.set, full_key, value)
+
+    def lookup(self, stage, key, default=None):
+        """Plain read that does not count a miss; returns `default` when absent."""
+        value = self.get(stage, key)
+        return default if value is _MISSING else value
+
+    async def alookup(self, stage, key, default=None):
+        value = await self.aget(stage, key)
+        return default if value is _MISSING else value
+
+    def invalidate(self, stage, key=None):
+        if key is None:
+            self.memory.delete_prefix(f"{stage}:")
+            if self.disk:
+                self.disk.delete_prefix(f"{stage}:")
+            return
+        full_key = f"{stage}:{key}"
+        self.memory.delete(full_key)
+        if self.disk:
+            self.disk.delete(full_key)
+
+    async def get_or_compute(self, stage, key, compute, cacheable=None):
+        """
+        Returns the cached value for (stage, key) or awaits `compute()` once,
+        sharing the result with every concurrent caller of the same key.
+        `cacheable(value)` can veto storing a result (e.g. error fallbacks).
+        If the caller computing it is cancelled (client gone), the others are
+        not: one of them takes over the computation.
+        """
+        full_key = f"{stage}:{key}"
+        while True:
+            value = await self.aget(stage, key)
+            if value is not _MISSING:
+                return value
+
+            pending = self._inflight.get(full_key)
+            if pending is None:
+                break
+            self._count(stage, "coalesced")
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                continue
+
+        self._count(stage, "misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await compute()
+            if cacheable is None or cacheable(value):
+                await self.aset(stage, key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # Not future.cancel(): the waiters were not cancelled, they retry instead.
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(full_key, None)
+
+    def stats(self):
+        with self._stats_lock:
+            stages = {stage: dict(counters) for stage, counters in self._stats.items()}
+        for counters in stages.values():
+            hits = counters["memory_hits"] + counters["disk_hits"] + counters["coalesced"]
+            total = hits + counters["misses"]
+            counters["hit_rate"] = hits / total if total else 0.0
+        return {
+            "memory_entries": len(self.memory),
+            "disk_tier": bool(self.disk),
+            "stages": stages,
+        }
@@ -0,0 +1,285 @@
+import os
+import time
+import queue
+import random
+import asyncio
+import threading
+from collections import deque
+
+OPENAI_BASE_URL = os.environ.get("FELIX_OPENAI_BASE_URL", "https://models.inference.ai.azure.com")
+CLOUD_MAX_CONNECTIONS = int(os.environ.get("FELIX_CLOUD_MAX_CONNECTIONS", 32))
+CLOUD_MAX_RETRIES = int(os.environ.get("FELIX_CLOUD_MAX_RETRIES", 4))
+CLOUD_BACKOFF_BASE = float(os.environ.get("FELIX_CLOUD_BACKOFF_BASE", 0.5))
+CLOUD_BACKOFF_MAX = float(os.environ.get("FELIX_CLOUD_BACKOFF_MAX", 8.0))
+# Total time one request (every attempt and backoff included) may take.
+CLOUD_DEADLINE = float(os.environ.get("FELIX_CLOUD_DEADLINE", 60.0))
+CLOUD_EMBED_MAX_BATCH = int(os.environ.get("FELIX_CLOUD_EMBED_MAX_BATCH", 64))
+CLOUD_EMBED_MAX_WAIT_MS = float(os.environ.get("FELIX_CLOUD_EMBED_MAX_WAIT_MS", 10))
+LATENCY_WINDOW = 1024
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request (with its retries) did not finish within its deadline."""
+
+
+def _retryable(error):
+    """Rate limits, timeouts, connection drops and 5xx are worth another attempt; other 4xx are not."""
+    import openai
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class CloudClient:
+    """
+    Async OpenAI-compatible client shared by every cloud request in the process.
+    One background event loop owns a pooled AsyncOpenAI client; sync callers
+    (strategies running on the LLM pool) submit coroutines to it, so their
+    calls share connections and one embedding batcher. Retries are done here
+    with full-jitter exponential backoff (honouring Retry-After) and stop at
+    the request deadline. Embedding requests arriving within
+    `embed_max_wait_ms` of each other are merged into one embeddings.create.
+    """
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=None, max_connections=CLOUD_MAX_CONNECTIONS,
+                 max_retries=CLOUD_MAX_RETRIES, deadline=CLOUD_DEADLINE,
+                 embed_max_batch=CLOUD_EMBED_MAX_BATCH, embed_max_wait_ms=CLOUD_EMBED_MAX_WAIT_MS):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_retries = max(0, max_retries)
+        self.deadline = deadline
+        self.embed_max_batch = max(1, embed_max_batch)
+        self.embed_max_wait = max(0.0, embed_max_wait_ms) / 1000.0
+        self._loop = None
+        self._client = None
+        self._embed_queue = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._latencies = {}
+
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                threading.Thread(target=run, name="cloud-client", daemon=True).start()
+                ready.wait()
+                asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _start(self):
+        import httpx
+        from openai import AsyncOpenAI
+        self._client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+            ))
+        )
+        self._embed_queue = asyncio.Queue()
+        asyncio.get_running_loop().create_task(self._embed_worker())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+
+    def _record(self, kind, started=None, usage=None, **deltas):
+        with self._stats_lock:
+            counters = self._stats.setdefault(kind, {
+                "calls": 0, "errors": 0, "retries": 0, "deadline_exceeded": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0
+            })
+            for field, value in deltas.items():
+                counters[field] = counters.get(field, 0) + value
+            if started is not None:
+                counters["calls"] += 1
+                self._latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(
+                    (time.perf_counter() - started) * 1000
+                )
+            if usage is not None:
+                for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                    counters[field] += getattr(usage, field, None) or 0
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {kind: dict(counters) for kind, counters in self._stats.items()}
+            latencies = {kind: sorted(values) for kind, values in self._latencies.items()}
+        for kind, values in latencies.items():
+            if values:
+                stats[kind]["p50_ms"] = values[len(values) // 2]
+                stats[kind]["p99_ms"] = values[min(len(values) - 1, int(len(values) * 0.99))]
+        embed = stats.get("embeddings")
+        if embed and embed.get("calls"):
+            embed["avg_batch_size"] = embed.get("inputs", 0) / embed["calls"]
+        return stats
+
+
+    async def _with_retries(self, kind, call, deadline):
+        """Awaits call() until it succeeds, fails for good, or `deadline` (monotonic) passes."""
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._record(kind, deadline_exceeded=1)
+                raise DeadlineExceeded(f"{kind} request exceeded its deadline")
+            started = time.perf_counter()
+            try:
+                return started, await asyncio.wait_for(call(), remaining)
+            except asyncio.TimeoutError:
+                self._record(kind, deadline_exceeded=1)
+                raise DeadlineExceeded(f"{kind} request exceeded its deadline")
+            except Exception as e:
+                if attempt >= self.max_retries or not _retryable(e):
+                    self._record(kind, errors=1)
+                    raise
+                delay = random.uniform(0, min(CLOUD_BACKOFF_MAX, CLOUD_BACKOFF_BASE * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0)
+                if time.monotonic() + delay >= deadline:
+                    self._record(kind, errors=1)
+                    raise
+                attempt += 1
+                self._record(kind, retries=1)
+                await asyncio.sleep(delay)
+
+    def _deadline(self, deadline):
+        return time.monotonic() + (deadline or self.deadline)
+
+
+    async def achat(self, messages, model, deadline=None, **kwargs):
+        """Returns the completion text."""
+        async def call():
+            return await self._client.chat.completions.create(messages=messages, model=model, **kwargs)
+        started, response = await self._with_retries("chat", call, self._deadline(deadline))
+        self._record("chat", started, response.usage)
+        return response.choices[0].message.content
+
+    async def achat_stream(self, messages, model, deadline=None, **kwargs):
+        """Yields the completion text as it arrives. Only opening the stream is retried."""
+        until = self._deadline(deadline)
+
+        async def call():
+            return await self._client.chat.completions.create(messages=messages, model=model, stream=True, **kwargs)
+        started, response = await self._with_retries("chat_stream", call, until)
+        try:
+            async for chunk in response:
+                if time.monotonic() > until:
+                    self._record("chat_stream", deadline_exceeded=1)
+                    raise DeadlineExceeded("chat_stream request exceeded its deadline")
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+        finally:
+            await response.close()
+        self._record("chat_stream", started)
+
+    def chat(self, messages, model, deadline=None, **kwargs):
+        return self._run(self.achat(messages, model, deadline=deadline, **kwargs))
+
+    def chat_stream(self, messages, model, deadline=None, **kwargs):
+        """Sync iterator over achat_stream(); closing it cancels the stream."""
+        loop = self._ensure_loop()
+        chunks = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for text in self.achat_stream(messages, model, deadline=deadline, **kwargs):
+                    chunks.put(text)
+                chunks.put(done)
+            except BaseException as e:
+                chunks.put(e)
+                raise
+
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+    async def aembed(self, text, model, deadline=None):
+        """One embedding vector; concurrent calls for the same model share an API request."""
+        future = asyncio.get_running_loop().create_future()
+        await self._embed_queue.put((model, text, self._deadline(deadline), future))
+        return await future
+
+    def embed(self, text, model, deadline=None):
+        return self._run(self.aembed(text, model, deadline=deadline))
+
+    async def _embed_worker(self):
+        while True:
+            batch = [await self._embed_queue.get()]
+            until = time.monotonic() + self.embed_max_wait
+            while len(batch) < self.embed_max_batch:
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._embed_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(item[0], []).append(item)
+            for model, items in by_model.items():
+                asyncio.get_running_loop().create_task(self._embed_batch(model, items))
+
+    async def _embed_batch(self, model, items):
+        items = [item for item in items if not item[3].done()]
+        if not items:
+            return
+        inputs = [text for _, text, _, _ in items]
+
+        async def call():
+            return await self._client.embeddings.create(input=inputs, model=model)
+        try:
+            # The batch runs to the earliest caller's deadline.
+            started, response = await self._with_retries("embeddings", call, min(d for _, _, d, _ in items))
+        except Exception as e:
+            for *_, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._record("embeddings", started, response.usage, inputs=len(inputs))
+        for item, data in zip(items, sorted(response.data, key=lambda d: d.index)):
+            if not item[3].done():
+                item[3].set_result(data.embedding)
+
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            self._run(self._client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
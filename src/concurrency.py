@@ -0,0 +1,147 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MODEL_WORKERS = int(os.environ.get("FELIX_MODEL_WORKERS", 2))
+MODEL_QUEUE = int(os.environ.get("FELIX_MODEL_QUEUE", 32))
+LLM_WORKERS = int(os.environ.get("FELIX_LLM_WORKERS", 8))
+LLM_QUEUE = int(os.environ.get("FELIX_LLM_QUEUE", 64))
+MEMORY_WORKERS = int(os.environ.get("FELIX_MEMORY_WORKERS", 4))
+MEMORY_QUEUE = int(os.environ.get("FELIX_MEMORY_QUEUE", 64))
+MAX_INFLIGHT_REQUESTS = int(os.environ.get("FELIX_MAX_INFLIGHT", 64))
+
+
+class Overloaded(Exception):
+    """Raised when a pool or the request gate has no room left."""
+    def __init__(self, name, retry_after=1):
+        super().__init__(f"'{name}' is at capacity, retry later.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class StagePool:
+    """
+    Bounded thread pool for one pipeline stage.
+    At most `max_workers` calls run at once and at most `max_queue` more may
+    wait; anything beyond that is rejected immediately with Overloaded.
+    """
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"felix-{name}")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded(self.name)
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        # Release only once the work has really finished, even if the awaiting
+        # coroutine was cancelled, so the cap reflects actual CPU/socket usage.
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def iterate(self, gen_fn, *args, **kwargs):
+        """
+        Runs a blocking generator on the pool and yields its items on the event
+        loop as they are produced. Closing the async iterator (e.g. the client
+        disconnected) stops the worker at the next item.
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def pump():
+            try:
+                for item in gen_fn(*args, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, (item, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, (done, e))
+                return
+            loop.call_soon_threadsafe(items.put_nowait, (done, None))
+
+        self.submit(pump)
+        try:
+            while True:
+                item, error = await items.get()
+                if item is done:
+                    if error:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        return {
+            "workers": self.max_workers,
+            "queue_cap": self.max_queue,
+            "in_flight": pending,
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class RequestGate:
+    """Caps the number of requests being served concurrently by one worker."""
+    def __init__(self, limit=MAX_INFLIGHT_REQUESTS):
+        self.limit = limit
+        self._active = 0
+
+    def check(self):
+        """Raises Overloaded when no slot is free, without taking one."""
+        if self._active >= self.limit:
+            raise Overloaded("requests")
+
+    def acquire(self):
+        # Only touched from the event loop thread, so no lock is needed.
+        self.check()
+        self._active += 1
+
+    def release(self):
+        self._active -= 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def stats(self):
+        return {"limit": self.limit, "active": self._active}
+
+
+model_pool = StagePool("model", MODEL_WORKERS, MODEL_QUEUE)
+llm_pool = StagePool("llm", LLM_WORKERS, LLM_QUEUE)
+memory_pool = StagePool("memory", MEMORY_WORKERS, MEMORY_QUEUE)
+request_gate = RequestGate()
+
+
+def pool_stats():
+    return {
+        "requests": request_gate.stats(),
+        "model": model_pool.stats(),
+        "llm": llm_pool.stats(),
+        "memory": memory_pool.stats(),
+    }
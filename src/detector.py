@@ -0,0 +1,183 @@
+import os
+import time
+import threading
+
+from src.image_input import YOLO_SIZE, as_image_input
+
+DEFAULT_DETECTOR = "default"
+RAIL_DEFECT_WEIGHTS = os.environ.get("FELIX_RAIL_DEFECT_WEIGHTS", "runs/detect/rail_defect_model_v11/weights/best.pt")
+# Extra or overriding detectors, "name=weights.pt,...".
+DETECTORS = os.environ.get("FELIX_DETECTORS", "")
+# Detector used per strategy, "private=default,offline=rail_defect,..."; unlisted strategies use "default".
+STRATEGY_DETECTORS = os.environ.get("FELIX_STRATEGY_DETECTORS", "")
+# auto: half precision only on CUDA, where it is supported.
+DETECTOR_HALF = os.environ.get("FELIX_DETECTOR_HALF", "auto")
+DETECTOR_FUSE = os.environ.get("FELIX_DETECTOR_FUSE", "1") != "0"
+DETECTOR_CONF = float(os.environ.get("FELIX_DETECTOR_CONF", 0.25))
+
+
+def parse_mapping(spec):
+    """'a=x,b=y' -> {"a": "x", "b": "y"}"""
+    mapping = {}
+    for entry in spec.split(","):
+        if "=" in entry:
+            name, value = entry.split("=", 1)
+            mapping[name.strip()] = value.strip()
+    return mapping
+
+
+def detector_weights():
+    from src.models import YOLO_WEIGHTS
+    weights = {DEFAULT_DETECTOR: YOLO_WEIGHTS, "rail_defect": RAIL_DEFECT_WEIGHTS}
+    weights.update(parse_mapping(DETECTORS))
+    return weights
+
+
+def detector_for(strategy):
+    return parse_mapping(STRATEGY_DETECTORS).get(strategy, DEFAULT_DETECTOR)
+
+
+def _use_half():
+    if DETECTOR_HALF != "auto":
+        return DETECTOR_HALF == "1"
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+class DetectorService:
+    """
+    One YOLO instance per weights file per process, whichever strategies or
+    tools ask for it by name. Calls on the same instance are serialized, since
+    the Ultralytics predictor keeps per-call state; batching is what scales. Torch weights are fused (conv+bn) once at load
+    and run in half precision on CUDA; ONNX exports are used when
+    FELIX_INFERENCE_BACKEND asks for them. Predictions never touch the disk:
+    annotated images are only rendered, in memory, when asked for.
+    """
+    def __init__(self, weights=None, half=None, fuse=DETECTOR_FUSE, conf=DETECTOR_CONF, imgsz=YOLO_SIZE):
+        self.weights = weights or detector_weights()
+        # None: decided on first load, so importing this module does not import torch.
+        self.half = half
+        self.fuse = fuse
+        self.conf = conf
+        self.imgsz = imgsz
+        self._models = {}
+        # Weights whose ONNX graph only takes one image per call.
+        self._single_batch = set()
+        self._failed = {}
+        self._lock = threading.Lock()
+        # Ultralytics predictors are not thread-safe: one predict at a time per loaded model.
+        self._predict_locks = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def path(self, name):
+        if name not in self.weights:
+            raise KeyError(f"Unknown detector '{name}' (known: {', '.join(sorted(self.weights))})")
+        return self.weights[name]
+
+    def _load(self, weights):
+        from ultralytics import YOLO
+        from src.models import _onnx_variant
+        from src.onnx_backend import yolo_onnx_name, has_dynamic_batch
+        if self.half is None:
+            self.half = _use_half()
+        onnx_file = _onnx_variant(yolo_onnx_name(weights))
+        print(f"Loading YOLO detector ({onnx_file or weights})...")
+        model = YOLO(onnx_file or weights, task="detect")
+        if onnx_file and not has_dynamic_batch(onnx_file):
+            print(f" {onnx_file} has a fixed batch of 1; re-export with tools/export_onnx.py for batched detection.")
+            self._single_batch.add(weights)
+        if self.fuse and not onnx_file:
+            model.fuse()
+        return model
+
+    def model(self, name=DEFAULT_DETECTOR):
+        """The loaded YOLO for detector `name`; raises if its weights cannot be loaded."""
+        weights = self.path(name)
+        model = self._models.get(weights)
+        if model is not None:
+            return model
+        with self._lock:
+            if weights not in self._models:
+                if weights in self._failed:
+                    raise RuntimeError(self._failed[weights])
+                try:
+                    self._models[weights] = self._load(weights)
+                except Exception as e:
+                    self._failed[weights] = f"Detector '{name}' ({weights}) could not be loaded. {e}"
+                    print(f"Warning: {self._failed[weights]}")
+                    raise RuntimeError(self._failed[weights])
+            return self._models[weights]
+
+    def get(self, name=DEFAULT_DETECTOR):
+        """Like model(), but None when it cannot be loaded (the failure is logged once)."""
+        try:
+            return self.model(name)
+        except RuntimeError:
+            return None
+
+    def predict(self, name, images, conf=None):
+        """Raw ultralytics results for a list of images (paths or ImageInputs), in one batched call."""
+        model = self.model(name)
+        started = time.perf_counter()
+        pixels = [as_image_input(image).yolo_image for image in images]
+        options = dict(conf=conf or self.conf, imgsz=self.imgsz, half=self.half, save=False, verbose=False)
+        weights = self.path(name)
+        with self._predict_locks.setdefault(weights, threading.Lock()):
+            if weights in self._single_batch:
+                results = [r for image in pixels for r in model.predict([image], **options)]
+            else:
+                results = model.predict(pixels, **options)
+        with self._stats_lock:
+            counters = self._stats.setdefault(name, {"calls": 0, "images": 0, "seconds": 0.0})
+            counters["calls"] += 1
+            counters["images"] += len(images)
+            counters["seconds"] += time.perf_counter() - started
+        return results
+
+    def labels(self, name, images, conf=None):
+        """Detected class names per image."""
+        if not images:
+            return []
+        model = self.model(name)
+        return [[model.names[int(c)] for c in r.boxes.cls] for r in self.predict(name, images, conf)]
+
+    def detect(self, name, images, conf=None, annotate=False):
+        """
+        Per image: {"labels", "boxes": [[x1, y1, x2, y2, confidence, label]...]}
+        and, only when `annotate`, "annotated": a PIL image with the boxes drawn.
+        Boxes and the annotated image are in the coordinates of the image's
+        YOLO variant (longest side YOLO_SIZE).
+        """
+        from PIL import Image
+        model = self.model(name)
+        detections = []
+        for r in self.predict(name, images, conf):
+            labels = [model.names[int(c)] for c in r.boxes.cls]
+            item = {
+                "labels": labels,
+                "boxes": [box + [float(score), label] for box, score, label in
+                          zip(r.boxes.xyxy.tolist(), r.boxes.conf.tolist(), labels)],
+            }
+            if annotate:
+                # plot() draws on a copy in memory and returns BGR pixels.
+                item["annotated"] = Image.fromarray(r.plot()[..., ::-1])
+            detections.append(item)
+        return detections
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {name: dict(counters) for name, counters in self._stats.items()}
+        return {
+            "loaded": sorted(self._models),
+            "failed": dict(self._failed),
+            "half": self.half,
+            "fused": self.fuse,
+            "detectors": stats,
+        }
+
+
+detectors = DetectorService()
@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from PIL import Image
+
+from src.image_input import ImageInput
+
+MAX_BATCH_SIZE = int(os.environ.get("FELIX_EMBED_MAX_BATCH", 16))
+MAX_WAIT_MS = float(os.environ.get("FELIX_EMBED_MAX_WAIT_MS", 10))
+
+
+class EmbeddingService:
+    """
+    In-process SigLIP micro-batcher.
+    Requests are queued and collected for up to `max_wait_ms` (or until
+    `max_batch_size` images are waiting), then embedded in a single
+    `get_image_features` pass. Each caller gets its own normalized vector.
+    """
+    def __init__(self, processor, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.processor = processor
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "images": 0, "errors": 0, "busy_seconds": 0.0}
+
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="siglip-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, image):
+        """Queues an image (path, PIL image or ImageInput) and returns a Future of its vector."""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((image, future))
+        return future
+
+    def embed(self, image, timeout=None):
+        return self.submit(image).result(timeout=timeout)
+
+    def embed_many(self, images, timeout=None):
+        """
+        Embeds a list of images. Failed images come back as None so one bad
+        file does not sink the rest of the batch.
+        """
+        futures = [self.submit(image) for image in images]
+        vectors = []
+        for future in futures:
+            try:
+                vectors.append(future.result(timeout=timeout))
+            except Exception as e:
+                print(f"   [!] Embedding error: {e}")
+                vectors.append(None)
+        return vectors
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["images"] / stats["batches"] if stats["batches"] else 0.0
+        stats["embeddings_per_sec"] = stats["images"] / stats["busy_seconds"] if stats["busy_seconds"] else 0.0
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000.0
+        return stats
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window is over, but still sweep whatever is already waiting.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        images, futures = [], []
+        for item, future in batch:
+            try:
+                images.append(self._load(item))
+                futures.append(future)
+            except Exception as e:
+                future.set_exception(e)
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+
+        if not images:
+            return
+
+        inputs = self.processor(images=images, return_tensors="pt")
+        vectors = self._forward(inputs)
+
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector.tolist())
+
+        self._record(len(images), started)
+
+    def embed_pixels(self, pixel_values):
+        """
+        Embeds an already preprocessed (N, 3, H, W) float array in one forward
+        pass, bypassing the queue. Used by bulk ingestion, which decodes and
+        preprocesses in worker processes.
+        """
+        import torch
+        started = time.perf_counter()
+        vectors = self._forward({"pixel_values": torch.from_numpy(pixel_values)})
+        self._record(len(vectors), started)
+        return [vector.tolist() for vector in vectors]
+
+    def _forward(self, inputs):
+        import torch
+        with torch.no_grad():
+            outputs = self.model.get_image_features(**inputs)
+        return outputs / outputs.norm(p=2, dim=-1, keepdim=True)
+
+    def _record(self, count, started):
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["images"] += count
+            self._stats["busy_seconds"] += time.perf_counter() - started
+
+    @staticmethod
+    def _load(image):
+        if isinstance(image, ImageInput):
+            return image.siglip_image
+        if isinstance(image, Image.Image):
+            return image.convert("RGB")
+        return Image.open(image).convert("RGB")
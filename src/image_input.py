@@ -0,0 +1,228 @@
+import io
+import os
+import time
+import base64
+import hashlib
+import threading
+
+import numpy as np
+from PIL import Image, ImageOps
+
+SIGLIP_SIZE = 224
+YOLO_SIZE = int(os.environ.get("FELIX_YOLO_IMGSZ", 640))
+# Longest side and JPEG quality of the image sent to the cloud model.
+CLOUD_MAX_SIDE = int(os.environ.get("FELIX_CLOUD_IMAGE_MAX_SIDE", 1024))
+CLOUD_JPEG_QUALITY = int(os.environ.get("FELIX_CLOUD_JPEG_QUALITY", 85))
+# Decode JPEGs at a reduced DCT scale (1/2, 1/4, 1/8) when every consumer needs less than full size.
+DRAFT_DECODE = os.environ.get("FELIX_DRAFT_DECODE", "1") != "0"
+EXIF_ORIENTATION = 0x0112
+
+_totals_lock = threading.Lock()
+_totals = {"images": 0, "decode_seconds": 0.0, "source_pixels": 0, "decoded_pixels": 0,
+           "cloud_payloads": 0, "cloud_source_bytes": 0, "cloud_bytes": 0}
+
+
+def _add_totals(**deltas):
+    with _totals_lock:
+        for field, value in deltas.items():
+            _totals[field] += value
+
+
+def image_stats():
+    """Process-wide decode and upload-size counters."""
+    with _totals_lock:
+        stats = dict(_totals)
+    stats["avg_decode_ms"] = stats["decode_seconds"] * 1000 / stats["images"] if stats["images"] else 0.0
+    stats["cloud_bytes_saved"] = stats["cloud_source_bytes"] - stats["cloud_bytes"]
+    return stats
+
+
+CONSUMERS = ("siglip", "yolo", "cloud")
+
+
+def consumers_for_mode(mode):
+    """Which variants a request in `mode` will use (unknown modes run the cloud strategy)."""
+    return ("siglip", "yolo") if mode in ("local", "fast") else ("siglip", "cloud")
+
+
+def decode_scale(width, height, consumers=CONSUMERS):
+    """Smallest scale of a width x height image that still covers every consumer (<= 1)."""
+    long_side, short_side = max(width, height), min(width, height)
+    needed = {
+        "siglip": SIGLIP_SIZE / short_side,
+        "yolo": YOLO_SIZE / long_side,
+        "cloud": CLOUD_MAX_SIDE / long_side,
+    }
+    return min(1.0, max(needed[c] for c in consumers))
+
+
+class ImageInput:
+    """
+    An uploaded image kept in memory: the raw bytes plus one decoded RGB copy.
+    Every stage (SigLIP, YOLO, cloud payload) reads from the same object, so the
+    JPEG is decoded once per request and never written to disk.
+    The decode only goes as large as the biggest consumer needs (JPEG draft
+    mode picks the DCT scale), and each consumer gets its own variant of it:
+    `siglip_image` (224x224), `yolo_image` (longest side 640) and
+    `cloud_jpeg()` (longest side CLOUD_MAX_SIDE, re-encoded).
+    """
+    def __init__(self, data: bytes, name: str = None, consumers=CONSUMERS):
+        self._data = data
+        # Set by from_image: encodes `data` the first time it is needed.
+        self._encode = None
+        self.name = name
+        # Variants this image will be asked for; the decode is sized for them.
+        self.consumers = tuple(consumers)
+        self._image = None
+        self._array = None
+        self._digest = None
+        self._variants = {}
+        self._cloud_jpeg = None
+        self._lock = threading.Lock()
+        self.prep = {}
+
+    @classmethod
+    def from_path(cls, path, consumers=CONSUMERS):
+        with open(path, "rb") as f:
+            return cls(f.read(), name=path, consumers=consumers)
+
+    @classmethod
+    def from_image(cls, image, name=None, consumers=CONSUMERS, quality=90):
+        """
+        Wraps an already-decoded image (e.g. a video frame). `data` becomes its
+        JPEG encoding, made only if something asks for the digest or the cloud
+        payload, so SigLIP/YOLO-only frames are never encoded.
+        """
+        rgb = image.convert("RGB")
+
+        def encode():
+            buffer = io.BytesIO()
+            rgb.save(buffer, format="JPEG", quality=quality)
+            return buffer.getvalue()
+
+        item = cls(None, name=name, consumers=consumers)
+        item._encode = encode
+        item._image = rgb
+        item.prep.update(source_size=list(rgb.size), decoded_size=list(rgb.size), decode_ms=0.0)
+        return item
+
+    @property
+    def data(self):
+        """The raw (JPEG/PNG/...) bytes."""
+        if self._data is None and self._encode is not None:
+            # Not under _lock: _decode reads data while holding it. A race only encodes twice.
+            self._data = self._encode()
+        return self._data
+
+    @property
+    def image(self):
+        """Decoded RGB PIL image, at the smallest size every consumer can use (decoded once, thread-safe)."""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    self._image = self._decode()
+        return self._image
+
+    def _decode(self):
+        started = time.perf_counter()
+        decoded = Image.open(io.BytesIO(self.data))
+        source_size = decoded.size
+        if DRAFT_DECODE and decoded.format == "JPEG":
+            scale = decode_scale(*source_size, consumers=self.consumers)
+            if scale < 1.0:
+                decoded.draft("RGB", (int(source_size[0] * scale + 0.5), int(source_size[1] * scale + 0.5)))
+        decoded.load()
+        # Phone photos store rotation as EXIF; every consumer gets upright pixels.
+        rgb = ImageOps.exif_transpose(decoded).convert("RGB")
+        seconds = time.perf_counter() - started
+        self.prep.update(
+            source_size=list(source_size), decoded_size=list(rgb.size), decode_ms=round(seconds * 1000, 2)
+        )
+        _add_totals(images=1, decode_seconds=seconds, source_pixels=source_size[0] * source_size[1],
+                    decoded_pixels=rgb.size[0] * rgb.size[1])
+        return rgb
+
+    def _variant(self, name, build):
+        if name not in self._variants:
+            variant = build(self.image)
+            with self._lock:
+                self._variants.setdefault(name, variant)
+        return self._variants[name]
+
+    @property
+    def siglip_image(self):
+        """224x224 RGB, as the SigLIP processor would resize it."""
+        return self._variant("siglip", lambda im: im.resize((SIGLIP_SIZE, SIGLIP_SIZE), Image.BICUBIC))
+
+    @property
+    def yolo_image(self):
+        """Longest side YOLO_SIZE (aspect kept); YOLO letterboxes it without another resize."""
+        def build(im):
+            scale = YOLO_SIZE / max(im.size)
+            if scale >= 1.0:
+                return im
+            return im.resize((max(1, round(im.width * scale)), max(1, round(im.height * scale))), Image.BILINEAR)
+        return self._variant("yolo", build)
+
+    def cloud_jpeg(self):
+        """
+        JPEG bytes for the cloud model: the original file when it is already an
+        upright JPEG within CLOUD_MAX_SIDE, otherwise a re-encode of the decoded
+        image capped at CLOUD_MAX_SIDE, whichever is smaller. Originals with an
+        EXIF rotation are always re-encoded upright.
+        """
+        if self._cloud_jpeg is not None:
+            return self._cloud_jpeg
+        with Image.open(io.BytesIO(self.data)) as original:
+            original_format, original_size = original.format, original.size
+            rotated = original.getexif().get(EXIF_ORIENTATION, 1) != 1
+        if "cloud" not in self.consumers and not rotated:
+            # Decoded for smaller consumers only: fall back to the original bytes.
+            return self.data
+        im = self.image
+        payload = self.data
+        if original_format != "JPEG" or rotated or max(original_size) > CLOUD_MAX_SIDE:
+            scale = CLOUD_MAX_SIDE / max(im.size)
+            if scale < 1.0:
+                im = im.resize((max(1, round(im.width * scale)), max(1, round(im.height * scale))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            im.save(buffer, format="JPEG", quality=CLOUD_JPEG_QUALITY, optimize=True)
+            # The re-encode drops EXIF, so a rotated original is never sent as is.
+            if original_format != "JPEG" or rotated or buffer.tell() < len(self.data):
+                payload = buffer.getvalue()
+        self._cloud_jpeg = payload
+        self.prep.update(cloud_bytes=len(payload), cloud_bytes_saved=len(self.data) - len(payload))
+        _add_totals(cloud_payloads=1, cloud_source_bytes=len(self.data), cloud_bytes=len(payload))
+        return payload
+
+    @property
+    def array(self):
+        """Decoded RGB pixels as an HxWx3 uint8 array."""
+        if self._array is None:
+            self._array = np.asarray(self.image)
+        return self._array
+
+    @property
+    def digest(self):
+        """SHA-256 of the raw bytes, used as the content address in caches."""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    def b64(self):
+        """Base64 of cloud_jpeg(), for the data URL sent to the cloud model."""
+        return base64.b64encode(self.cloud_jpeg()).decode("utf-8")
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        # Truth-testing a wrapped frame must not encode it.
+        return self._encode is not None or bool(self._data)
+
+
+def as_image_input(image):
+    """Accepts None, a file path or an ImageInput and returns an ImageInput (or None)."""
+    if image is None or isinstance(image, ImageInput):
+        return image
+    return ImageInput.from_path(image)
@@ -0,0 +1,268 @@
+import os
+import glob
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from qdrant_client import models
+
+try:
+    import fcntl
+except ImportError:  # Windows: one worker only, nobody else replays the journal
+    fcntl = None
+
+from src.memory import problem_summary
+from src.schema import fast_lane_vectors
+
+PERSIST_INCIDENTS = os.environ.get("FELIX_PERSIST_INCIDENTS", "1") != "0"
+WRITE_BATCH = int(os.environ.get("FELIX_WRITE_BATCH", 64))
+WRITE_FLUSH_SECONDS = float(os.environ.get("FELIX_WRITE_FLUSH_SECONDS", 2.0))
+WRITE_JOURNAL = os.environ.get("FELIX_WRITE_JOURNAL", "incident_journal.sqlite")
+RETRY_SECONDS = 5.0
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def incident_record(incident_id, mode, visual_vector, detections, result):
+    """The JSON-serializable form of one analyzed incident, as journaled and stored."""
+    try:
+        analysis = json.loads(result.get("analysis", "{}"))
+    except (TypeError, ValueError):
+        analysis = {}
+    return {
+        "id": incident_id,
+        "visual_vector": visual_vector,
+        # Local strategies also return "vector_full", but that is the SigLIP vector;
+        # only the cloud's 1536-d text embedding belongs in the fast lane.
+        "text_vector": result.get("vector_full") if mode == "cloud" else None,
+        "payload": {
+            "id": incident_id,
+            "source": "production",
+            "mode": mode,
+            "timestamp": time.time(),
+            "detections": sorted(set(detections or [])),
+            # "analysis" is what reference lookups summarize and link rules by.
+            "analysis": analysis.get("detected_issues"),
+            # The LLM writes "Low"/"Medium"/"High"; retention rules match the lowercase form.
+            "severity": (analysis.get("severity") or "").lower() or None,
+            "problem_description": analysis.get("analysis"),
+            "recommended_action": analysis.get("advice"),
+        },
+    }
+
+
+class IncidentWriter:
+    """
+    Write-behind persistence of analyzed incidents into rail_safety_logs.
+    submit() only hands the record to a journal thread, which appends it to a
+    local SQLite journal; a background thread upserts journaled incidents in batches (when `batch_size` are waiting,
+    every `flush_seconds`, and on close) and removes them from the journal
+    once Qdrant has them. Whatever is still journaled at startup is replayed.
+    Each process journals to its own "<name>.<pid><ext>" file next to
+    `journal_path`; at start() the one worker holding "<journal_path>.lock"
+    takes over the journals of processes that are gone (and a legacy
+    `journal_path` file), so nothing is replayed twice.
+    """
+    def __init__(self, memory, batch_size=WRITE_BATCH, flush_seconds=WRITE_FLUSH_SECONDS, journal_path=WRITE_JOURNAL):
+        self.memory = memory
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+        self.base_path = journal_path
+        stem, ext = os.path.splitext(journal_path)
+        self.journal_path = f"{stem}.{os.getpid()}{ext}"
+        self._conn = sqlite3.connect(self.journal_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pending (seq INTEGER PRIMARY KEY AUTOINCREMENT, record TEXT)")
+        self._conn.commit()
+        self._replay_lock = None
+        # _lock guards the SQLite connection; _count_lock the in-memory counters submit() touches.
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="incident-journal")
+        self._pending = self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+        # Bumped after every batch reaches Qdrant; caches of reference lookups key on it.
+        self.generation = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "errors": 0, "last_error": None,
+                       "write_seconds": 0.0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        if self._own_replay():
+            self._adopt_orphans()
+        replay = self.pending()
+        if replay:
+            print(f" Replaying {replay} journaled incidents...")
+            self._wake.set()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="incident-writer", daemon=True)
+        self._thread.start()
+
+    def _own_replay(self):
+        """Takes the replay lock shared by all workers on this journal; True if this process holds it."""
+        if self._replay_lock is not None or fcntl is None:
+            return True
+        handle = open(f"{self.base_path}.lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Held (open) for the life of the process; the OS releases it if the worker dies.
+        self._replay_lock = handle
+        return True
+
+    def _orphan_journals(self):
+        stem, ext = os.path.splitext(self.base_path)
+        orphans = [self.base_path] if os.path.exists(self.base_path) else []
+        if fcntl is None:
+            return orphans
+        for path in glob.glob(f"{glob.escape(stem)}.*{ext}"):
+            pid = path[len(stem) + 1:len(path) - len(ext)]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                orphans.append(path)
+        return orphans
+
+    def _adopt_orphans(self):
+        """Moves what dead workers (or a pre-per-worker journal) left into this process's journal."""
+        for path in self._orphan_journals():
+            try:
+                orphan = sqlite3.connect(path)
+                try:
+                    rows = orphan.execute("SELECT record FROM pending ORDER BY seq").fetchall()
+                except sqlite3.OperationalError:
+                    rows = []
+                finally:
+                    orphan.close()
+                with self._lock:
+                    self._conn.executemany("INSERT INTO pending (record) VALUES (?)", rows)
+                    self._conn.commit()
+                with self._count_lock:
+                    self._pending += len(rows)
+                for leftover in (path, f"{path}-wal", f"{path}-shm"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            except Exception as e:
+                print(f" Warning: could not take over journal {path}. {e}")
+
+    def submit(self, record):
+        """Queues one incident_record() for journaling and returns at once; safe on the event loop."""
+        with self._count_lock:
+            self._stats["submitted"] += 1
+            self._pending += 1
+            pending = self._pending
+        self._journal_writer.submit(self._journal, record)
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def _journal(self, record):
+        try:
+            with self._lock:
+                self._conn.execute("INSERT INTO pending (record) VALUES (?)", (json.dumps(record),))
+                self._conn.commit()
+        except Exception as e:
+            with self._count_lock:
+                self._pending -= 1
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+            print(f" Warning: incident {record.get('id')} could not be journaled. {e}")
+
+    def pending(self):
+        with self._count_lock:
+            return self._pending
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+                print(f" Warning: incident write failed, keeping it journaled. {e}")
+                self._stop.wait(RETRY_SECONDS)
+
+    def flush(self):
+        """Writes everything journaled so far, one batched upsert per `batch_size` incidents."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT seq, record FROM pending ORDER BY seq LIMIT ?", (self.batch_size,)
+                    ).fetchall()
+                if not rows:
+                    return
+                started = time.perf_counter()
+                self._write([json.loads(record) for _, record in rows])
+                with self._lock:
+                    self._conn.execute("DELETE FROM pending WHERE seq <= ?", (rows[-1][0],))
+                    self._conn.commit()
+                with self._count_lock:
+                    self.generation += 1
+                    self._pending -= len(rows)
+                    self._stats["written"] += len(rows)
+                    self._stats["batches"] += 1
+                    self._stats["write_seconds"] += time.perf_counter() - started
+
+    def _write(self, records):
+        memory = self.memory
+        rules = memory.rules_for(sorted({problem_summary(r["payload"]) for r in records}))
+        points = []
+        for r in records:
+            vectors = {}
+            if r.get("visual_vector"):
+                vectors["offline_lane"] = memory._pad_vector(r["visual_vector"], 768)
+            if r.get("text_vector"):
+                vectors.update(fast_lane_vectors(r["text_vector"], memory.fast_prefixes))
+            if not vectors:
+                continue
+            payload = dict(r["payload"], related_rules=rules[problem_summary(r["payload"])])
+            points.append(models.PointStruct(id=r["id"], vector=vectors, payload=payload))
+        if points:
+            memory.client.upsert(collection_name=memory.collection_images, points=points, wait=True)
+
+    def close(self):
+        """Stops the worker and writes what is left; anything that fails stays journaled."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_seconds + 5)
+        # Everything submitted so far reaches the journal before the last flush.
+        self._journal_writer.shutdown(wait=True)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f" Warning: {self.pending()} incidents left in the journal. {e}")
+            return
+        # An empty journal is not worth leaving for the next replay owner.
+        with self._lock:
+            if self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0] == 0:
+                self._conn.close()
+                for leftover in (self.journal_path, f"{self.journal_path}-wal", f"{self.journal_path}-shm"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+
+    def stats(self):
+        with self._count_lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+        stats["batch_size"] = self.batch_size
+        stats["flush_seconds"] = self.flush_seconds
+        return stats
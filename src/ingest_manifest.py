@@ -0,0 +1,150 @@
+import os
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+MANIFEST_PATH = os.environ.get("FELIX_INGEST_MANIFEST", "ingest_manifest.sqlite")
+# Fixed namespace so the same content always maps to the same Qdrant point id.
+POINT_NAMESPACE = uuid.UUID("6f1c2a52-0a57-4d8e-9a3e-5f6b0c7d9e21")
+
+
+@dataclass
+class FileState:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_point_id(sha256, chunk=None):
+    """Deterministic point id: one per image, or one per chunk of a document."""
+    name = sha256 if chunk is None else f"{sha256}:{chunk}"
+    return str(uuid.uuid5(POINT_NAMESPACE, name))
+
+
+class IngestManifest:
+    """
+    Records what bulk_ingest has already stored, keyed by file path, with the
+    size/mtime/sha256 seen at ingestion and how many points it produced.
+    Unchanged files are skipped on a stat() alone; a file is only marked done
+    after its points are upserted, so an interrupted run resumes where it
+    stopped. Safe to share between the ingestion pipeline's threads.
+    """
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, kind TEXT, size INTEGER, mtime_ns INTEGER,"
+            " sha256 TEXT, point_count INTEGER, updated REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_sha ON files (kind, sha256)")
+        self._conn.commit()
+
+    def _row(self, path):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT size, mtime_ns, sha256, point_count FROM files WHERE path = ?", (path,)
+            ).fetchone()
+
+    def stat_changed(self, path):
+        """Returns the os.stat() result if size/mtime differ from the manifest, else None."""
+        st = os.stat(path)
+        row = self._row(path)
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return None
+        return st
+
+    def resolve(self, path, st, digest):
+        """
+        Returns a FileState if `digest` differs from what was ingested for
+        `path`, else None. Touched but identical files (copy, checkout...) only
+        get their stat refreshed and keep their points.
+        """
+        row = self._row(path)
+        if row and row[2] == digest:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ?, updated = ? WHERE path = ?",
+                    (st.st_size, st.st_mtime_ns, time.time(), path)
+                )
+                self._conn.commit()
+            return None
+        return FileState(path, st.st_size, st.st_mtime_ns, digest)
+
+    def check(self, path):
+        """Returns a FileState if `path` is new or its content changed, else None."""
+        st = self.stat_changed(path)
+        if st is None:
+            return None
+        return self.resolve(path, st, file_sha256(path))
+
+    def _obsolete_ids(self, kind, sha256, point_count, exclude_path):
+        """Point ids of an old version, unless another file still holds the same content."""
+        if not sha256 or not point_count:
+            return []
+        with self._lock:
+            shared = self._conn.execute(
+                "SELECT 1 FROM files WHERE kind = ? AND sha256 = ? AND path != ? LIMIT 1",
+                (kind, sha256, exclude_path)
+            ).fetchone()
+        if shared:
+            return []
+        if kind == "image":
+            return [content_point_id(sha256)]
+        return [content_point_id(sha256, i) for i in range(point_count)]
+
+    def record(self, kind, state, point_count):
+        """Marks `state` as ingested and returns the point ids its previous version left behind."""
+        with self._lock:
+            old = self._row(state.path)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, kind, size, mtime_ns, sha256, point_count, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (state.path, kind, state.size, state.mtime_ns, state.sha256, point_count, time.time())
+            )
+            self._conn.commit()
+        if old and old[2] != state.sha256:
+            return self._obsolete_ids(kind, old[2], old[3], state.path)
+        return []
+
+    def remove_missing(self, kind, seen_paths):
+        """Forgets files of `kind` that are no longer on disk and returns their point ids."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, sha256, point_count FROM files WHERE kind = ?", (kind,)
+            ).fetchall()
+            gone = [row for row in rows if row[0] not in seen_paths]
+            for path, _, _ in gone:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._conn.commit()
+        obsolete = []
+        for _, sha256, point_count in gone:
+            obsolete.extend(self._obsolete_ids(kind, sha256, point_count, exclude_path=""))
+        return sorted(set(obsolete))
+
+    def count(self, kind=None):
+        with self._lock:
+            if kind:
+                return self._conn.execute("SELECT COUNT(*) FROM files WHERE kind = ?", (kind,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def reset(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
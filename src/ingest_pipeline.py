@@ -0,0 +1,251 @@
+import os
+import time
+import queue
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from src.image_input import ImageInput
+from src.ingest_manifest import content_point_id
+
+DECODE_WORKERS = int(os.environ.get("FELIX_INGEST_DECODE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+INFER_BATCH = int(os.environ.get("FELIX_INGEST_BATCH", 32))
+UPSERT_BATCH = int(os.environ.get("FELIX_INGEST_UPSERT_BATCH", 256))
+WRITERS = int(os.environ.get("FELIX_INGEST_WRITERS", 2))
+# Batches allowed to wait between two stages before the upstream one blocks.
+QUEUE_DEPTH = int(os.environ.get("FELIX_INGEST_QUEUE", 4))
+
+_DONE = object()
+_processor = None
+
+
+def _init_decoder():
+    global _processor
+    from transformers import AutoProcessor
+    from src.models import SIGLIP_MODEL
+    _processor = AutoProcessor.from_pretrained(SIGLIP_MODEL)
+
+
+def prepare_image(path):
+    """
+    Worker-process stage: read, hash, decode and preprocess one image.
+    Returns (path, sha256, pixel_values, error, seconds); pixel_values is (3, H, W) float32.
+    """
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        # Only SigLIP consumes it: a DCT-scaled decode straight to ~224 px.
+        image = ImageInput(data, name=path, consumers=("siglip",)).siglip_image
+        pixels = _processor(images=image, return_tensors="np")["pixel_values"][0].astype(np.float32)
+        return path, hashlib.sha256(data).hexdigest(), pixels, None, time.perf_counter() - started
+    except Exception as e:
+        return path, None, None, str(e), time.perf_counter() - started
+
+
+class StageStats:
+    """
+    Items and busy time for one pipeline stage, summed over its `workers`.
+    Busy time excludes waiting on queues, so items_per_sec is what the stage
+    could sustain and utilization shows how close it is to being the bottleneck.
+    """
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def report(self, wall):
+        return {
+            "items": self.items,
+            "busy_seconds": self.busy,
+            "workers": self.workers,
+            "items_per_sec": self.items * self.workers / self.busy if self.busy else 0.0,
+            "utilization": self.busy / (wall * self.workers) if wall else 0.0,
+        }
+
+
+class ImageIngestPipeline:
+    """
+    Staged image ingestion into rail_safety_logs:
+    decode + preprocess in a process pool -> batched SigLIP forward passes ->
+    parallel upsert writers. Bounded queues between the stages give
+    backpressure, so memory stays flat and the slowest stage sets the pace.
+    Files are recorded in the manifest only after their upsert completes.
+    """
+    def __init__(self, client, collection, manifest, embedding_service, payload_fn,
+                 decode_workers=DECODE_WORKERS, batch_size=INFER_BATCH, upsert_batch=UPSERT_BATCH,
+                 writers=WRITERS, queue_depth=QUEUE_DEPTH):
+        self.client = client
+        self.collection = collection
+        self.manifest = manifest
+        self.embedding_service = embedding_service
+        self.payload_fn = payload_fn
+        self.decode_workers = max(1, decode_workers)
+        self.batch_size = max(1, batch_size)
+        self.upsert_batch = max(1, upsert_batch)
+        self.writers = max(1, writers)
+        self.queue_depth = max(1, queue_depth)
+        self.stats = {
+            "decode": StageStats("decode", self.decode_workers),
+            "embed": StageStats("embed"),
+            "write": StageStats("write", self.writers),
+        }
+        self.skipped = 0
+        self.failed = 0
+        self._error = None
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+
+    def _decode(self, candidates, decoded):
+        """Feeds the process pool, keeping a bounded number of files in flight."""
+        max_in_flight = self.decode_workers * 4
+        pending = deque()
+
+        def drain_one():
+            future, st = pending.popleft()
+            path, digest, pixels, error, seconds = future.result()
+            self.stats["decode"].add(1, seconds)
+            decoded.put((path, st, digest, pixels, error))
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.decode_workers, initializer=_init_decoder) as pool:
+                for path, st in candidates:
+                    if self._error:
+                        break
+                    pending.append((pool.submit(prepare_image, path), st))
+                    if len(pending) >= max_in_flight:
+                        drain_one()
+                while pending and not self._error:
+                    drain_one()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            decoded.put(_DONE)
+
+    def _embed(self, decoded, to_write):
+        from qdrant_client.models import PointStruct
+        points, states = [], []
+
+        def flush_points():
+            nonlocal points, states
+            if points:
+                to_write.put((points, states))
+                points, states = [], []
+
+        finished = False
+        try:
+            while not finished:
+                batch = []
+                while len(batch) < self.batch_size:
+                    item = decoded.get()
+                    if item is _DONE:
+                        finished = True
+                        break
+                    path, st, digest, pixels, error = item
+                    if error:
+                        print(f"   [!] Error image {path}: {error}")
+                        self.failed += 1
+                        continue
+                    state = self.manifest.resolve(path, st, digest)
+                    if state is None:
+                        self.skipped += 1
+                        continue
+                    batch.append((state, pixels))
+                if not batch or self._error:
+                    continue
+
+                started = time.perf_counter()
+                vectors = self.embedding_service.embed_pixels(np.stack([pixels for _, pixels in batch]))
+                self.stats["embed"].add(len(batch), time.perf_counter() - started)
+
+                for (state, _), vector in zip(batch, vectors):
+                    points.append(PointStruct(
+                        id=content_point_id(state.sha256),
+                        vector={"offline_lane": vector},
+                        payload=self.payload_fn(state)
+                    ))
+                    states.append(state)
+                if len(points) >= self.upsert_batch:
+                    flush_points()
+            flush_points()
+        except Exception as e:
+            self._fail(e)
+            # Keep draining so the decoder never blocks on a full queue.
+            while not finished and decoded.get() is not _DONE:
+                pass
+        finally:
+            for _ in range(self.writers):
+                to_write.put(_DONE)
+
+    def _write(self, to_write):
+        from qdrant_client.models import PointIdsList
+        while True:
+            item = to_write.get()
+            if item is _DONE:
+                return
+            if self._error:
+                continue
+            points, states = item
+            started = time.perf_counter()
+            try:
+                self.client.upsert(self.collection, points, wait=True)
+                for state in states:
+                    obsolete = self.manifest.record("image", state, 1)
+                    if obsolete:
+                        self.client.delete(self.collection, points_selector=PointIdsList(points=obsolete))
+            except Exception as e:
+                self._fail(e)
+                continue
+            self.stats["write"].add(len(points), time.perf_counter() - started)
+
+    def run(self, candidates):
+        """
+        Ingests `candidates`, an iterable of (path, os.stat_result) for files
+        whose stat differs from the manifest. Returns a per-stage report.
+        """
+        started = time.perf_counter()
+        decoded = queue.Queue(maxsize=self.batch_size * self.queue_depth)
+        to_write = queue.Queue(maxsize=self.queue_depth)
+
+        embedder = threading.Thread(target=self._embed, args=(decoded, to_write), name="ingest-embed", daemon=True)
+        embedder.start()
+        with ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix="ingest-write") as writers:
+            for _ in range(self.writers):
+                writers.submit(self._write, to_write)
+            self._decode(candidates, decoded)
+            embedder.join()
+
+        if self._error:
+            raise self._error
+        wall = time.perf_counter() - started
+        report = {name: stats.report(wall) for name, stats in self.stats.items()}
+        report["total"] = {
+            "ingested": self.stats["write"].items,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "seconds": wall,
+            "images_per_sec": self.stats["write"].items / wall if wall else 0.0,
+        }
+        return report
+
+
+def print_report(report):
+    for name in ("decode", "embed", "write"):
+        stage = report[name]
+        print(f"   {name:<7} {stage['items']:>7} items  {stage['items_per_sec']:>8.1f}/s busy  "
+              f"{stage['utilization'] * 100:>5.0f}% utilized")
+    total = report["total"]
+    print(f"   total   {total['ingested']} ingested, {total['skipped']} unchanged, {total['failed']} failed "
+          f"in {total['seconds']:.1f}s ({total['images_per_sec']:.1f} images/s)")
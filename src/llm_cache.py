@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+from src.cache import CACHE_SIZE, LRUCache, normalize_context
+
+LLM_CACHE_PATH = os.environ.get("FELIX_LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.environ.get("FELIX_LLM_CACHE_TTL", 7 * 24 * 3600))
+# Cosine similarity between user contexts above which a cached answer is reused; 0 (default) disables.
+# Opt-in only: short contexts with opposite meanings ("crack on rail" / "no crack on rail")
+# embed above 0.95 and would get each other's severity and advice.
+SEMANTIC_THRESHOLD = float(os.environ.get("FELIX_LLM_SEMANTIC_THRESHOLD", 0))
+SEMANTIC_MAX_PER_SCOPE = int(os.environ.get("FELIX_LLM_SEMANTIC_MAX", 512))
+
+
+def prompt_version(*parts):
+    """Fingerprint of the prompt templates and model names an answer depends on."""
+    return hashlib.sha256("\x00".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _embed_context(text):
+    from src.models import registry
+    model = registry.get("text_embedding")
+    if model is None:
+        return None
+    vector = np.asarray(next(iter(model.embed([text]))), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class LLMCache:
+    """
+    Cache of LLM answers, per `kind` ("ollama", "cloud").
+    Exact tier: keyed by prompt version (templates + models), scope (what the
+    prompt is built from besides the user context: sorted detections, image
+    digest...) and normalized context; memory LRU in front of SQLite.
+    Semantic tier (off unless `threshold` > 0): within the same version and
+    scope, a context whose embedding is within `threshold` of a cached one
+    reuses that answer.
+    Entries from another prompt version are never served and are purged by
+    invalidate().
+    """
+    def __init__(self, path=LLM_CACHE_PATH, max_items=CACHE_SIZE, ttl=LLM_CACHE_TTL,
+                 threshold=SEMANTIC_THRESHOLD, embed_fn=_embed_context):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embed_fn = embed_fn
+        self.memory = LRUCache(max_items, ttl)
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, kind TEXT, version TEXT, scope TEXT,"
+                " vector BLOB, value TEXT, expires REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_scope ON llm_cache (kind, version, scope)")
+            self._conn.commit()
+        # (kind, version, scope) -> (keys, matrix of unit context vectors)
+        self._semantic = {}
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, version, scope, context):
+        raw = json.dumps([kind, version, scope, normalize_context(context)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, kind, field):
+        with self._stats_lock:
+            counters = self._stats.setdefault(
+                kind, {"memory_hits": 0, "disk_hits": 0, "semantic_hits": 0, "misses": 0}
+            )
+            counters[field] += 1
+
+    def _disk_get(self, key):
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def _semantic_index(self, kind, version, scope):
+        index_key = (kind, version, scope)
+        if index_key in self._semantic:
+            return self._semantic[index_key]
+        keys, vectors = [], []
+        if self._conn is not None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM llm_cache WHERE kind = ? AND version = ? AND scope = ?"
+                    " AND vector IS NOT NULL AND expires > ? ORDER BY expires DESC LIMIT ?",
+                    (kind, version, scope, time.time(), SEMANTIC_MAX_PER_SCOPE)
+                ).fetchall()
+            for key, blob in rows:
+                keys.append(key)
+                vectors.append(np.frombuffer(blob, dtype=np.float32))
+        index = (keys, np.stack(vectors) if vectors else None)
+        self._semantic[index_key] = index
+        return index
+
+    def _semantic_get(self, kind, version, scope, vector):
+        keys, matrix = self._semantic_index(kind, version, scope)
+        if matrix is None or vector is None:
+            return None
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        value = self.memory.get(keys[best], None)
+        return value if value is not None else self._disk_get(keys[best])
+
+    def get(self, kind, version, scope, context):
+        """Cached answer for this prompt, or None. Returns (value, context_vector) for set()."""
+        key = self.key(kind, version, scope, context)
+        value = self.memory.get(key, None)
+        if value is not None:
+            self._count(kind, "memory_hits")
+            return value, None
+        value = self._disk_get(key)
+        if value is not None:
+            self.memory.set(key, value)
+            self._count(kind, "disk_hits")
+            return value, None
+
+        vector = None
+        if self.threshold > 0 and normalize_context(context):
+            try:
+                vector = self.embed_fn(normalize_context(context))
+            except Exception:
+                vector = None
+            value = self._semantic_get(kind, version, scope, vector)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count(kind, "semantic_hits")
+                return value, vector
+        self._count(kind, "misses")
+        return None, vector
+
+    def set(self, kind, version, scope, context, value, vector=None):
+        key = self.key(kind, version, scope, context)
+        self.memory.set(key, value)
+        if self._conn is not None:
+            try:
+                encoded = json.dumps(value)
+            except (TypeError, ValueError):
+                return
+            blob = vector.astype(np.float32).tobytes() if vector is not None else None
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, kind, version, scope, vector, value, expires)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, kind, version, scope, blob, encoded, time.time() + self.ttl)
+                )
+                self._conn.commit()
+        if vector is not None:
+            keys, matrix = self._semantic_index(kind, version, scope)
+            matrix = vector[None, :] if matrix is None else np.vstack([matrix, vector])[-SEMANTIC_MAX_PER_SCOPE:]
+            self._semantic[(kind, version, scope)] = ((keys + [key])[-SEMANTIC_MAX_PER_SCOPE:], matrix)
+
+    def get_or_compute(self, kind, version, scope, context, compute, cacheable=None):
+        value, vector = self.get(kind, version, scope, context)
+        if value is not None:
+            return value
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self.set(kind, version, scope, context, value, vector)
+        return value
+
+    def invalidate(self, kind=None, keep_version=None):
+        """
+        Drops cached answers of `kind` (all kinds if None), except those made
+        with `keep_version`. Called at startup with the current prompt version
+        so answers from old prompts or models do not linger on disk.
+        """
+        self.memory.clear()
+        self._semantic.clear()
+        if self._conn is None:
+            return
+        query, params = "DELETE FROM llm_cache WHERE 1 = 1", []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if keep_version:
+            query += " AND version != ?"
+            params.append(keep_version)
+        with self._lock:
+            self._conn.execute(query, params)
+            self._conn.commit()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {kind: dict(counters) for kind, counters in self._stats.items()}
+        for counters in stats.values():
+            hits = counters["memory_hits"] + counters["disk_hits"] + counters["semantic_hits"]
+            total = hits + counters["misses"]
+            counters["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,185 @@
+import os
+import time
+
+import numpy as np
+from qdrant_client import models
+
+from src.schema import COLLECTION_IMAGES
+
+DUPLICATE_THRESHOLD = float(os.environ.get("FELIX_DUPLICATE_THRESHOLD", 0.98))
+DUPLICATE_NEIGHBORS = int(os.environ.get("FELIX_DUPLICATE_NEIGHBORS", 16))
+# "<field>=<value>:<days>" entries, "*:<days>" for everything else; 0 days keeps forever.
+# Only points carrying a "timestamp" (production incidents) are ever expired.
+RETENTION_RULES = os.environ.get("FELIX_RETENTION_RULES", "severity=low:30,severity=medium:180,*:0")
+
+
+def parse_retention_rules(spec=RETENTION_RULES):
+    """'severity=low:30,*:365' -> [("severity", "low", 30.0), (None, None, 365.0)]"""
+    rules = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        condition, days = entry.rsplit(":", 1)
+        if condition == "*":
+            rules.append((None, None, float(days)))
+        else:
+            field, value = condition.split("=", 1)
+            rules.append((field.strip(), value.strip(), float(days)))
+    return rules
+
+
+def _match(value):
+    # Incidents stored before severity was normalized carry the LLM's casing ("Low").
+    return models.MatchAny(any=sorted({value, value.lower(), value.capitalize(), value.upper()}))
+
+
+def expire_incidents(client, rules, collection=COLLECTION_IMAGES, now=None, dry_run=False):
+    """Deletes timestamped points older than their rule's age; returns the number of points matched per rule."""
+    now = now or time.time()
+    removed = {}
+    for field, value, days in rules:
+        label = f"{field}={value}" if field else "*"
+        if days <= 0:
+            continue
+        must = [models.FieldCondition(key="timestamp", range=models.Range(lt=now - days * 86400))]
+        must_not = []
+        if field:
+            must.append(models.FieldCondition(key=field, match=_match(value)))
+        else:
+            # The catch-all rule only covers values no specific rule mentions.
+            for other_field, other_value, _ in rules:
+                if other_field:
+                    must_not.append(models.FieldCondition(key=other_field, match=_match(other_value)))
+        selector = models.Filter(must=must, must_not=must_not or None)
+        removed[label] = client.count(collection_name=collection, count_filter=selector, exact=True).count
+        if removed[label] and not dry_run:
+            client.delete(collection_name=collection, points_selector=models.FilterSelector(filter=selector))
+    return removed
+
+
+def _iter_vectors(client, collection, lane, page_size):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=page_size, offset=offset,
+            with_payload=["timestamp", "occurrences", "first_seen", "last_seen", "severity", "status"],
+            with_vectors=[lane]
+        )
+        yield [p for p in points if isinstance(p.vector, dict) and p.vector.get(lane)]
+        if offset is None:
+            return
+
+
+def _same_incident(a, b):
+    # Stored severities may still carry the LLM's casing ("Low").
+    return ((a.get("severity") or "").lower() == (b.get("severity") or "").lower()
+            and a.get("status") == b.get("status"))
+
+
+def find_duplicate_groups(client, collection=COLLECTION_IMAGES, lane="offline_lane",
+                          threshold=DUPLICATE_THRESHOLD, neighbors=DUPLICATE_NEIGHBORS, page_size=256):
+    """
+    Groups production points whose `lane` vectors are closer than `threshold`
+    (cosine) to a representative, with the same severity and status. Grouping
+    is not transitive: A~B and B~C do not put A and C together unless both are
+    close to the representative. The first unassigned point of a group is its
+    representative; curated dataset points are never members. Every stored
+    vector is looked up once, a page at a time, through one batched query.
+    Returns (groups, payloads): lists of point ids with 2+ members, the
+    representative first, and the payload fields needed to merge them.
+    """
+    groups = []
+    assigned = set()
+    payloads = {}
+    search_params = models.SearchParams(quantization=models.QuantizationSearchParams(rescore=True))
+    for page in _iter_vectors(client, collection, lane, page_size):
+        if not page:
+            continue
+        for point in page:
+            payloads[point.id] = point.payload or {}
+        responses = client.query_batch_points(
+            collection_name=collection,
+            requests=[
+                models.QueryRequest(
+                    query=point.vector[lane], using=lane, limit=neighbors + 1,
+                    score_threshold=threshold, params=search_params,
+                    with_payload=["timestamp", "severity", "status"]
+                )
+                for point in page
+            ]
+        )
+        for point, response in zip(page, responses):
+            if point.id in assigned:
+                continue
+            assigned.add(point.id)
+            members = [point.id]
+            for match in response.points:
+                payload = match.payload or {}
+                if (match.id in assigned or payload.get("timestamp") is None
+                        or not _same_incident(payloads[point.id], payload)):
+                    continue
+                assigned.add(match.id)
+                members.append(match.id)
+            if len(members) > 1:
+                groups.append(members)
+    return groups, payloads
+
+
+def merge_duplicates(client, groups, payloads, collection=COLLECTION_IMAGES, dry_run=False):
+    """
+    Keeps each group's representative (its first member), gives it the
+    group's occurrence count and first/last seen times, and deletes the other
+    members. Curated dataset points are never deleted (bulk_ingest owns them).
+    Returns the number of points removed.
+    """
+    removed = 0
+    for members in groups:
+        keep = members[0]
+        drop = [m for m in members[1:] if payloads.get(m, {}).get("timestamp") is not None]
+        merged_ids = [keep] + drop
+        occurrences = sum(payloads.get(m, {}).get("occurrences", 1) for m in merged_ids)
+        times = [t for m in merged_ids for t in (
+            payloads.get(m, {}).get("first_seen"), payloads.get(m, {}).get("last_seen"),
+            payloads.get(m, {}).get("timestamp")
+        ) if t is not None]
+        removed += len(drop)
+        if dry_run or not drop:
+            continue
+        merged = {"occurrences": occurrences}
+        if times:
+            merged.update(first_seen=min(times), last_seen=max(times))
+        client.set_payload(collection_name=collection, payload=merged, points=[keep])
+        client.delete(collection_name=collection, points_selector=models.PointIdsList(points=drop))
+    return removed
+
+
+def optimize_collection(client, collection=COLLECTION_IMAGES, timeout=600):
+    """Asks Qdrant to re-run its optimizers (vacuum deleted points, merge segments) and waits for green."""
+    client.update_collection(collection_name=collection, optimizers_config=models.OptimizersConfigDiff())
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.get_collection(collection).status == models.CollectionStatus.GREEN:
+            return True
+        time.sleep(1)
+    return False
+
+
+def sample_queries(client, collection=COLLECTION_IMAGES, lane="offline_lane", count=100):
+    points, _ = client.scroll(collection_name=collection, limit=count, with_vectors=[lane])
+    return [p.vector[lane] for p in points if isinstance(p.vector, dict) and p.vector.get(lane)]
+
+
+def collection_report(client, queries, collection=COLLECTION_IMAGES, lane="offline_lane", k=3):
+    info = client.get_collection(collection)
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        client.query_points(collection_name=collection, query=q, using=lane, limit=k, with_payload=True)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "points": info.points_count,
+        "segments": info.segments_count,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if latencies else None,
+    }
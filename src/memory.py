@@ -1,32 +1,135 @@
-from qdrant_client import QdrantClient, models
+import os
+from qdrant_client import models
+from src.cache import LRUCache
+from src.models import registry
+from src.qdrant_backend import get_client
+from src.schema import (
+    COLLECTION_IMAGES, COLLECTION_KNOWLEDGE, FAST_LANE_DIM, MATRYOSHKA_PREFIXES,
+    ensure_collections, fast_lane_name, fast_lane_vectors, get_profile, matryoshka_slice
+)
 
-class MemorySystem:
-    def __init__(self, path="qdrant_db"):
-        self.client = QdrantClient(path=path)
-        self.collection_images = "rail_safety_logs"
-        self.collection_knowledge = "expert_knowledge"
-
-        if not self.client.collection_exists(self.collection_images):
-            print(f" Creating collection '{self.collection_images}'...")
-            self.client.create_collection(
-                collection_name=self.collection_images,
-                vectors_config={
-                    "fast_lane": models.VectorParams(size=1536, distance=models.Distance.COSINE),
-                    "offline_lane": models.VectorParams(size=768, distance=models.Distance.COSINE),
-                }
-            )
+BINARY_RESCORE = os.environ.get("FELIX_BINARY_RESCORE", "1") != "0"
+BINARY_OVERSAMPLING = float(os.environ.get("FELIX_BINARY_OVERSAMPLING", 3.0))
+MATRYOSHKA_CANDIDATES = int(os.environ.get("FELIX_MATRYOSHKA_CANDIDATES", 20))
+RULES_PER_CASE = 2
+RULE_MIN_SCORE = 0.5
+QUERY_EMBED_CACHE = int(os.environ.get("FELIX_QUERY_EMBED_CACHE", 256))
+RULES_CACHE_TTL = float(os.environ.get("FELIX_RULES_CACHE_TTL", 3600))
+# Distinct problem summaries embedded and searched per batched request when linking rules.
+LINK_BATCH = int(os.environ.get("FELIX_LINK_BATCH", 256))
+
+def matryoshka_query(query_vector, limit, prefixes, candidates=MATRYOSHKA_CANDIDATES):
+    """
+    Coarse-to-fine fast lane query (kwargs for query_points): the smallest prefix
+    shortlists `limit * candidates` points, each larger prefix re-ranks the
+    survivors, and the largest available resolution gives the final order.
+    """
+    dims = [d for d in prefixes if d <= len(query_vector)]
+    if len(query_vector) >= FAST_LANE_DIM or not dims:
+        dims.append(FAST_LANE_DIM)
+
+    prefetch = None
+    stage_limit = limit * candidates
+    for dim in dims[:-1]:
+        prefetch = models.Prefetch(
+            query=matryoshka_slice(query_vector, dim),
+            using=fast_lane_name(dim),
+            limit=stage_limit,
+            prefetch=prefetch
+        )
+        stage_limit = max(limit, stage_limit // 4)
+
+    final_dim = dims[-1]
+    if final_dim == FAST_LANE_DIM:
+        final_query = fast_lane_vectors(query_vector, prefixes=[])["fast_lane"]
+    else:
+        final_query = matryoshka_slice(query_vector, final_dim)
+    return {"query": final_query, "using": fast_lane_name(final_dim), "prefetch": prefetch}
+
+def problem_summary(payload):
+    return payload.get("analysis") or payload.get("status") or "rail defect"
+
+def search_rules(client, query_vectors, limit=RULES_PER_CASE):
+    """One batched query over expert_knowledge; the rule texts found for each vector."""
+    responses = client.query_batch_points(
+        collection_name=COLLECTION_KNOWLEDGE,
+        requests=[
+            models.QueryRequest(query=v, using="text_vector", limit=limit, with_payload=True)
+            for v in query_vectors
+        ]
+    )
+    return [[d.payload.get("content") for d in r.points if d.score > RULE_MIN_SCORE] for r in responses]
+
+def link_related_rules(client, text_model, page_size=1000):
+    """
+    Precomputes the rules for every stored incident and writes them to its
+    payload as "related_rules", so reference lookups need no text embedding
+    and no second query. Incidents are grouped by problem summary, so each
+    summary is embedded and searched once. Production incidents carry
+    free-text summaries, so there can be as many summaries as incidents:
+    they are embedded and searched LINK_BATCH at a time.
+    """
+    ids_by_summary = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=COLLECTION_IMAGES, limit=page_size, offset=offset,
+            with_payload=["analysis", "status"], with_vectors=False
+        )
+        for point in points:
+            ids_by_summary.setdefault(problem_summary(point.payload or {}), []).append(point.id)
+        if offset is None:
+            break
+    if not ids_by_summary:
+        return {}
 
-        if not self.client.collection_exists(self.collection_knowledge):
-            print(f" Creating collection '{self.collection_knowledge}'...")
-            self.client.create_collection(
-                collection_name=self.collection_knowledge,
-                vectors_config={
-                    "text_vector": models.VectorParams(size=384, distance=models.Distance.COSINE)
-                }
+    summaries = sorted(ids_by_summary)
+    rules = {}
+    for start in range(0, len(summaries), LINK_BATCH):
+        chunk = summaries[start:start + LINK_BATCH]
+        vectors = [v.tolist() for v in text_model.embed(chunk)]
+        rules.update(zip(chunk, search_rules(client, vectors)))
+    for summary, ids in ids_by_summary.items():
+        for start in range(0, len(ids), page_size):
+            client.set_payload(
+                collection_name=COLLECTION_IMAGES,
+                payload={"related_rules": rules[summary]},
+                points=ids[start:start + page_size]
             )
-        
-        from fastembed import TextEmbedding
-        self.text_model = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
+    return {summary: len(ids) for summary, ids in ids_by_summary.items()}
+
+def reference_notice(ref_case):
+    """The RAG notice a reference case adds to the prompt ("" when it is not confident enough)."""
+    if ref_case and ref_case['score'] > 0.75:
+        return f"\n[SYSTEM NOTICE]: Auto-detected similar historical incident: '{ref_case['problem_type']}'. Proven solution: '{ref_case['solution']}'."
+    return ""
+
+def inject_reference(context, ref_case):
+    """Appends the RAG notice for a confident reference case to the user context."""
+    notice = reference_notice(ref_case)
+    if notice:
+        print(f" RAG Injection: Found {ref_case['file_ref']} ({ref_case['score']:.2f})")
+    return context + notice
+
+class MemorySystem:
+    def __init__(self, path=None, client=None):
+        # Shared per-process client for the configured backend (src/qdrant_backend.py);
+        # `path` only selects another embedded store.
+        self.client = client or get_client(mode="embedded" if path else None, path=path)
+        self.collection_images = COLLECTION_IMAGES
+        self.collection_knowledge = COLLECTION_KNOWLEDGE
+        self.profile = get_profile()
+        ensure_collections(self.client, self.profile)
+        # Collections created before the multi-resolution fast lane only have "fast_lane".
+        vectors = self.client.get_collection(self.collection_images).config.params.vectors
+        self.fast_prefixes = [d for d in MATRYOSHKA_PREFIXES if fast_lane_name(d) in vectors]
+        self._query_vectors = LRUCache(max_items=QUERY_EMBED_CACHE, ttl=float("inf"))
+        self._rules = LRUCache(max_items=QUERY_EMBED_CACHE, ttl=RULES_CACHE_TTL)
+
+    @property
+    def text_model(self):
+        # Loaded on first knowledge search, not at construction.
+        return registry.get("text_embedding")
 
     def _pad_vector(self, vector, target_dim):
         current = len(vector)
@@ -34,43 +137,97 @@ class MemorySystem:
             return vector + [0.0] * (target_dim - current)
         return vector[:target_dim]
 
+    def embed_queries(self, texts):
+        """FastEmbed query vectors, LRU-cached: problem summaries repeat constantly."""
+        vectors = {text: self._query_vectors.get(text, None) for text in texts}
+        missing = [text for text, vector in vectors.items() if vector is None]
+        if missing:
+            for text, vector in zip(missing, self.text_model.embed(missing)):
+                vectors[text] = vector.tolist()
+                self._query_vectors.set(text, vectors[text])
+        return [vectors[text] for text in texts]
+
+    def rules_for(self, summaries):
+        """Related rules per problem summary, from cache or one batched knowledge query."""
+        rules = {summary: self._rules.get(summary, None) for summary in summaries}
+        missing = sorted(summary for summary, found in rules.items() if found is None)
+        if missing:
+            try:
+                found = search_rules(self.client, self.embed_queries(missing))
+            except Exception:
+                found = [[] for _ in missing]
+            for summary, rules_found in zip(missing, found):
+                rules[summary] = rules_found
+                self._rules.set(summary, rules_found)
+        return rules
+
     def save_incident(self, vector, mode, payload):
-        lane = "offline_lane" if mode in [3, 4] else "fast_lane"
-        target_dim = 768 if mode in [3, 4] else 1536
-        final_vector = self._pad_vector(vector, target_dim)
+        if "related_rules" not in payload:
+            summary = problem_summary(payload)
+            payload = dict(payload, related_rules=self.rules_for([summary])[summary])
+        if mode in [3, 4]:
+            vectors = {"offline_lane": self._pad_vector(vector, 768)}
+        else:
+            vectors = fast_lane_vectors(vector, self.fast_prefixes)
         self.client.upsert(
             collection_name=self.collection_images,
             points=[
                 models.PointStruct(
                     id=payload.get("id"),
-                    vector={lane: final_vector},
+                    vector=vectors,
                     payload=payload
                 )
             ]
         )
 
-    def search_similar(self, query_vector, mode, limit=3):
-        lane = "offline_lane" if mode in [3, 4] else "fast_lane"
-        target_dim = 768 if mode in [3, 4] else 1536
-        final_query = self._pad_vector(query_vector, target_dim)
+    def _binary_search_params(self, rescore):
+        """Scan over the quantized offline lane (1-bit in the default profile), optionally rescored with the float vectors."""
+        return models.SearchParams(
+            hnsw_ef=self.profile.hnsw_ef,
+            quantization=models.QuantizationSearchParams(
+                ignore=False,
+                rescore=rescore,
+                oversampling=BINARY_OVERSAMPLING if rescore else None
+            )
+        )
+
+    def _similar_query(self, query_vector, mode, limit, rescore=BINARY_RESCORE):
+        if mode in [3, 4]:
+            return {
+                "query": self._pad_vector(query_vector, 768),
+                "using": "offline_lane",
+                "search_params": self._binary_search_params(rescore)
+            }
+        return matryoshka_query(query_vector, limit, self.fast_prefixes)
 
+    def search_similar(self, query_vector, mode, limit=3, rescore=BINARY_RESCORE):
         results = self.client.query_points(
             collection_name=self.collection_images,
-            query=final_query,
-            using=lane,
             limit=limit,
             with_payload=True,
-            search_params=models.SearchParams(
-                quantization=models.QuantizationSearchParams(
-                    rescore=True
-                )
-            )
+            **self._similar_query(query_vector, mode, limit, rescore)
         ).points
         return results
 
+    def search_similar_batch(self, query_vectors, mode, limit=3):
+        """One Qdrant round trip for many image queries."""
+        requests = []
+        for vector in query_vectors:
+            query = self._similar_query(vector, mode, limit)
+            requests.append(models.QueryRequest(
+                query=query["query"],
+                using=query["using"],
+                prefetch=query.get("prefetch"),
+                params=query.get("search_params"),
+                limit=limit,
+                with_payload=True
+            ))
+        responses = self.client.query_batch_points(collection_name=self.collection_images, requests=requests)
+        return [r.points for r in responses]
+
     def search_knowledge(self, query_text, limit=3):
         """Recherche dans les documents techniques et les règlements."""
-        query_vector = list(self.text_model.embed([query_text]))[0].tolist()
+        query_vector = self.embed_queries([query_text])[0]
 
         results = self.client.query_points(
             collection_name=self.collection_knowledge,
@@ -81,27 +238,63 @@ class MemorySystem:
         ).points
         return results
 
+    def search_knowledge_batch(self, query_texts, limit=3):
+        """Embeds all texts (cached) and searches them in one round trip."""
+        vectors = self.embed_queries(list(query_texts))
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_knowledge,
+            requests=[
+                models.QueryRequest(query=v, using="text_vector", limit=limit, with_payload=True)
+                for v in vectors
+            ]
+        )
+        return [r.points for r in responses]
+
+    @staticmethod
+    def _problem_summary(payload):
+        return problem_summary(payload)
+
+    def _reference_case(self, best, rules_found):
+        p = best.payload
+        return {
+            "score": best.score,
+            "problem_type": self._problem_summary(p),
+            "solution": p.get("recommended_action") or p.get("solution") or "Inspection préventive et surveillance thermique recommandées.",
+            "rules": rules_found[0] if rules_found else "Protocole standard de sécurité ferroviaire.",
+            "all_rules": rules_found,
+            "file_ref": p.get("filename")
+        }
+
+    def _attach_rules(self, bests):
+        """
+        Rules precomputed at ingest ("related_rules") are used as is; only
+        incidents stored before linking fall back to the cached lookup.
+        """
+        pending = sorted({self._problem_summary(b.payload) for b in bests if b and b.payload.get("related_rules") is None})
+        fallback = self.rules_for(pending) if pending else {}
+        return [
+            self._reference_case(b, b.payload.get("related_rules")
+                                 if b.payload.get("related_rules") is not None
+                                 else fallback[self._problem_summary(b.payload)]) if b else None
+            for b in bests
+        ]
+
     def get_reference_case(self, query_vector, mode):
-        """Trouve une image similaire et cherche les règlements associés."""
+        """Trouve une image similaire et ses règlements associés, en un seul aller-retour Qdrant."""
+        if query_vector is None:
+            # No embedding (SigLIP unavailable): nothing to compare against.
+            return None
         results = self.search_similar(query_vector, mode, limit=1)
         if results:
-            best = results[0]
-            p = best.payload
-
-            problem_summary = p.get("analysis") or p.get("status") or "rail defect"
+            return self._attach_rules([results[0]])[0]
+        return None
 
-            try:
-                docs = self.search_knowledge(problem_summary, limit=2)
-                rules_found = [d.payload.get("content") for d in docs if d.score > 0.5]
-            except:
-                rules_found = []
-
-            return {
-                "score": best.score,
-                "problem_type": problem_summary,
-                "solution": p.get("recommended_action") or p.get("solution") or "Inspection préventive et surveillance thermique recommandées.",
-                "rules": rules_found[0] if rules_found else "Protocole standard de sécurité ferroviaire.",
-                "all_rules": rules_found,
-                "file_ref": p.get("filename")
-            }
-        return None
\ No newline at end of file
+    def get_reference_cases(self, query_vectors, mode):
+        """Batched get_reference_case: one image query for the whole list (None vectors get None)."""
+        indices = [i for i, vector in enumerate(query_vectors) if vector is not None]
+        bests = [None] * len(query_vectors)
+        if indices:
+            found = self.search_similar_batch([query_vectors[i] for i in indices], mode, limit=1)
+            for i, points in zip(indices, found):
+                bests[i] = points[0] if points else None
+        return self._attach_rules(bests)
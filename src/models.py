@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+
+YOLO_WEIGHTS = os.environ.get("FELIX_YOLO_WEIGHTS", "yolo11n.pt")
+SIGLIP_MODEL = "google/siglip2-base-patch16-224"
+TEXT_MODEL = "BAAI/bge-small-en-v1.5"
+# torch | onnx | onnx-int8 (see tools/export_onnx.py)
+INFERENCE_BACKEND = os.environ.get("FELIX_INFERENCE_BACKEND", "torch")
+WARMUP_MODELS = [m.strip() for m in os.environ.get("FELIX_WARMUP", "").split(",") if m.strip()]
+
+
+class ModelRegistry:
+    """
+    Loads each model on first use (or on an explicit warmup) and remembers
+    its state, so a process only pays for the models it actually touches.
+    Heavy imports live inside the loaders for the same reason.
+    """
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._state = {}
+        self._locks = {}
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+        self._state[name] = {"state": "unloaded", "load_seconds": None, "error": None}
+
+    def get(self, name):
+        """Returns the loaded model, loading it if needed. None if loading failed."""
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            if self._state[name]["state"] == "failed":
+                return None
+            self._state[name]["state"] = "loading"
+            started = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                print(f"Warning: model '{name}' could not be loaded. {e}")
+                self._state[name].update(state="failed", error=str(e), load_seconds=time.perf_counter() - started)
+                return None
+            self._models[name] = model
+            self._state[name].update(state="ready", load_seconds=time.perf_counter() - started)
+            return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warmup(self, names=None):
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def warmup_async(self, names=None):
+        thread = threading.Thread(target=self.warmup, args=(names,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def reset(self, name):
+        """Forgets a failed or loaded model so the next get() retries."""
+        with self._locks[name]:
+            self._models.pop(name, None)
+            self._state[name] = {"state": "unloaded", "load_seconds": None, "error": None}
+
+    def status(self):
+        return {name: dict(state) for name, state in self._state.items()}
+
+
+def _onnx_variant(name):
+    """Path of the exported ONNX file for the configured backend, or None to stay on torch."""
+    if INFERENCE_BACKEND == "torch":
+        return None
+    from src.onnx_backend import onnx_path
+    path = onnx_path(name, int8=INFERENCE_BACKEND == "onnx-int8")
+    if not os.path.exists(path):
+        print(f"Warning: {path} not found (run tools/export_onnx.py). Falling back to torch.")
+        return None
+    return path
+
+
+def _load_yolo():
+    # The default detector, shared with everything else that asks src.detector for it.
+    from src.detector import detectors, DEFAULT_DETECTOR
+    return detectors.model(DEFAULT_DETECTOR)
+
+
+def _load_siglip():
+    from transformers import AutoProcessor, AutoModel
+    from src.embedding_service import EmbeddingService
+    from src.onnx_backend import OnnxSiglipVision, SIGLIP_ONNX
+    processor = AutoProcessor.from_pretrained(SIGLIP_MODEL)
+    onnx_file = _onnx_variant(SIGLIP_ONNX)
+    if onnx_file:
+        print(f"Loading SigLIP model ({onnx_file}, ONNX Runtime)...")
+        model = OnnxSiglipVision(onnx_file)
+    else:
+        print(f"Loading SigLIP model ({SIGLIP_MODEL})...")
+        model = AutoModel.from_pretrained(SIGLIP_MODEL)
+    return EmbeddingService(processor, model)
+
+
+def _load_text_embedding():
+    from fastembed import TextEmbedding
+    print(f"Loading FastEmbed ({TEXT_MODEL})...")
+    return TextEmbedding(model_name=TEXT_MODEL)
+
+
+def _load_openai():
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    load_dotenv()
+    return OpenAI(
+        base_url="https://models.inference.ai.azure.com",
+        api_key=os.environ.get("GITHUB_TOKEN")
+    )
+
+
+def _load_cloud():
+    from dotenv import load_dotenv
+    from src.cloud_client import CloudClient
+    load_dotenv()
+    return CloudClient(api_key=os.environ.get("GITHUB_TOKEN"))
+
+
+def _load_ollama():
+    from src.ollama_client import OllamaClient
+    client = OllamaClient()
+    if "ollama" in WARMUP_MODELS:
+        try:
+            client.warm()
+            print(f"Ollama model {client.model} loaded (keep_alive={client.keep_alive}).")
+        except Exception as e:
+            # Still usable: Ollama may come up later, calls report their own errors.
+            print(f"Warning: could not preload the Ollama model. {e}")
+    return client
+
+
+registry = ModelRegistry()
+registry.register("yolo", _load_yolo)
+registry.register("siglip", _load_siglip)
+registry.register("text_embedding", _load_text_embedding)
+registry.register("openai", _load_openai)
+registry.register("cloud", _load_cloud)
+registry.register("ollama", _load_ollama)
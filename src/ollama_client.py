@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_HOST = os.environ.get("FELIX_OLLAMA_HOST", os.environ.get("OLLAMA_HOST", "http://localhost:11434"))
+OLLAMA_MODEL = os.environ.get("FELIX_OLLAMA_MODEL", "llama3.2:1b")
+# How long Ollama keeps the model loaded after a call ("-1" = forever).
+OLLAMA_KEEP_ALIVE = os.environ.get("FELIX_OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_NUM_CTX = int(os.environ.get("FELIX_OLLAMA_NUM_CTX", 2048))
+# Match the server's OLLAMA_NUM_PARALLEL: more concurrent calls only queue inside Ollama.
+OLLAMA_PARALLEL = int(os.environ.get("FELIX_OLLAMA_PARALLEL", os.environ.get("OLLAMA_NUM_PARALLEL", 4)))
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("FELIX_OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_TIMEOUT = float(os.environ.get("FELIX_OLLAMA_TIMEOUT", 90))
+OLLAMA_JSON_RETRIES = int(os.environ.get("FELIX_OLLAMA_JSON_RETRIES", 2))
+
+
+class OllamaError(Exception):
+    """Ollama answered with a non-200 status."""
+    def __init__(self, status_code, message=""):
+        super().__init__(f"Ollama error: {status_code} {message}".strip())
+        self.status_code = status_code
+
+
+class InvalidJSON(ValueError):
+    """Every attempt returned text that does not parse as JSON; `text` is the last one."""
+    def __init__(self, text, attempts):
+        super().__init__(f"Ollama returned invalid JSON {attempts} times")
+        self.text = text
+
+
+def _is_json(text):
+    try:
+        json.loads(text)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class OllamaClient:
+    """
+    Client for Ollama's /api/generate.
+    Sync calls share one pooled requests.Session and async calls one pooled
+    httpx.AsyncClient, so connections are reused instead of opened per call.
+    At most `parallel` generations are in flight per process (sync and async
+    each), and every call sends `keep_alive` so the model stays resident.
+    The system instructions travel in the separate `system` field, so the
+    identical prefix can be reused by the server between calls.
+    """
+    def __init__(self, host=OLLAMA_HOST, model=OLLAMA_MODEL, keep_alive=OLLAMA_KEEP_ALIVE, num_ctx=OLLAMA_NUM_CTX,
+                 parallel=OLLAMA_PARALLEL, timeout=OLLAMA_TIMEOUT, json_retries=OLLAMA_JSON_RETRIES):
+        self.host = host.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.parallel = max(1, parallel)
+        self.timeout = timeout
+        self.json_retries = max(0, json_retries)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.parallel)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(self.parallel)
+        self._async_client = None
+        self._async_slots = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "streams": 0, "json_retries": 0, "errors": 0, "in_flight": 0,
+                       "seconds": 0.0, "eval_tokens": 0, "prompt_tokens": 0}
+
+    @property
+    def url(self):
+        return f"{self.host}/api/generate"
+
+    def payload(self, prompt, system=None, stream=False, json_format=True):
+        body = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {"num_ctx": self.num_ctx},
+        }
+        if system:
+            body["system"] = system
+        if json_format:
+            body["format"] = "json"
+        return body
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for field, value in deltas.items():
+                self._stats[field] += value
+
+    def _record(self, started, body):
+        self._count(calls=1, seconds=time.perf_counter() - started,
+                    eval_tokens=body.get("eval_count") or 0, prompt_tokens=body.get("prompt_eval_count") or 0)
+
+    def _post(self, body):
+        started = time.perf_counter()
+        response = self.session.post(self.url, json=body, timeout=(OLLAMA_CONNECT_TIMEOUT, self.timeout))
+        if response.status_code != 200:
+            self._count(errors=1)
+            raise OllamaError(response.status_code, response.text[:200])
+        result = response.json()
+        self._record(started, result)
+        return result.get("response", "")
+
+    def generate(self, prompt, system=None):
+        """
+        Returns the model's JSON answer as text. An answer that does not parse
+        is asked for again, up to `json_retries` more times, then InvalidJSON
+        is raised. Connection errors and OllamaError propagate.
+        """
+        body = self.payload(prompt, system)
+        with self._slots:
+            self._count(in_flight=1)
+            try:
+                for attempt in range(self.json_retries + 1):
+                    text = self._post(body)
+                    if _is_json(text):
+                        return text
+                    if attempt < self.json_retries:
+                        self._count(json_retries=1)
+                raise InvalidJSON(text, self.json_retries + 1)
+            finally:
+                self._count(in_flight=-1)
+
+    def stream(self, prompt, system=None):
+        """Yields the answer text chunk by chunk. Not retried: chunks have already been handed out."""
+        body = self.payload(prompt, system, stream=True)
+        with self._slots:
+            self._count(in_flight=1, streams=1)
+            started = time.perf_counter()
+            try:
+                with self.session.post(self.url, json=body, stream=True,
+                                       timeout=(OLLAMA_CONNECT_TIMEOUT, self.timeout)) as response:
+                    if response.status_code != 200:
+                        self._count(errors=1)
+                        raise OllamaError(response.status_code)
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("response"):
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            self._record(started, chunk)
+                            break
+            finally:
+                self._count(in_flight=-1)
+
+    def warm(self):
+        """Loads the model into memory (a prompt-less generate) so the first real call skips the load."""
+        response = self.session.post(
+            self.url, json={"model": self.model, "keep_alive": self.keep_alive},
+            timeout=(OLLAMA_CONNECT_TIMEOUT, self.timeout)
+        )
+        if response.status_code != 200:
+            raise OllamaError(response.status_code, response.text[:200])
+
+    def _async(self):
+        # Created on first use, inside the event loop that will use it.
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=OLLAMA_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.parallel, max_keepalive_connections=self.parallel)
+            )
+            self._async_slots = asyncio.Semaphore(self.parallel)
+        return self._async_client
+
+    async def agenerate(self, prompt, system=None):
+        """Async generate(), with the same retry policy."""
+        client = self._async()
+        body = self.payload(prompt, system)
+        async with self._async_slots:
+            self._count(in_flight=1)
+            try:
+                for attempt in range(self.json_retries + 1):
+                    started = time.perf_counter()
+                    response = await client.post(self.url, json=body)
+                    if response.status_code != 200:
+                        self._count(errors=1)
+                        raise OllamaError(response.status_code, response.text[:200])
+                    result = response.json()
+                    self._record(started, result)
+                    text = result.get("response", "")
+                    if _is_json(text):
+                        return text
+                    if attempt < self.json_retries:
+                        self._count(json_retries=1)
+                raise InvalidJSON(text, self.json_retries + 1)
+            finally:
+                self._count(in_flight=-1)
+
+    async def astream(self, prompt, system=None):
+        """Async stream()."""
+        client = self._async()
+        body = self.payload(prompt, system, stream=True)
+        async with self._async_slots:
+            self._count(in_flight=1, streams=1)
+            started = time.perf_counter()
+            try:
+                async with client.stream("POST", self.url, json=body) as response:
+                    if response.status_code != 200:
+                        self._count(errors=1)
+                        raise OllamaError(response.status_code)
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("response"):
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            self._record(started, chunk)
+                            break
+            finally:
+                self._count(in_flight=-1)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def close(self):
+        self.session.close()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_seconds"] = stats["seconds"] / stats["calls"] if stats["calls"] else 0.0
+        stats.update(model=self.model, parallel=self.parallel, keep_alive=self.keep_alive)
+        return stats
@@ -0,0 +1,157 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+ONNX_DIR = os.environ.get("FELIX_ONNX_DIR", os.path.join("models", "onnx"))
+ORT_THREADS = int(os.environ.get("FELIX_ORT_THREADS", 0))
+SIGLIP_ONNX = "siglip_vision.onnx"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def onnx_path(name, int8=False):
+    stem, ext = os.path.splitext(name)
+    return os.path.join(ONNX_DIR, f"{stem}.int8{ext}" if int8 else name)
+
+
+def yolo_onnx_name(weights):
+    return os.path.splitext(os.path.basename(weights))[0] + ".onnx"
+
+
+def collect_calibration_images(root="datasets", limit=64):
+    """Picks up to `limit` images under `root`, spread across sub-folders."""
+    paths = []
+    for folder, _, files in os.walk(root):
+        picked = [f for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS)][:max(1, limit // 8)]
+        paths.extend(os.path.join(folder, f) for f in picked)
+        if len(paths) >= limit:
+            break
+    return paths[:limit]
+
+
+def create_session(path):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ORT_THREADS:
+        options.intra_op_num_threads = ORT_THREADS
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class OnnxSiglipVision:
+    """
+    Drop-in for the torch SigLIP model inside EmbeddingService: exposes the
+    same `get_image_features(pixel_values=...)` call, backed by ONNX Runtime.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.session = create_session(path)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def get_image_features(self, pixel_values=None, **_):
+        import torch
+        if hasattr(pixel_values, "numpy"):
+            pixel_values = pixel_values.numpy()
+        outputs = self.session.run(None, {self.input_name: pixel_values.astype(np.float32)})
+        return torch.from_numpy(outputs[0])
+
+
+class _CalibrationReader:
+    """Feeds preprocessed calibration batches to onnxruntime's static quantizer."""
+    def __init__(self, input_name, arrays):
+        self._items = iter([{input_name: a} for a in arrays])
+
+    def get_next(self):
+        return next(self._items, None)
+
+
+def export_siglip(model, out_path=None, opset=17):
+    """Exports the SigLIP vision tower (unnormalized image features) with a dynamic batch axis."""
+    import torch
+
+    class VisionTower(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, pixel_values):
+            return self.inner.get_image_features(pixel_values=pixel_values)
+
+    out_path = out_path or onnx_path(SIGLIP_ONNX)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    size = model.config.vision_config.image_size
+    dummy = torch.zeros(1, 3, size, size)
+    model.eval()
+    torch.onnx.export(
+        VisionTower(model), (dummy,), out_path,
+        input_names=["pixel_values"], output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=opset
+    )
+    print(f" SigLIP exported to {out_path}")
+    return out_path
+
+
+def has_dynamic_batch(path):
+    """False for graphs exported with a fixed batch of 1 (YOLO exports before dynamic=True)."""
+    return not isinstance(create_session(path).get_inputs()[0].shape[0], int)
+
+
+def export_yolo(weights, out_dir=ONNX_DIR, imgsz=640):
+    """Exports with a dynamic batch axis, so batched detection works on ONNX Runtime too."""
+    from ultralytics import YOLO
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True, dynamic=True)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, os.path.basename(exported))
+    if os.path.abspath(exported) != os.path.abspath(out_path):
+        os.replace(exported, out_path)
+    print(f" YOLO exported to {out_path}")
+    return out_path
+
+
+def siglip_calibration_arrays(processor, image_paths):
+    return [
+        processor(images=Image.open(p).convert("RGB"), return_tensors="np")["pixel_values"].astype(np.float32)
+        for p in image_paths
+    ]
+
+
+def letterbox(image, size=640):
+    """Resizes keeping aspect ratio and pads to size x size, the way YOLO expects."""
+    image = image.convert("RGB")
+    scale = size / max(image.size)
+    resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    canvas = Image.new("RGB", (size, size), (114, 114, 114))
+    canvas.paste(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
+    return canvas
+
+
+def yolo_calibration_arrays(image_paths, size=640):
+    arrays = []
+    for p in image_paths:
+        pixels = np.asarray(letterbox(Image.open(p), size), dtype=np.float32) / 255.0
+        arrays.append(pixels.transpose(2, 0, 1)[None])
+    return arrays
+
+
+def quantize_int8(fp32_path, calibration_arrays, out_path=None, method="static"):
+    """
+    int8-quantizes an ONNX model. "static" calibrates activations on the given
+    arrays (QDQ, per-channel weights); "dynamic" quantizes weights only.
+    """
+    from onnxruntime.quantization import quantize_static, quantize_dynamic, QuantFormat, QuantType
+
+    out_path = out_path or fp32_path.replace(".onnx", ".int8.onnx")
+    if method == "dynamic" or not calibration_arrays:
+        quantize_dynamic(fp32_path, out_path, weight_type=QuantType.QInt8)
+    else:
+        input_name = create_session(fp32_path).get_inputs()[0].name
+        quantize_static(
+            fp32_path, out_path, _CalibrationReader(input_name, calibration_arrays),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8
+        )
+    print(f" Quantized ({method}) -> {out_path}")
+    return out_path
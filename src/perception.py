@@ -1,24 +1,24 @@
-from ultralytics import YOLO
-import cv2
 import os
-MODEL_PATH = r"runs/detect/rail_defect_model_v11/weights/best.pt"
+from src.detector import detectors
 class VisionSystem:
-    def __init__(self):
-        print(f" Loading Vision System from: {MODEL_PATH}")
-        if os.path.exists(MODEL_PATH):
-            self.model = YOLO(MODEL_PATH)
-        else:
+    """Rail defect checks with the fine-tuned detector (FELIX_RAIL_DEFECT_WEIGHTS), shared through src.detector."""
+    def __init__(self, detector="rail_defect"):
+        self.detector = detector
+        print(f" Loading Vision System from: {detectors.path(detector)}")
+        self.model = detectors.get(detector)
+        if not self.model:
             print(" Error: Model not found! Did you move the 'runs' folder?")
-            self.model = None
-    def analyze_image(self, image_path):
+    def analyze_image(self, image_path, annotate=False):
+        """
+        Returns (is_defect, message, annotated): `annotated` is the PIL image
+        with the boxes drawn when `annotate`, otherwise None. Nothing is written to disk.
+        """
         if not self.model:
-            return False, "System Offline"
-        results = self.model.predict(image_path, save=True, conf=0.25, verbose=False)
-        detections = results[0].boxes
-        if len(detections) > 0:
-            return True, f" DEFECT DETECTED: {len(detections)} faults found."
-        else:
-            return False, " Track Clear"
+            return False, "System Offline", None
+        result = detectors.detect(self.detector, [image_path], conf=0.25, annotate=annotate)[0]
+        if result["labels"]:
+            return True, f" DEFECT DETECTED: {len(result['labels'])} faults found.", result.get("annotated")
+        return False, " Track Clear", result.get("annotated")
 if __name__ == "__main__":
     test_system = VisionSystem()
     test_dir = "datasets/training_vision/images/val"
@@ -27,6 +27,7 @@ if __name__ == "__main__":
         if files:
             test_img = os.path.join(test_dir, files[0])
             print(f" Scanning: {files[0]}")
-            is_defect, message = test_system.analyze_image(test_img)
+            is_defect, message, annotated = test_system.analyze_image(test_img, annotate=True)
             print(message)
-            print(" Check the 'runs/detect/predict' folder to see the result!")
\ No newline at end of file
+            if annotated is not None:
+                annotated.show()
@@ -1,75 +1,150 @@
 import pandas as pd
-import json
+import numpy as np
+import argparse
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
 BASE_DIR = "datasets/raw_downloads"
-OUTPUT_FILE = "datasets/knowledge_base/past_incidents.json"
-def process_form_54(file_path):
-    print(f" Processing Mechanical Data: {os.path.basename(file_path)}")
-    try:
-        df = pd.read_csv(file_path, low_memory=False)
-        if 'CAUSE' in df.columns:
-            dangerous = df[df['CAUSE'].isin(['T202', 'T109', 'T110', 'E50L'])]
+OUTPUT_DIR = "datasets/knowledge_base/fra_incidents"
+CHUNK_ROWS = int(os.environ.get("FELIX_FRA_CHUNK_ROWS", 100000))
+RECORD_COLUMNS = ["id", "type", "visual_description", "severity", "action_taken", "outcome"]
+# Only these columns are parsed; everything else in the FRA exports is skipped at read time.
+FORM_54_COLUMNS = {"INCDTNO", "CAUSE", "NARR1"}
+FORM_57_COLUMNS = {"INCDTNO", "TYPVEH", "NARR1"}
+def column(df, name, default):
+    if name in df.columns:
+        return df[name].fillna(default)
+    return pd.Series(default, index=df.index, dtype=object)
+def form_54_records(df):
+    if 'CAUSE' in df.columns:
+        df = df[df['CAUSE'].isin(['T202', 'T109', 'T110', 'E50L'])]
+    return pd.DataFrame({
+        "id": "FRA-MECH-" + column(df, 'INCDTNO', 'UNK').astype(str),
+        "type": np.where(column(df, 'CAUSE', '') == 'T202', "Broken Rail", "Track Defect"),
+        "visual_description": column(df, 'NARR1', 'Mechanical failure detected on track geometry.').astype(str).str.strip(),
+        "severity": "CRITICAL",
+        "action_taken": "EMERGENCY_STOP",
+        "outcome": "Historical Event: Section repaired."
+    }, columns=RECORD_COLUMNS)
+def form_57_records(df):
+    if 'TYPVEH' in df.columns:
+        df = df[df['TYPVEH'].isin(['A', 'K', 'J'])]
+    return pd.DataFrame({
+        "id": "FRA-CROSS-" + column(df, 'INCDTNO', 'UNK').astype(str),
+        "type": "Vehicle Collision",
+        "visual_description": column(df, 'NARR1', 'Vehicle obstructed grade crossing.').astype(str).str.strip(),
+        "severity": "CRITICAL",
+        "action_taken": "EMERGENCY_BRAKE",
+        "outcome": "Collision recorded. Crossing inspected."
+    }, columns=RECORD_COLUMNS)
+FORMS = {
+    "54": ("Rail_Equipment*.csv", FORM_54_COLUMNS, form_54_records, "Mechanical"),
+    "57": ("Highway-Rail*.csv", FORM_57_COLUMNS, form_57_records, "Crossing"),
+}
+class RecordWriter:
+    """Appends record chunks to a .jsonl or .parquet shard, written to a temp file and renamed when complete."""
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.tmp_path = path + ".tmp"
+        self._file = None
+        self._parquet = None
+    def write(self, records):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Fixed string schema: an empty (fully filtered) chunk would otherwise infer null columns.
+            schema = pa.schema([(name, pa.string()) for name in RECORD_COLUMNS])
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.tmp_path, schema)
+            if len(records):
+                self._parquet.write_table(pa.Table.from_pandas(records, schema=schema, preserve_index=False))
         else:
-            dangerous = df.head(50)
-        cleaned_data = []
-        for _, row in dangerous.head(50).iterrows():
-            cleaned_data.append({
-                "id": f"FRA-MECH-{row.get('INCDTNO', 'UNK')}",
-                "type": "Broken Rail" if row.get('CAUSE') == 'T202' else "Track Defect",
-                "visual_description": str(row.get('NARR1', 'Mechanical failure detected on track geometry.')).strip(),
-                "severity": "CRITICAL",
-                "action_taken": "EMERGENCY_STOP",
-                "outcome": "Historical Event: Section repaired."
-            })
-        return cleaned_data
-    except Exception as e:
-        print(f" Error reading Form 54: {e}")
-        return []
-def process_form_57(file_path):
-    print(f" Processing Crossing Data: {os.path.basename(file_path)}")
+            if self._file is None:
+                self._file = open(self.tmp_path, "w", encoding="utf-8")
+            if len(records):
+                text = records.to_json(orient="records", lines=True, force_ascii=False)
+                self._file.write(text if text.endswith("\n") else text + "\n")
+    def _close_handles(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._file is not None:
+            self._file.close()
+    def close(self):
+        self._close_handles()
+        if os.path.exists(self.tmp_path):
+            os.replace(self.tmp_path, self.path)
+    def abort(self):
+        self._close_handles()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+def shard_path(file_path, output_dir, form, fmt):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(output_dir, f"incidents_form{form}_{stem}.{fmt}")
+def process_file(form, file_path, output_dir, fmt, chunk_rows=CHUNK_ROWS):
+    """Streams one FRA export through `form`'s record builder into its own shard. Returns (rows, records)."""
+    _, columns, build, label = FORMS[form]
+    out_path = shard_path(file_path, output_dir, form, fmt)
+    print(f" Processing {label} Data: {os.path.basename(file_path)}")
+    writer = RecordWriter(out_path, fmt)
+    rows = records = 0
     try:
-        df = pd.read_csv(file_path, low_memory=False)
-        if 'TYPVEH' in df.columns:
-            crashes = df[df['TYPVEH'].isin(['A', 'K', 'J'])]
-        else:
-            crashes = df.head(50)
-        cleaned_data = []
-        for _, row in crashes.head(50).iterrows():
-            cleaned_data.append({
-                "id": f"FRA-CROSS-{row.get('INCDTNO', 'UNK')}",
-                "type": "Vehicle Collision",
-                "visual_description": str(row.get('NARR1', 'Vehicle obstructed grade crossing.')).strip(),
-                "severity": "CRITICAL",
-                "action_taken": "EMERGENCY_BRAKE",
-                "outcome": "Collision recorded. Crossing inspected."
-            })
-        return cleaned_data
-    except Exception as e:
-        print(f" Error reading Form 57: {e}")
-        return []
+        for df in pd.read_csv(file_path, usecols=lambda c: c in columns, dtype=str, chunksize=chunk_rows):
+            rows += len(df)
+            chunk = build(df)
+            records += len(chunk)
+            writer.write(chunk)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    return rows, records
+def is_stale(file_path, output_dir, form, fmt):
+    out_path = shard_path(file_path, output_dir, form, fmt)
+    return not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(file_path)
 def main():
-    knowledge_base = []
-    if not os.path.exists(BASE_DIR):
-        print(f" Error: The folder '{BASE_DIR}' does not exist.")
+    parser = argparse.ArgumentParser(description="Convert FRA Form 54/57 exports into incident records for bulk_ingest")
+    parser.add_argument("--input", default=BASE_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--format", default="jsonl", choices=["jsonl", "parquet"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="Rebuild shards even if newer than their source")
+    args = parser.parse_args()
+    if not os.path.exists(args.input):
+        print(f" Error: The folder '{args.input}' does not exist.")
         print(f"   Please create it and put your CSV files inside.")
         return
-    files_54 = glob.glob(os.path.join(BASE_DIR, "Rail_Equipment*.csv"))
-    files_57 = glob.glob(os.path.join(BASE_DIR, "Highway-Rail*.csv"))
-    if files_54:
-        knowledge_base.extend(process_form_54(files_54[0]))
-    else:
-        print(f" Warning: No 'Rail_Equipment*.csv' found in {BASE_DIR}")
-    if files_57:
-        knowledge_base.extend(process_form_57(files_57[0]))
-    else:
-        print(f" Warning: No 'Highway-Rail*.csv' found in {BASE_DIR}")
-    if knowledge_base:
-        os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-        with open(OUTPUT_FILE, "w") as f:
-            json.dump(knowledge_base, f, indent=2)
-        print(f" SUCCESS: Generated '{OUTPUT_FILE}' with {len(knowledge_base)} records.")
-    else:
+    jobs = []
+    for form, (pattern, _, _, _) in FORMS.items():
+        files = sorted(glob.glob(os.path.join(args.input, pattern)))
+        if not files:
+            print(f" Warning: No '{pattern}' found in {args.input}")
+        for file_path in files:
+            if args.force or is_stale(file_path, args.output, form, args.format):
+                jobs.append((form, file_path))
+            else:
+                print(f" Up to date: {os.path.basename(file_path)}")
+    if not jobs:
         print(" No data processed.")
+        return
+    os.makedirs(args.output, exist_ok=True)
+    total_rows = total_records = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        futures = {
+            pool.submit(process_file, form, file_path, args.output, args.format, args.chunk_rows): file_path
+            for form, file_path in jobs
+        }
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                rows, records = future.result()
+            except Exception as e:
+                print(f" Error reading {name}: {e}")
+                continue
+            total_rows += rows
+            total_records += records
+            print(f"   [+] {name}: {rows} rows -> {records} records")
+    print(f" SUCCESS: Wrote {total_records} records from {total_rows} rows to '{args.output}'.")
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,81 @@
+import os
+import threading
+
+# embedded: local files under QDRANT_PATH (one process at a time, exclusive lock)
+# memory:   throwaway in-process store (tests, benchmarks)
+# server:   a Qdrant server at QDRANT_URL, over gRPC unless FELIX_QDRANT_GRPC=0
+QDRANT_URL = os.environ.get("QDRANT_URL")
+QDRANT_MODE = os.environ.get("FELIX_QDRANT_MODE", "server" if QDRANT_URL else "embedded")
+QDRANT_PATH = os.environ.get("FELIX_QDRANT_PATH", "qdrant_db")
+QDRANT_GRPC = os.environ.get("FELIX_QDRANT_GRPC", "1") != "0"
+QDRANT_GRPC_PORT = int(os.environ.get("FELIX_QDRANT_GRPC_PORT", 6334))
+QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
+QDRANT_TIMEOUT = int(os.environ.get("FELIX_QDRANT_TIMEOUT", 60))
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def create_client(mode=None, path=None, url=None, prefer_grpc=None):
+    """Builds a new client for the given (or configured) backend. Prefer get_client()."""
+    from qdrant_client import QdrantClient
+    mode = mode or QDRANT_MODE
+    if mode == "embedded":
+        return QdrantClient(path=path or QDRANT_PATH)
+    if mode == "memory":
+        return QdrantClient(location=":memory:")
+    if mode == "server":
+        return QdrantClient(
+            url=url or QDRANT_URL or "http://localhost:6333",
+            grpc_port=QDRANT_GRPC_PORT,
+            prefer_grpc=QDRANT_GRPC if prefer_grpc is None else prefer_grpc,
+            api_key=QDRANT_API_KEY,
+            timeout=QDRANT_TIMEOUT
+        )
+    raise ValueError(f"Unknown FELIX_QDRANT_MODE '{mode}' (expected embedded, memory or server)")
+
+
+def get_client(mode=None, path=None):
+    """
+    The process-wide client for the configured backend. Every component shares
+    it, so an embedded store is opened once per process; after a fork (e.g.
+    uvicorn workers) the child builds its own, since gRPC channels and file
+    locks do not survive it.
+    """
+    mode = mode or QDRANT_MODE
+    key = (mode, (path or QDRANT_PATH) if mode == "embedded" else None, os.getpid())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            _clients[key] = create_client(mode, path=path)
+        return _clients[key]
+
+
+def is_embedded(mode=None):
+    return (mode or QDRANT_MODE) == "embedded"
+
+
+def supports_multiple_processes(mode=None):
+    """Only a server can be shared by several API workers and an ingest job at once."""
+    return (mode or QDRANT_MODE) == "server"
+
+
+def backend_info():
+    info = {"mode": QDRANT_MODE}
+    if QDRANT_MODE == "embedded":
+        info["path"] = os.path.abspath(QDRANT_PATH)
+    elif QDRANT_MODE == "server":
+        info.update(url=QDRANT_URL or "http://localhost:6333", grpc=QDRANT_GRPC)
+    return info
+
+
+def close_clients():
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
@@ -0,0 +1,246 @@
+import os
+from dataclasses import dataclass, field
+import numpy as np
+from qdrant_client import models
+
+COLLECTION_IMAGES = "rail_safety_logs"
+COLLECTION_KNOWLEDGE = "expert_knowledge"
+
+# The fast lane stores text-embedding-3-small vectors at several Matryoshka
+# resolutions: the full 1536 dims as "fast_lane" plus one named vector per
+# prefix ("fast_lane_64", "fast_lane_256", ...) for coarse-to-fine search.
+FAST_LANE_DIM = 1536
+MATRYOSHKA_PREFIXES = sorted(
+    int(d) for d in os.environ.get("FELIX_MATRYOSHKA_PREFIXES", "64,256").split(",")
+    if d.strip() and int(d) < FAST_LANE_DIM
+)
+
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    """
+    Storage/index trade-off applied to both collections. `quantization` maps a
+    named vector to "binary", "scalar" (int8) or None; lanes not listed use
+    `default_quantization`.
+    """
+    name: str
+    description: str
+    m: int = 16
+    ef_construct: int = 100
+    hnsw_ef: int = 128
+    hnsw_on_disk: bool = False
+    vectors_on_disk: tuple = ()
+    quantization: dict = field(default_factory=dict)
+    default_quantization: str = None
+    quantization_always_ram: bool = True
+
+
+# "balanced" is the historical layout: the offline lane keeps its float
+# originals on disk and a 1-bit-per-dimension copy (768 bits = 96 bytes) in
+# RAM; searches scan the bits by Hamming distance and rescore the best
+# candidates against the floats. Everything else stays as plain floats in RAM.
+COLLECTION_PROFILES = {
+    profile.name: profile for profile in [
+        CollectionProfile(
+            "balanced", "Binary offline lane, float fast lane and knowledge in RAM",
+            vectors_on_disk=("offline_lane",), quantization={"offline_lane": "binary"},
+        ),
+        CollectionProfile(
+            "low-latency-ram", "Everything in RAM, int8 copies for the scan, denser graph",
+            m=32, ef_construct=256, hnsw_ef=128, default_quantization="scalar",
+        ),
+        CollectionProfile(
+            "large-on-disk", "Floats and graph on disk, only quantized copies in RAM",
+            m=16, ef_construct=128, hnsw_ef=96, hnsw_on_disk=True,
+            vectors_on_disk=("offline_lane", "fast_lane", "text_vector"),
+            quantization={"offline_lane": "binary", "fast_lane": "binary"}, default_quantization="scalar",
+        ),
+        CollectionProfile(
+            "edge-int8", "Small-memory boxes: sparse graph, int8 in RAM, floats on disk",
+            m=8, ef_construct=64, hnsw_ef=64,
+            vectors_on_disk=("offline_lane", "fast_lane", "text_vector"), default_quantization="scalar",
+        ),
+    ]
+}
+COLLECTION_PROFILE = os.environ.get("FELIX_COLLECTION_PROFILE", "balanced")
+
+# Filtered fields (status/time rules, source filters) get payload indexes in every profile.
+PAYLOAD_INDEXES = {
+    COLLECTION_IMAGES: {
+        "status": models.PayloadSchemaType.KEYWORD,
+        "source": models.PayloadSchemaType.KEYWORD,
+        "severity": models.PayloadSchemaType.KEYWORD,
+        "timestamp": models.PayloadSchemaType.FLOAT,
+    },
+    COLLECTION_KNOWLEDGE: {
+        "file_source": models.PayloadSchemaType.KEYWORD,
+        "metadata.source": models.PayloadSchemaType.KEYWORD,
+    },
+}
+
+
+def get_profile(name=None):
+    name = name or COLLECTION_PROFILE
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}' (available: {', '.join(COLLECTION_PROFILES)})")
+    return COLLECTION_PROFILES[name]
+
+
+def quantization_config(kind, always_ram=True):
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    if kind == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    return None
+
+
+def lane_quantization(profile, lane):
+    # Matryoshka prefixes follow the full fast lane.
+    base = "fast_lane" if lane.startswith("fast_lane") else lane
+    return profile.quantization.get(base, profile.default_quantization)
+
+
+def _lane_params(profile, lane, size):
+    base = "fast_lane" if lane.startswith("fast_lane") else lane
+    return models.VectorParams(
+        size=size,
+        distance=models.Distance.COSINE,
+        on_disk=base in profile.vectors_on_disk or None,
+        quantization_config=quantization_config(lane_quantization(profile, lane), profile.quantization_always_ram)
+    )
+
+
+def hnsw_config(profile):
+    return models.HnswConfigDiff(m=profile.m, ef_construct=profile.ef_construct, on_disk=profile.hnsw_on_disk)
+
+
+OFFLINE_LANE_QUANTIZATION = quantization_config("binary")
+
+
+def matryoshka_slice(vector, target_dim):
+    sliced = np.array(vector[:target_dim])
+    norm = np.linalg.norm(sliced)
+    if norm > 0:
+        sliced = sliced / norm
+    return sliced.tolist()
+
+
+def fast_lane_name(dim):
+    return "fast_lane" if dim == FAST_LANE_DIM else f"fast_lane_{dim}"
+
+
+def fast_lane_vectors(vector, prefixes=None):
+    """All Matryoshka resolutions of one vector, keyed by named-vector name."""
+    prefixes = MATRYOSHKA_PREFIXES if prefixes is None else prefixes
+    full = list(vector[:FAST_LANE_DIM]) + [0.0] * max(0, FAST_LANE_DIM - len(vector))
+    vectors = {fast_lane_name(FAST_LANE_DIM): full}
+    for dim in prefixes:
+        if dim <= len(vector):
+            vectors[fast_lane_name(dim)] = matryoshka_slice(vector, dim)
+    return vectors
+
+
+def image_vectors_config(prefixes=None, profile=None):
+    prefixes = MATRYOSHKA_PREFIXES if prefixes is None else prefixes
+    profile = profile or get_profile()
+    return {
+        "fast_lane": _lane_params(profile, "fast_lane", FAST_LANE_DIM),
+        **{fast_lane_name(dim): _lane_params(profile, fast_lane_name(dim), dim) for dim in prefixes},
+        "offline_lane": _lane_params(profile, "offline_lane", 768),
+    }
+
+
+def knowledge_vectors_config(profile=None):
+    return {
+        "text_vector": _lane_params(profile or get_profile(), "text_vector", 384)
+    }
+
+
+def ensure_payload_indexes(client, collection):
+    existing = client.get_collection(collection).payload_schema or {}
+    for field_name, schema in PAYLOAD_INDEXES.get(collection, {}).items():
+        if field_name not in existing:
+            client.create_payload_index(collection_name=collection, field_name=field_name, field_schema=schema)
+
+
+def _upgrade_offline_lane(client):
+    """Adds binary quantization to collections created before the offline lane had it."""
+    vectors = client.get_collection(COLLECTION_IMAGES).config.params.vectors
+    offline = vectors.get("offline_lane") if isinstance(vectors, dict) else None
+    if offline is None or offline.quantization_config is not None:
+        return
+    print(f" Enabling binary quantization on '{COLLECTION_IMAGES}.offline_lane'...")
+    client.update_collection(
+        collection_name=COLLECTION_IMAGES,
+        vectors_config={
+            "offline_lane": models.VectorParamsDiff(on_disk=True, quantization_config=OFFLINE_LANE_QUANTIZATION)
+        }
+    )
+
+
+def ensure_collections(client, profile=None):
+    """Creates missing collections with the configured profile; existing ones are left as they are (see apply_profile)."""
+    profile = profile or get_profile()
+    if not client.collection_exists(COLLECTION_IMAGES):
+        print(f" Creating collection '{COLLECTION_IMAGES}' ({profile.name})...")
+        client.create_collection(
+            collection_name=COLLECTION_IMAGES,
+            vectors_config=image_vectors_config(profile=profile),
+            hnsw_config=hnsw_config(profile)
+        )
+    elif profile.name == "balanced":
+        _upgrade_offline_lane(client)
+
+    if not client.collection_exists(COLLECTION_KNOWLEDGE):
+        print(f" Creating collection '{COLLECTION_KNOWLEDGE}' ({profile.name})...")
+        client.create_collection(
+            collection_name=COLLECTION_KNOWLEDGE,
+            vectors_config=knowledge_vectors_config(profile),
+            hnsw_config=hnsw_config(profile)
+        )
+
+    for collection in (COLLECTION_IMAGES, COLLECTION_KNOWLEDGE):
+        ensure_payload_indexes(client, collection)
+
+
+def apply_profile(client, profile, collections=(COLLECTION_IMAGES, COLLECTION_KNOWLEDGE)):
+    """
+    Migrates existing collections to `profile` in place: HNSW parameters,
+    per-lane on-disk storage and quantization (added, changed or disabled).
+    Points are kept; Qdrant rebuilds the affected indexes in the background.
+    """
+    for collection in collections:
+        vectors = client.get_collection(collection).config.params.vectors
+        diffs = {}
+        for lane in vectors:
+            kind = lane_quantization(profile, lane)
+            base = "fast_lane" if lane.startswith("fast_lane") else lane
+            diffs[lane] = models.VectorParamsDiff(
+                on_disk=base in profile.vectors_on_disk,
+                quantization_config=quantization_config(kind, profile.quantization_always_ram) or models.Disabled.DISABLED
+            )
+        print(f" Applying profile '{profile.name}' to '{collection}' ({', '.join(diffs)})...")
+        client.update_collection(collection_name=collection, vectors_config=diffs, hnsw_config=hnsw_config(profile))
+        ensure_payload_indexes(client, collection)
+
+
+def describe_collection(client, collection):
+    """Current HNSW / on-disk / quantization settings of each lane, for reports."""
+    info = client.get_collection(collection)
+    hnsw = info.config.hnsw_config
+    lanes = {}
+    for lane, params in info.config.params.vectors.items():
+        quant = params.quantization_config or info.config.quantization_config
+        lanes[lane] = {
+            "size": params.size,
+            "on_disk": bool(params.on_disk),
+            "quantization": type(quant).__name__.replace("Quantization", "").lower() if quant else None,
+        }
+    return {
+        "points": info.points_count,
+        "hnsw": {"m": hnsw.m, "ef_construct": hnsw.ef_construct, "on_disk": bool(hnsw.on_disk)},
+        "lanes": lanes,
+    }
@@ -1,8 +1,8 @@
-from qdrant_client import QdrantClient
+from src.qdrant_backend import get_client
 COLLECTION_NAME = "rail_safety_logs"
 class MemoryBank:
     def __init__(self):
-        self.client = QdrantClient(path="qdrant_db")
+        self.client = get_client()
         print("Memory Bank (Qdrant): Connected.")
     def search_by_vector(self, vector):
         results = self.client.query_points(
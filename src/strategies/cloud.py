@@ -1,35 +1,56 @@
-import os
-import base64
-import numpy as np
-from dotenv import load_dotenv
-from openai import OpenAI
 from abc import ABC, abstractmethod
-load_dotenv()
-ai_client = OpenAI(
-    base_url="https://models.inference.ai.azure.com",
-    api_key=os.environ.get("GITHUB_TOKEN")
-)
-def matryoshka_slice(vector, target_dim):
-    sliced = np.array(vector[:target_dim])
-    norm = np.linalg.norm(sliced)
-    if norm > 0:
-        sliced = sliced / norm
-    return sliced.tolist()
+from src.image_input import as_image_input
+from src.models import registry
+from src.schema import matryoshka_slice
+from src.llm_cache import llm_cache, prompt_version
+CLOUD_CHAT_MODEL = "gpt-4o"
+CLOUD_EMBED_MODEL = "text-embedding-3-small"
+CLOUD_PROMPT_PREFIX = "Analyze this rail segment:"
+SYSTEM_PROMPT = "You are the Fix-It Felix Expert Engine, specialized in heavy rail maintenance. Analyze rail assessments. Output technical JSON including 'detected_issues', 'severity', 'analysis' (technical summary), and 'advice' (SPECIFIC technical repair steps for engineers). Use dense keywords at the start of the 'analysis' for 256-dim Matryoshka optimization."
+# The cached cloud result holds both the GPT-4o analysis and its embedding.
+CLOUD_PROMPT_VERSION = prompt_version(CLOUD_CHAT_MODEL, CLOUD_EMBED_MODEL, SYSTEM_PROMPT, CLOUD_PROMPT_PREFIX)
 class InferenceStrategy(ABC):
     @abstractmethod
-    def process(self, image_path: str, incident_id: str):
+    def process(self, image, incident_id: str, user_context: str = "", detections=None, vector=None):
+        """`image` is an ImageInput, a file path, or None for text-only requests."""
         pass
+
+    # Whether process() uses the SigLIP vector (batch callers skip SigLIP otherwise).
+    uses_visual_vector = False
+    # ImageInput variants this strategy reads (see src.image_input.CONSUMERS).
+    image_consumers = ("siglip", "cloud")
+
+    def detect(self, image):
+        """Runs the strategy's object detector, if it has one. None means no detector."""
+        return None
+
+    def detect_many(self, images):
+        return [self.detect(image) for image in images]
+
+    def stream(self, image, incident_id: str, user_context: str = "", detections=None, vector=None):
+        """
+        Yields ("token", text) while the LLM is writing, then ("result", dict)
+        with the same dict `process` returns. Non-streaming strategies only
+        yield the result.
+        """
+        yield "result", self.process(image, incident_id, user_context, detections=detections, vector=vector)
 class CloudMatryoshkaStrategy(InferenceStrategy):
-    def process(self, image_path: str, incident_id: str, user_context: str = ""):
+    def _client(self):
+        cloud = registry.get("cloud")
+        if not cloud:
+            raise RuntimeError("OpenAI client unavailable (check GITHUB_TOKEN).")
+        return cloud
+
+    def _messages(self, image, incident_id, user_context):
         print(f" Processing {incident_id} in Cloud Tier 1...")
-        if image_path:
-            with open(image_path, "rb") as f:
-                encoded_image = base64.b64encode(f.read()).decode("utf-8")
+        image = as_image_input(image)
+        if image:
+            encoded_image = image.b64()
         else:
             encoded_image = None
             print(" Cloud Mode: Text-only request.")
 
-        prompt_text = "Analyze this rail segment:"
+        prompt_text = CLOUD_PROMPT_PREFIX
         if user_context:
             prompt_text += f"\n\nUser Context/Question: {user_context}"
         
@@ -37,32 +58,70 @@ class CloudMatryoshkaStrategy(InferenceStrategy):
         if encoded_image:
             user_content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}})
 
-        response = ai_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are the Fix-It Felix Expert Engine, specialized in heavy rail maintenance. Analyze rail assessments. Output technical JSON including 'detected_issues', 'severity', 'analysis' (technical summary), and 'advice' (SPECIFIC technical repair steps for engineers). Use dense keywords at the start of the 'analysis' for 256-dim Matryoshka optimization."
-                },
-                {
-                    "role": "user",
-                    "content": user_content
-                }
-            ],
-            model="gpt-4o",
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        analysis_json = response.choices[0].message.content
-        emb_response = ai_client.embeddings.create(
-            input=analysis_json,
-            model="text-embedding-3-small"
-        )
-        original_vector = emb_response.data[0].embedding
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": user_content
+            }
+        ]
+
+    def _result(self, cloud, analysis_json):
+        # Batched with the embeddings of concurrent requests by the cloud client.
+        original_vector = cloud.embed(analysis_json, model=CLOUD_EMBED_MODEL)
         mrl_vector = matryoshka_slice(original_vector, target_dim=256)
         return {
             "mode": "Cloud Matryoshka (256)",
             "vector_preview": mrl_vector[:5],
-            "vector_full": mrl_vector,
+            "vector_mrl": mrl_vector,
+            # Full 1536 dims: MemorySystem stores every Matryoshka prefix from it.
+            "vector_full": original_vector,
             "analysis": analysis_json,
             "status": "Processed (Waiting for Save)"
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def _cache_scope(image):
+        # The prompt is the image plus the context: scope answers by image content.
+        image = as_image_input(image)
+        return image.digest if image else "text-only"
+
+    def process(self, image, incident_id: str, user_context: str = "", detections=None, vector=None):
+        scope = self._cache_scope(image)
+        cached, context_vector = llm_cache.get("cloud", CLOUD_PROMPT_VERSION, scope, user_context)
+        if cached is not None:
+            return cached
+        cloud = self._client()
+        analysis_json = cloud.chat(
+            self._messages(image, incident_id, user_context),
+            model=CLOUD_CHAT_MODEL,
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        result = self._result(cloud, analysis_json)
+        llm_cache.set("cloud", CLOUD_PROMPT_VERSION, scope, user_context, result, context_vector)
+        return result
+
+    def stream(self, image, incident_id: str, user_context: str = "", detections=None, vector=None):
+        scope = self._cache_scope(image)
+        cached, context_vector = llm_cache.get("cloud", CLOUD_PROMPT_VERSION, scope, user_context)
+        if cached is not None:
+            yield "token", cached["analysis"]
+            yield "result", cached
+            return
+        cloud = self._client()
+        chunks = []
+        for text in cloud.chat_stream(
+            self._messages(image, incident_id, user_context),
+            model=CLOUD_CHAT_MODEL,
+            temperature=0,
+            response_format={"type": "json_object"}
+        ):
+            chunks.append(text)
+            yield "token", text
+        result = self._result(cloud, "".join(chunks))
+        llm_cache.set("cloud", CLOUD_PROMPT_VERSION, scope, user_context, result, context_vector)
+        yield "result", result
@@ -1,178 +1,274 @@
 import numpy as np
 import json
-import requests
-import torch
-from PIL import Image
-from transformers import AutoProcessor, AutoModel
-from ultralytics import YOLO
+import asyncio
+from abc import abstractmethod
 from src.strategies.cloud import InferenceStrategy
-
-SIGLIP_MODEL = "google/siglip2-base-patch16-224"
-
-try:
-    print("Loading Local YOLO model...")
-    model = YOLO("yolo11n.pt")
-except Exception as e:
-    print(f"Warning: YOLO model not found. Please ensure 'yolo11n.pt' is in root. {e}")
-    model = None
-
-try:
-    print(f"Loading SigLIP model ({SIGLIP_MODEL})...")
-    siglip_processor = AutoProcessor.from_pretrained(SIGLIP_MODEL)
-    siglip_model = AutoModel.from_pretrained(SIGLIP_MODEL)
-except Exception as e:
-    print(f"Warning: SigLIP model could not be loaded. {e}")
-    siglip_processor = None
-    siglip_model = None
+from src.image_input import as_image_input
+from src.models import registry
+from src.concurrency import model_pool
+from src.llm_cache import llm_cache, prompt_version
+from src.ollama_client import OLLAMA_MODEL, OllamaError, InvalidJSON
+from src.detector import DEFAULT_DETECTOR, detectors, detector_for
 
 def to_binary(vector):
-    return (np.array(vector) > 0).astype(int).tolist()
+    """Sign-binarizes a vector and packs it 8 dims per byte (768 floats -> 96 bytes)."""
+    return np.packbits(np.asarray(vector) > 0).tolist()
 
-def get_siglip_embedding(image_path):
+def get_siglip_embedding(image):
     """
     Generates a 768-dim visual embedding using SigLIP.
+    `image` may be a file path or an in-memory ImageInput.
+    None when SigLIP is unavailable or fails: callers must not store or search with it.
     """
-    if not siglip_model or not siglip_processor:
-        return np.random.randn(768).tolist()
+    embedding_service = registry.get("siglip")
+    if not embedding_service:
+        return None
 
     try:
-        image = Image.open(image_path).convert("RGB")
-        inputs = siglip_processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = siglip_model.get_image_features(**inputs)
-        image_vector = outputs / outputs.norm(p=2, dim=-1, keepdim=True)
-        return image_vector[0].tolist()
+        return embedding_service.embed(image)
     except Exception as e:
         print(f"Error generating SigLIP embedding: {e}")
-        return np.random.randn(768).tolist()
+        return None
 
-def get_ollama_analysis(detections, user_context=""):
+async def aget_siglip_embedding(image):
     """
-    Communicates with local Ollama 3.2 1B to generate analysis.
+    get_siglip_embedding for the event loop. The batcher's future is awaited
+    instead of blocking a model_pool thread on it, so every in-flight request
+    can join the same SigLIP batch. Only the first call, which loads the
+    model, runs on model_pool.
     """
-    if not detections and not user_context:
-        print("DEBUG: No detections/context. Using fallback safety prompt.")
-        prompt = """
-        You are Fix-It Felix, an expert repair assistant.
+    if registry.is_loaded("siglip"):
+        embedding_service = registry.get("siglip")
+    else:
+        embedding_service = await model_pool.run(registry.get, "siglip")
+    if not embedding_service:
+        return None
+
+    try:
+        return await asyncio.wrap_future(embedding_service.submit(image))
+    except Exception as e:
+        print(f"Error generating SigLIP embedding: {e}")
+        return None
+
+OLLAMA_SYSTEM_PROMPT = """
+        You are Fix-It Felix, an expert repair assistant for railway incidents.
+        Always answer with a JSON object with the keys:
+        - "analysis": A brief description of the problem based on the items detected.
+        - "severity": "Low", "Medium", or "High".
+        - "advice": Specific repair advice or next steps.
+        - "detected_issues": A summary of the main issue.
+
+        Response MUST be valid JSON. Do not include markdown formatting.
+        """
+
+OLLAMA_FALLBACK_PROMPT = """
         An incident was reported on the railway, but the object detector could not identify specific objects (likely due to smoke, fire, or unique debris).
 
-        Provide a JSON response with:
+        Answer with exactly:
         - "analysis": "Visual detection inconclusive. Likely ambiguous hazard (smoke/fire/debris).",
         - "severity": "Medium",
         - "advice": "Inspect track manually for heat damage, obstructions, or cracks. Verify signaling systems.",
         - "detected_issues": "Unidentified Anomaly"
-
-        Response MUST be valid JSON.
         """
-    else:
-        prompt = f"""
-        You are Fix-It Felix, an expert repair assistant.
+
+def build_ollama_prompt(detections, user_context=""):
+    """The per-incident part of the prompt; the shared instructions are OLLAMA_SYSTEM_PROMPT."""
+    if not detections and not user_context:
+        return OLLAMA_FALLBACK_PROMPT
+    return f"""
         A user has reported an incident.
-        YOLO detections from the scene: {', '.join(detections) if detections else 'None'}
+        YOLO detections from the scene: {', '.join(sorted(detections)) if detections else 'None'}
         User provided context: {user_context}
+        """
 
-        Based on these detections, provide a JSON response with:
-        - "analysis": A brief description of the problem based on the items detected.
-        - "severity": "Low", "Medium", or "High".
-        - "advice": Specific repair advice or next steps.
-        - "detected_issues": A summary of the main issue.
+def ollama_client():
+    return registry.get("ollama")
 
-        Response MUST be valid JSON. Do not include markdown formatting.
-        """
+def ollama_status_error(status_code):
+    return json.dumps({
+        "analysis": f"Ollama error: {status_code}",
+        "severity": "Medium",
+        "advice": "Please check Ollama service status.",
+        "detected_issues": "Local AI Unavailable"
+    })
+
+def ollama_connection_error(e):
+    return json.dumps({
+        "analysis": f"Error connecting to Ollama: {str(e)}",
+        "severity": "Medium",
+        "advice": f"Ensure Ollama is running with the {OLLAMA_MODEL} model.",
+        "detected_issues": "Connection Error"
+    })
 
-    print(f"DEBUG: Sending prompt to Ollama: {prompt[:100]}...")
+# Answers cached under another prompt text or model are never reused.
+OLLAMA_PROMPT_VERSION = prompt_version(
+    OLLAMA_MODEL, OLLAMA_SYSTEM_PROMPT, OLLAMA_FALLBACK_PROMPT, build_ollama_prompt(["{detections}"], "{user_context}")
+)
 
+def ollama_cache_scope(detections):
+    """Everything besides the user context that the Ollama prompt depends on."""
+    return ",".join(sorted(set(detections or [])))
+
+def is_valid_json(text):
+    try:
+        json.loads(text)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def get_siglip_embeddings(images):
+    """Batched get_siglip_embedding; failed images come back as None like the single call."""
+    embedding_service = registry.get("siglip")
+    if not embedding_service:
+        return [None for _ in images]
+    return embedding_service.embed_many(images)
+
+def get_ollama_analysis(detections, user_context=""):
+    """
+    Communicates with local Ollama 3.2 1B to generate analysis.
+    Valid answers are cached per (detections, context) in llm_cache.
+    """
+    scope = ollama_cache_scope(detections)
+    cached, context_vector = llm_cache.get("ollama", OLLAMA_PROMPT_VERSION, scope, user_context)
+    if cached is not None:
+        return cached
+
+    prompt = build_ollama_prompt(detections, user_context)
+    try:
+        raw_response = ollama_client().generate(prompt, system=OLLAMA_SYSTEM_PROMPT)
+    except InvalidJSON as e:
+        print(f" Warning: Ollama answer is still invalid JSON after retries ({len(e.text)} chars).")
+        return e.text
+    except OllamaError as e:
+        return ollama_status_error(e.status_code)
+    except Exception as e:
+        return ollama_connection_error(e)
+    llm_cache.set("ollama", OLLAMA_PROMPT_VERSION, scope, user_context, raw_response, context_vector)
+    return raw_response
+
+def stream_ollama_analysis(detections, user_context=""):
+    """
+    Same as get_ollama_analysis, but yields the response text chunk by chunk
+    as Ollama generates it. On failure the error JSON is yielded as one chunk.
+    A cached answer is yielded as one chunk as well.
+    """
+    scope = ollama_cache_scope(detections)
+    cached, context_vector = llm_cache.get("ollama", OLLAMA_PROMPT_VERSION, scope, user_context)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_ollama_prompt(detections, user_context)
+    chunks = []
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "llama3.2:1b",
-                "prompt": prompt,
-                "stream": False,
-                "format": "json"
-            },
-            timeout=90
-        )
-        if response.status_code == 200:
-            result = response.json()
-            raw_response = result.get("response", "{}")
-            print(f"DEBUG: Ollama Raw Response: {raw_response}")
-            return raw_response
-        else:
-            return json.dumps({
-                "analysis": f"Ollama error: {response.status_code}",
-                "severity": "Medium",
-                "advice": "Please check Ollama service status.",
-                "detected_issues": "Local AI Unavailable"
-            })
+        for text in ollama_client().stream(prompt, system=OLLAMA_SYSTEM_PROMPT):
+            chunks.append(text)
+            yield text
+    except OllamaError as e:
+        yield ollama_status_error(e.status_code)
+        return
     except Exception as e:
-        return json.dumps({
-            "analysis": f"Error connecting to Ollama: {str(e)}",
-            "severity": "Medium",
-            "advice": "Ensure Ollama is running with llama3.2:1b model.",
-            "detected_issues": "Connection Error"
-        })
-
-class PrivateStrategy(InferenceStrategy):
-    def process(self, image_path: str, incident_id: str, user_context: str = ""):
-        if not model:
+        yield ollama_connection_error(e)
+        return
+    raw_response = "".join(chunks)
+    if is_valid_json(raw_response):
+        llm_cache.set("ollama", OLLAMA_PROMPT_VERSION, scope, user_context, raw_response, context_vector)
+
+def detect_objects(image, detector=DEFAULT_DETECTOR):
+    # YOLO takes the already-decoded 640 px variant, no second JPEG decode.
+    return detectors.labels(detector, [image])[0]
+
+def detect_objects_batch(images, detector=DEFAULT_DETECTOR):
+    return detectors.labels(detector, images)
+
+class LocalStrategy(InferenceStrategy):
+    """SigLIP -> YOLO -> Ollama pipeline shared by the private and offline modes."""
+    uses_visual_vector = True
+    image_consumers = ("siglip", "yolo")
+    # Key in FELIX_STRATEGY_DETECTORS choosing this strategy's YOLO weights.
+    name = "local"
+
+    @property
+    def detector(self):
+        return detector_for(self.name)
+
+    def _detector_ready(self):
+        return detectors.get(self.detector) is not None
+
+    def detect(self, image):
+        if not image or not self._detector_ready():
+            return []
+        return detect_objects(image, self.detector)
+
+    def detect_many(self, images):
+        if not images or not self._detector_ready():
+            return [[] for _ in images]
+        return detect_objects_batch(images, self.detector)
+
+    def _prepare(self, image, detections, vector):
+        # Stays None when there is no image or SigLIP failed; results then carry no vector.
+        local_vector = vector
+        image = as_image_input(image)
+
+        if image:
+            if vector is None:
+                local_vector = get_siglip_embedding(image)
+            if detections is None:
+                detections = detect_objects(image, self.detector)
+        return local_vector, list(set(detections or []))
+
+    @abstractmethod
+    def _result(self, local_vector, detections, analysis):
+        """The mode-specific result dict built from the shared SigLIP/YOLO/Ollama outputs."""
+
+    def process(self, image, incident_id: str, user_context: str = "", detections=None, vector=None):
+        if not self._detector_ready():
             return {"error": "YOLO model not loaded"}
 
-        local_vector = [0.0] * 768
-        detections = []
+        local_vector, detections = self._prepare(image, detections, vector)
+        ollama_result = get_ollama_analysis(detections, user_context)
+        return self._result(local_vector, detections, ollama_result)
+
+    def stream(self, image, incident_id: str, user_context: str = "", detections=None, vector=None):
+        if not self._detector_ready():
+            yield "result", {"error": "YOLO model not loaded"}
+            return
+
+        local_vector, detections = self._prepare(image, detections, vector)
+        chunks = []
+        for text in stream_ollama_analysis(detections, user_context):
+            chunks.append(text)
+            yield "token", text
+        yield "result", self._result(local_vector, detections, "".join(chunks))
 
-        if image_path:
-            local_vector = get_siglip_embedding(image_path)
-            results = model(image_path)
-            for r in results:
-                for c in r.boxes.cls:
-                    detections.append(model.names[int(c)])
-        
-        ollama_result = get_ollama_analysis(list(set(detections)), user_context)
+class PrivateStrategy(LocalStrategy):
+    name = "private"
 
-        optimized_vector = local_vector[:256]
+    def _result(self, local_vector, detections, analysis):
+        optimized_vector = (local_vector or [])[:256]
 
         return {
             "mode": "3-PrivateLocal",
             "source": "Local CPU/GPU (SigLIP -> YOLO -> Ollama 3.2 1B)",
             "privacy": "Secure (No data left device)",
-            "detections": list(set(detections)),
-            "analysis": ollama_result,
+            "detections": detections,
+            "analysis": analysis,
             "vector_preview": optimized_vector[:5],
             "vector_full": local_vector
         }
 
-class OfflineStrategy(InferenceStrategy):
-    def process(self, image_path: str, incident_id: str, user_context: str = ""):
-        if not model:
-            return {"error": "YOLO model not loaded"}
-
-        local_vector = [0.0] * 768
-        detections = []
-
-        if image_path:
-            local_vector = get_siglip_embedding(image_path)
-            results = model(image_path)
-            detections = [model.names[int(c)] for r in results for c in r.boxes.cls]
-
-        binary_vector = to_binary(local_vector)
+class OfflineStrategy(LocalStrategy):
+    name = "offline"
 
-        ollama_result = get_ollama_analysis(list(set(detections)), user_context)
+    def _result(self, local_vector, detections, analysis):
+        binary_vector = to_binary(local_vector) if local_vector else []
 
         return {
             "mode": "4-OfflineBinary",
             "source": "Local (Offline - SigLIP -> YOLO -> Ollama 3.2 1B)",
-            "storage_type": "Binary (1s and 0s)",
-<<<<<<< HEAD
-                "detections": list(set(detections)),
-                "analysis": ollama_result,
-                "vector_preview": binary_vector[:10],
-                "vector_full": local_vector
-            }
-=======
-            "detections": list(set(detections)),
-            "analysis": ollama_result,
+            "storage_type": f"Binary ({len(local_vector or [])} bits packed in {len(binary_vector)} bytes)",
+            "detections": detections,
+            "analysis": analysis,
             "vector_preview": binary_vector[:10],
             "vector_full": local_vector
         }
->>>>>>> 90f292a4fcbb4c41fa864e14861f583dc7e4b422
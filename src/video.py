@@ -0,0 +1,274 @@
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from PIL import Image
+
+from src.image_input import ImageInput, CONSUMERS, decode_scale
+from src.memory import inject_reference
+from src.strategies.local import get_siglip_embeddings
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm")
+FRAME_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+VIDEO_SAMPLE_FPS = float(os.environ.get("FELIX_VIDEO_FPS", 2.0))
+# Frame directories carry no timing: the rate they were extracted at.
+FRAME_DIR_FPS = float(os.environ.get("FELIX_VIDEO_SOURCE_FPS", 30.0))
+# "phash": difference hash of a 9x8 grayscale thumbnail; "siglip": cosine of SigLIP embeddings.
+KEYFRAME_METHOD = os.environ.get("FELIX_KEYFRAME_METHOD", "phash")
+KEYFRAME_HASH_DISTANCE = int(os.environ.get("FELIX_KEYFRAME_HASH_DISTANCE", 6))
+KEYFRAME_SIMILARITY = float(os.environ.get("FELIX_KEYFRAME_SIMILARITY", 0.97))
+# A keyframe is novel when its SigLIP vector is below this similarity to every recently analyzed frame.
+NOVELTY_SIMILARITY = float(os.environ.get("FELIX_VIDEO_NOVELTY", 0.9))
+NOVELTY_WINDOW = int(os.environ.get("FELIX_VIDEO_NOVELTY_WINDOW", 32))
+VIDEO_BATCH = int(os.environ.get("FELIX_VIDEO_BATCH", 16))
+VIDEO_LLM_CONCURRENCY = int(os.environ.get("FELIX_VIDEO_LLM_CONCURRENCY", 4))
+
+
+@dataclass
+class Frame:
+    index: int
+    timestamp: float
+    image: Image.Image
+    name: str
+
+
+def is_video(path):
+    return os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def _fit(image, consumers):
+    # Frames are only ever used at the consumers' sizes: shrink once, up front.
+    scale = decode_scale(*image.size, consumers=consumers)
+    if scale >= 1.0:
+        return image
+    return image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BILINEAR)
+
+
+def iter_video_frames(path, sample_fps=VIDEO_SAMPLE_FPS, consumers=CONSUMERS, stats=None):
+    """
+    Yields every Frame of a video file at about `sample_fps`. Frames between
+    samples are grabbed (demuxed and decoded) but never converted.
+    """
+    import cv2
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video {path}")
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or FRAME_DIR_FPS
+    step = max(1, round(source_fps / sample_fps)) if sample_fps > 0 else 1
+    index = 0
+    try:
+        while capture.grab():
+            if stats is not None:
+                stats["frames_read"] += 1
+                stats["source_seconds"] = (index + 1) / source_fps
+            if index % step == 0:
+                ok, bgr = capture.retrieve()
+                if ok:
+                    image = Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+                    yield Frame(index, index / source_fps, _fit(image, consumers), f"{os.path.basename(path)}#{index}")
+            index += 1
+    finally:
+        capture.release()
+
+
+def iter_frame_directory(path, sample_fps=VIDEO_SAMPLE_FPS, source_fps=FRAME_DIR_FPS, consumers=CONSUMERS, stats=None):
+    """Yields Frames from a folder of extracted frames (sorted by name), sampled as if it played at `source_fps`."""
+    files = sorted(f for f in os.listdir(path) if f.lower().endswith(FRAME_EXTENSIONS))
+    step = max(1, round(source_fps / sample_fps)) if sample_fps > 0 else 1
+    for index in range(0, len(files), step):
+        if stats is not None:
+            stats["frames_read"] += min(step, len(files) - index)
+            stats["source_seconds"] = min(index + step, len(files)) / source_fps
+        # Draft-decode straight to the size the consumers need.
+        image = ImageInput.from_path(os.path.join(path, files[index]), consumers=consumers).image
+        yield Frame(index, index / source_fps, image, files[index])
+
+
+def iter_frames(source, sample_fps=VIDEO_SAMPLE_FPS, consumers=CONSUMERS, stats=None):
+    if os.path.isdir(source):
+        return iter_frame_directory(source, sample_fps, consumers=consumers, stats=stats)
+    return iter_video_frames(source, sample_fps, consumers=consumers, stats=stats)
+
+
+def frame_hash(image):
+    """64-bit difference hash: robust to small exposure/compression changes, cheap to compare."""
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hash_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VideoInspector:
+    """
+    Continuous inspection of a video (or frame folder) through one strategy.
+    Frames are sampled at `sample_fps`; a sampled frame becomes a keyframe
+    only if it differs from the previous keyframe (perceptual hash or SigLIP
+    similarity). Keyframes go through batched SigLIP and YOLO passes; only
+    those with a new set of detections, or whose embedding is novel against
+    recently analyzed frames, get a reference lookup and an LLM analysis.
+    """
+    def __init__(self, engine, memory=None, sample_fps=VIDEO_SAMPLE_FPS, method=KEYFRAME_METHOD,
+                 batch_size=VIDEO_BATCH, consumers=None, llm_concurrency=VIDEO_LLM_CONCURRENCY):
+        if method not in ("phash", "siglip"):
+            raise ValueError(f"Unknown keyframe method '{method}' (expected phash or siglip)")
+        self.engine = engine
+        self.memory = memory
+        self.sample_fps = sample_fps
+        self.method = method
+        self.batch_size = max(1, batch_size)
+        # Only the variants the strategy reads: local modes never build a cloud payload.
+        self.consumers = tuple(consumers or getattr(engine, "image_consumers", CONSUMERS))
+        self.llm_concurrency = max(1, llm_concurrency)
+
+    def _select_keyframes(self, chunk, state):
+        """Returns (keyframes, their SigLIP vectors or None) and updates the last-keyframe state."""
+        if self.method == "phash":
+            keyframes = []
+            for frame in chunk:
+                h = frame_hash(frame.image)
+                if state["last_hash"] is None or hash_distance(h, state["last_hash"]) > KEYFRAME_HASH_DISTANCE:
+                    keyframes.append(frame)
+                    state["last_hash"] = h
+            return keyframes, None
+
+        vectors = get_siglip_embeddings([frame.image for frame in chunk])
+        keyframes, keyframe_vectors = [], []
+        for frame, vector in zip(chunk, vectors):
+            if vector is None:
+                # No embedding to compare: keep the frame, the detections still decide on analysis.
+                keyframes.append(frame)
+                keyframe_vectors.append(None)
+                continue
+            unit = _unit(vector)
+            if state["last_vector"] is None or float(unit @ state["last_vector"]) < KEYFRAME_SIMILARITY:
+                keyframes.append(frame)
+                keyframe_vectors.append(vector)
+                state["last_vector"] = unit
+        return keyframes, keyframe_vectors
+
+    def _should_analyze(self, vector, detections, state):
+        recent = state["analyzed"]
+        # Without a SigLIP vector novelty is unknown: only new detections trigger an analysis.
+        unit = _unit(vector) if vector is not None else None
+        novel = unit is not None and (not recent or max(float(unit @ v) for v in recent) < NOVELTY_SIMILARITY)
+        labels = frozenset(detections or [])
+        new_detections = bool(labels) and labels != state["last_labels"]
+        if novel or new_detections:
+            if unit is not None:
+                recent.append(unit)
+            if labels:
+                state["last_labels"] = labels
+            return True
+        return False
+
+    def run(self, source, context="", on_result=None):
+        """
+        Inspects `source` (video file or frame folder). `on_result` is called
+        with a dict per analyzed frame as it finishes. Returns the summary.
+        """
+        stats = {"frames_read": 0, "frames_sampled": 0, "duplicates_skipped": 0, "keyframes": 0,
+                 "frames_with_detections": 0, "not_novel_skipped": 0, "analyzed": 0, "errors": 0,
+                 "source_seconds": 0.0}
+        busy = {"decode": 0.0, "keyframes": 0.0, "siglip": 0.0, "yolo": 0.0, "rag": 0.0}
+        state = {"last_hash": None, "last_vector": None, "analyzed": deque(maxlen=NOVELTY_WINDOW),
+                 "last_labels": frozenset()}
+        started = time.perf_counter()
+        pending = set()
+
+        def finish(futures):
+            for future in futures:
+                item = future.result()
+                stats["errors" if item["error"] else "analyzed"] += 1
+                if on_result:
+                    on_result(item)
+
+        def analyze(frame, image, vector, detections, ref_case):
+            incident_id = str(uuid.uuid4())
+            item = {"frame": frame.index, "timestamp": frame.timestamp, "name": frame.name,
+                    "incident_id": incident_id, "detections": sorted(set(detections or [])),
+                    "ref_case": ref_case, "result": None, "error": None}
+            try:
+                item["result"] = self.engine.process(
+                    image, incident_id, user_context=inject_reference(context, ref_case),
+                    detections=detections, vector=vector
+                )
+            except Exception as e:
+                item["error"] = str(e)
+            return item
+
+        frames = iter_frames(source, self.sample_fps, consumers=self.consumers, stats=stats)
+        with ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix="felix-video-llm") as llm:
+            while True:
+                t0 = time.perf_counter()
+                chunk = [frame for _, frame in zip(range(self.batch_size), frames)]
+                busy["decode"] += time.perf_counter() - t0
+                if not chunk:
+                    break
+                stats["frames_sampled"] += len(chunk)
+
+                t0 = time.perf_counter()
+                keyframes, vectors = self._select_keyframes(chunk, state)
+                busy["keyframes"] += time.perf_counter() - t0
+                stats["keyframes"] += len(keyframes)
+                stats["duplicates_skipped"] += len(chunk) - len(keyframes)
+                if not keyframes:
+                    continue
+
+                images = [ImageInput.from_image(f.image, name=f.name, consumers=self.consumers) for f in keyframes]
+                if vectors is None:
+                    t0 = time.perf_counter()
+                    vectors = get_siglip_embeddings(images)
+                    busy["siglip"] += time.perf_counter() - t0
+                t0 = time.perf_counter()
+                detections = self.engine.detect_many(images)
+                busy["yolo"] += time.perf_counter() - t0
+
+                selected = []
+                for i, (vector, found) in enumerate(zip(vectors, detections)):
+                    if found:
+                        stats["frames_with_detections"] += 1
+                    if self._should_analyze(vector, found, state):
+                        selected.append(i)
+                    else:
+                        stats["not_novel_skipped"] += 1
+                if not selected:
+                    continue
+
+                refs = [None] * len(selected)
+                if self.memory is not None:
+                    t0 = time.perf_counter()
+                    refs = self.memory.get_reference_cases([vectors[i] for i in selected], 3)
+                    busy["rag"] += time.perf_counter() - t0
+                for i, ref_case in zip(selected, refs):
+                    # Bounded fan-out: never more than two rounds of LLM calls queued.
+                    while len(pending) >= 2 * self.llm_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        finish(done)
+                    pending.add(llm.submit(analyze, keyframes[i], images[i], vectors[i], detections[i], ref_case))
+            done, pending = wait(pending)
+            finish(done)
+
+        elapsed = time.perf_counter() - started
+        return dict(
+            stats,
+            seconds=elapsed,
+            sampled_fps=stats["frames_sampled"] / elapsed if elapsed else 0.0,
+            source_fps=stats["frames_read"] / elapsed if elapsed else 0.0,
+            # > 1.0 means the pipeline keeps up with the camera in real time.
+            realtime_factor=stats["source_seconds"] / elapsed if elapsed else 0.0,
+            skipped_ratio=1 - stats["analyzed"] / stats["frames_sampled"] if stats["frames_sampled"] else 0.0,
+            busy_seconds=busy,
+        )
@@ -0,0 +1,39 @@
+import os
+import sys
+import json
+import argparse
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.qdrant_backend import get_client, backend_info
+from src.schema import (
+    COLLECTION_IMAGES, COLLECTION_KNOWLEDGE, COLLECTION_PROFILES,
+    apply_profile, describe_collection, ensure_collections, get_profile
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or migrate the collection profile of rail_safety_logs / expert_knowledge")
+    parser.add_argument("profile", nargs="?", help=f"One of: {', '.join(COLLECTION_PROFILES)}")
+    parser.add_argument("--list", action="store_true", help="List the available profiles")
+    args = parser.parse_args()
+
+    if args.list:
+        for profile in COLLECTION_PROFILES.values():
+            print(f" {profile.name:<16} {profile.description}")
+        return
+
+    client = get_client()
+    print(f" Qdrant backend: {backend_info()}")
+    ensure_collections(client)
+    if args.profile:
+        apply_profile(client, get_profile(args.profile))
+        print(f" Set FELIX_COLLECTION_PROFILE={args.profile} so the API uses its search settings.")
+    for collection in (COLLECTION_IMAGES, COLLECTION_KNOWLEDGE):
+        print(f"\n {collection}:")
+        print(json.dumps(describe_collection(client, collection), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from qdrant_client import models
+from src.qdrant_backend import create_client
+from src.schema import OFFLINE_LANE_QUANTIZATION
+
+DIM = 768
+FLOAT_COLLECTION = "bench_offline_float"
+BINARY_COLLECTION = "bench_offline_binary"
+
+
+def synthetic_vectors(n, dim, seed=0, clusters=2000):
+    """Clustered unit vectors, closer to real SigLIP neighbourhoods than pure noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def create(client, name, vectors, quantized):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config={
+            "offline_lane": models.VectorParams(
+                size=DIM,
+                distance=models.Distance.COSINE,
+                on_disk=quantized,
+                quantization_config=OFFLINE_LANE_QUANTIZATION if quantized else None
+            )
+        }
+    )
+    started = time.perf_counter()
+    batch = 1000
+    for i in range(0, len(vectors), batch):
+        client.upsert(
+            collection_name=name,
+            points=models.Batch(
+                ids=list(range(i, min(i + batch, len(vectors)))),
+                vectors={"offline_lane": vectors[i:i + batch].tolist()}
+            ),
+            wait=True
+        )
+    return time.perf_counter() - started
+
+
+def run_queries(client, name, queries, k, search_params):
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        points = client.query_points(
+            collection_name=name, query=q.tolist(), using="offline_lane",
+            limit=k, search_params=search_params
+        ).points
+        latencies.append(time.perf_counter() - t0)
+        found.append([p.id for p in points])
+    return found, np.array(latencies) * 1000
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def numpy_hamming(vectors, queries, k):
+    """Reference scan over packed bits: XOR + popcount, no Qdrant involved."""
+    packed = np.packbits(vectors > 0, axis=1)
+    popcount = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+    found, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        distances = popcount[np.bitwise_xor(packed, np.packbits(q > 0))].sum(axis=1)
+        found.append(np.argpartition(distances, k)[:k].tolist())
+        latencies.append(time.perf_counter() - t0)
+    return found, np.array(latencies) * 1000, packed.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary offline lane vs float lane: recall@k / latency / memory")
+    parser.add_argument("--url", default=os.environ.get("QDRANT_URL"), help="Qdrant server (quantization needs server mode)")
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--oversampling", default="1,2,4")
+    args = parser.parse_args()
+
+    if args.url:
+        client = create_client("server", url=args.url)
+    else:
+        print(" Warning: no --url/QDRANT_URL, using in-memory local mode where quantization is not applied.")
+        client = create_client("memory")
+
+    print(f" Generating {args.points} vectors...")
+    vectors = synthetic_vectors(args.points, DIM)
+    queries = synthetic_vectors(args.queries, DIM, seed=1)
+    truth = [np.argsort(-vectors @ q)[:args.k].tolist() for q in queries]
+
+    build_float = create(client, FLOAT_COLLECTION, vectors, quantized=False)
+    build_binary = create(client, BINARY_COLLECTION, vectors, quantized=True)
+    float_mb = vectors.nbytes / 1e6
+    bits_mb = args.points * DIM / 8 / 1e6
+
+    rows = []
+    found, lat = run_queries(client, FLOAT_COLLECTION, queries, args.k, None)
+    rows.append(("float lane", recall(found, truth), lat, float_mb, build_float))
+
+    no_rescore = models.SearchParams(quantization=models.QuantizationSearchParams(ignore=False, rescore=False))
+    found, lat = run_queries(client, BINARY_COLLECTION, queries, args.k, no_rescore)
+    rows.append(("binary, no rescore", recall(found, truth), lat, bits_mb, build_binary))
+
+    for factor in [float(x) for x in args.oversampling.split(",")]:
+        params = models.SearchParams(
+            quantization=models.QuantizationSearchParams(ignore=False, rescore=True, oversampling=factor)
+        )
+        found, lat = run_queries(client, BINARY_COLLECTION, queries, args.k, params)
+        rows.append((f"binary + rescore x{factor:g}", recall(found, truth), lat, bits_mb, build_binary))
+
+    found, lat, packed_bytes = numpy_hamming(vectors, queries, args.k)
+    rows.append(("numpy hamming scan", recall(found, truth), lat, packed_bytes / 1e6, 0.0))
+
+    print(f"\n {args.points} points, {args.queries} queries, k={args.k}")
+    print(f" {'variant':<24} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'RAM MB':>8} {'build s':>8}")
+    for label, r, lat, mb, build in rows:
+        print(f" {label:<24} {r:>9.3f} {np.percentile(lat, 50):>8.2f} {np.percentile(lat, 99):>8.2f} {mb:>8.1f} {build:>8.1f}")
+    print("\n RAM MB is vector payload only: float32 originals vs 1-bit codes (originals stay on disk for rescoring).")
+
+    client.delete_collection(FLOAT_COLLECTION)
+    client.delete_collection(BINARY_COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
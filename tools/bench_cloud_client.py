@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from openai import OpenAI
+from src.cloud_client import CloudClient
+from tools.openai_stub import serve_in_thread
+
+MESSAGES = [{"role": "system", "content": "stub system"}, {"role": "user", "content": "Analyze this rail segment:"}]
+
+
+def sequential_request(client, i):
+    """The old CloudMatryoshkaStrategy path: a blocking chat call, then one embeddings.create per request."""
+    response = client.chat.completions.create(messages=MESSAGES, model="gpt-4o", temperature=0)
+    text = response.choices[0].message.content + f" #{i}"
+    return client.embeddings.create(input=text, model="text-embedding-3-small").data[0].embedding
+
+
+def cloud_request(client, i):
+    text = client.chat(MESSAGES, model="gpt-4o", temperature=0) + f" #{i}"
+    return client.embed(text, model="text-embedding-3-small")
+
+
+def run(label, server, fn, requests, threads):
+    before = dict(server.counts)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        vectors = list(pool.map(fn, range(requests)))
+    elapsed = time.perf_counter() - started
+    delta = {k: server.counts[k] - before[k] for k in server.counts}
+    print(f" {label:<12} {requests / elapsed:>7.1f} {delta['connections']:>6} {delta['embedding_requests']:>7} "
+          f"{delta['rate_limited']:>5} {sum(1 for v in vectors if len(v) == 1536):>4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cloud client against a local OpenAI-compatible stub")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-limit-every", type=int, default=25)
+    args = parser.parse_args()
+
+    server = serve_in_thread(latency=args.latency, rate_limit_every=args.rate_limit_every, retry_after=0.05)
+    try:
+        print(f" {args.requests} requests, {args.threads} threads, every {args.rate_limit_every}th API call is 429")
+        print(f" {'client':<12} {'req/s':>7} {'conns':>6} {'emb API':>7} {'429s':>5} {'ok':>4}")
+        sync_client = OpenAI(base_url=server.url, api_key="stub", max_retries=5)
+        run("sync OpenAI", server, lambda i: sequential_request(sync_client, i), args.requests, args.threads)
+        cloud = CloudClient(base_url=server.url, api_key="stub")
+        run("CloudClient", server, lambda i: cloud_request(cloud, i), args.requests, args.threads)
+        text = "".join(cloud.chat_stream(MESSAGES, model="gpt-4o"))
+        print(f" streamed {len(text)} chars")
+        for kind, stats in cloud.stats().items():
+            print(f" {kind:<12} {stats}")
+        cloud.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import glob
+import argparse
+import threading
+
+import numpy as np
+from PIL import Image
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from transformers import AutoProcessor, AutoModel
+from src.embedding_service import EmbeddingService
+
+SIGLIP_MODEL = "google/siglip2-base-patch16-224"
+
+
+def load_images(image_dir, count):
+    paths = []
+    if image_dir and os.path.isdir(image_dir):
+        for ext in ("jpg", "jpeg", "png"):
+            paths.extend(glob.glob(os.path.join(image_dir, "**", f"*.{ext}"), recursive=True))
+    if paths:
+        return [Image.open(p).convert("RGB") for p in paths[:count]]
+    print(" No images found, using synthetic 640x480 frames.")
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def run(service, images, concurrency, requests_per_client):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(worker_id):
+        local = []
+        for i in range(requests_per_client):
+            image = images[(worker_id * requests_per_client + i) % len(images)]
+            t0 = time.perf_counter()
+            service.embed(image)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "embeddings_per_sec": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "avg_batch": service.stats()["avg_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SigLIP micro-batching benchmark")
+    parser.add_argument("--images", default="datasets")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32")
+    parser.add_argument("--wait-ms", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=8, help="Requests per concurrent client")
+    args = parser.parse_args()
+
+    print(f" Loading SigLIP ({SIGLIP_MODEL})...")
+    processor = AutoProcessor.from_pretrained(SIGLIP_MODEL)
+    model = AutoModel.from_pretrained(SIGLIP_MODEL)
+    images = load_images(args.images, 64)
+
+    # Warm the model so the first configuration does not pay for lazy init.
+    EmbeddingService(processor, model, max_batch_size=1, max_wait_ms=0).embed(images[0])
+
+    print(f"\n concurrency={args.concurrency} wait={args.wait_ms}ms requests={args.concurrency * args.requests}")
+    print(f" {'batch':>6} {'emb/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'avg batch':>10}")
+    for size in [int(s) for s in args.batch_sizes.split(",")]:
+        service = EmbeddingService(processor, model, max_batch_size=size, max_wait_ms=args.wait_ms)
+        r = run(service, images, args.concurrency, args.requests)
+        print(f" {size:>6} {r['embeddings_per_sec']:>10.1f} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['avg_batch']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import io
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.image_input import ImageInput, consumers_for_mode
+
+
+def synthetic_jpeg(width, height, quality=92):
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise, closer to a photo than pure noise for JPEG size.
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([(x * 255 // width), (y * 255 // height), ((x + y) * 127 // (width + height))], axis=-1)
+    pixels = np.clip(base + rng.integers(-12, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def full_decode(data):
+    """The previous path: full-resolution decode, then each consumer resizes on its own."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    image = image.convert("RGB")
+    image.resize((224, 224), Image.BICUBIC)
+    scale = 640 / max(image.size)
+    image.resize((round(image.width * scale), round(image.height * scale)), Image.BILINEAR)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs DCT-scaled decode of high-megapixel JPEGs")
+    parser.add_argument("images", nargs="*", help="JPEG files (default: synthetic 12 MP and 48 MP images)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [(path, open(path, "rb").read()) for path in args.images] or [
+        ("synthetic 12MP", synthetic_jpeg(4000, 3000)),
+        ("synthetic 48MP", synthetic_jpeg(8000, 6000)),
+    ]
+    print(f" {'image':<18} {'mode':<6} {'full ms':>8} {'prep ms':>8} {'decoded':>11} {'upload KB':>10} {'saved KB':>9}")
+    for name, data in samples:
+        for mode in ("local", "cloud"):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                full_decode(data)
+            full_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                image = ImageInput(data, name=name, consumers=consumers_for_mode(mode))
+                image.siglip_image
+                if mode == "cloud":
+                    image.cloud_jpeg()
+                else:
+                    image.yolo_image
+            prep_ms = (time.perf_counter() - started) * 1000 / args.repeat
+            prep = image.prep
+            decoded = "x".join(str(v) for v in prep["decoded_size"])
+            upload = f"{prep['cloud_bytes'] / 1024:.0f}" if "cloud_bytes" in prep else "-"
+            saved = f"{prep['cloud_bytes_saved'] / 1024:.0f}" if "cloud_bytes_saved" in prep else "-"
+            print(f" {name[:18]:<18} {mode:<6} {full_ms:>8.1f} {prep_ms:>8.1f} {decoded:>11} {upload:>10} {saved:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from qdrant_client import models
+from src.qdrant_backend import create_client
+from src.memory import matryoshka_query
+from src.schema import FAST_LANE_DIM, fast_lane_vectors, image_vectors_config
+
+COLLECTION = "bench_fast_lane"
+
+
+def synthetic_matryoshka(n, seed=0, clusters=2000):
+    """
+    Unit vectors whose variance decays with the dimension index, so leading
+    prefixes carry most of the signal the way Matryoshka embeddings do.
+    """
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(1.0 + np.arange(FAST_LANE_DIM) / 32.0)
+    centers = rng.standard_normal((clusters, FAST_LANE_DIM)) * scale
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, FAST_LANE_DIM)) * scale
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def openai_embeddings(path, limit):
+    from src.models import registry
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()][:limit]
+    client = registry.get("openai")
+    vectors = []
+    for i in range(0, len(texts), 256):
+        response = client.embeddings.create(input=texts[i:i + 256], model="text-embedding-3-small")
+        vectors.extend(d.embedding for d in response.data)
+    return np.array(vectors, dtype=np.float32)
+
+
+def load(client, vectors, prefixes):
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    config = image_vectors_config(prefixes)
+    config.pop("offline_lane")
+    client.create_collection(collection_name=COLLECTION, vectors_config=config)
+    for i in range(0, len(vectors), 500):
+        client.upsert(
+            collection_name=COLLECTION,
+            points=[
+                models.PointStruct(id=i + j, vector=fast_lane_vectors(v.tolist(), prefixes))
+                for j, v in enumerate(vectors[i:i + 500])
+            ],
+            wait=True
+        )
+
+
+def evaluate(client, queries, truth, k, prefixes, candidates):
+    latencies, hits = [], []
+    for q, t in zip(queries, truth):
+        t0 = time.perf_counter()
+        points = client.query_points(
+            collection_name=COLLECTION, limit=k, **matryoshka_query(q.tolist(), k, prefixes, candidates)
+        ).points
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits.append(len({p.id for p in points} & set(t)) / k)
+    return float(np.mean(hits)), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matryoshka coarse-to-fine fast lane: latency vs recall")
+    parser.add_argument("--url", default=os.environ.get("QDRANT_URL"))
+    parser.add_argument("--points", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--configs", default="none;256;64,256;64;128,512",
+                        help="Semicolon-separated prefix sets ('none' = single 1536 pass)")
+    parser.add_argument("--candidates", default="5,20")
+    parser.add_argument("--texts", default=None, help="Text file to embed with text-embedding-3-small instead of synthetic data")
+    args = parser.parse_args()
+
+    client = create_client("server", url=args.url) if args.url else create_client("memory")
+
+    if args.texts:
+        data = openai_embeddings(args.texts, args.points + args.queries)
+        vectors, queries = data[:-args.queries], data[-args.queries:]
+    else:
+        vectors = synthetic_matryoshka(args.points)
+        queries = synthetic_matryoshka(args.queries, seed=1)
+    truth = [np.argsort(-(vectors @ q))[:args.k].tolist() for q in queries]
+
+    print(f" {len(vectors)} points, {len(queries)} queries, k={args.k}")
+    print(f" {'prefixes':<12} {'cand x':>7} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'floats/pt':>10}")
+    for config in args.configs.split(";"):
+        prefixes = [] if config == "none" else sorted(int(d) for d in config.split(","))
+        load(client, vectors, prefixes)
+        stored = FAST_LANE_DIM + sum(prefixes)
+        for candidates in ([1] if not prefixes else [int(c) for c in args.candidates.split(",")]):
+            r, p50, p99 = evaluate(client, queries, truth, args.k, prefixes, candidates)
+            print(f" {config:<12} {candidates:>7} {r:>9.3f} {p50:>8.2f} {p99:>8.2f} {stored:>10}")
+
+    client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.ollama_client import OllamaClient, InvalidJSON
+from tools.ollama_stub import serve_in_thread
+
+PROMPT = "A user has reported an incident.\nYOLO detections from the scene: train, person\nUser provided context: "
+
+
+def run_naive(url, calls, threads):
+    """The old way: a fresh connection per call, instructions inlined in the prompt."""
+    def call(_):
+        response = requests.post(url, json={"model": "stub", "prompt": PROMPT, "stream": False, "format": "json"},
+                                 timeout=90)
+        return response.json()["response"]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(call, range(calls)))
+
+
+def run_sync(client, calls, threads):
+    def call(_):
+        try:
+            return client.generate(PROMPT, system="stub system")
+        except InvalidJSON as e:
+            return e.text
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(call, range(calls)))
+
+
+async def run_async(client, calls):
+    async def call():
+        try:
+            return await client.agenerate(PROMPT, system="stub system")
+        except InvalidJSON as e:
+            return e.text
+    try:
+        return await asyncio.gather(*(call() for _ in range(calls)))
+    finally:
+        await client.aclose()
+
+
+def timed(label, server, fn):
+    before = dict(server.counts)
+    started = time.perf_counter()
+    answers = fn()
+    elapsed = time.perf_counter() - started
+    connections = server.counts["connections"] - before["connections"]
+    requests_made = server.counts["requests"] - before["requests"]
+    valid = sum(1 for a in answers if _is_json(a))
+    print(f" {label:<16} {len(answers) / elapsed:>8.1f} {connections:>6} {requests_made:>9} {valid:>6}")
+
+
+def _is_json(text):
+    try:
+        json.loads(text)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama client against a local /api/generate stub")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--parallel", type=int, default=4, help="Stub (server) parallelism")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--invalid-every", type=int, default=10)
+    args = parser.parse_args()
+
+    server = serve_in_thread(latency=args.latency, parallel=args.parallel, invalid_every=args.invalid_every)
+    try:
+        print(f" {args.calls} calls, {args.threads} threads, server parallelism {args.parallel}, "
+              f"every {args.invalid_every}th answer invalid")
+        print(f" {'client':<16} {'calls/s':>8} {'conns':>6} {'requests':>9} {'valid':>6}")
+        timed("requests.post", server, lambda: run_naive(server.url + "/api/generate", args.calls, args.threads))
+        client = OllamaClient(host=server.url, model="stub", parallel=args.parallel)
+        timed("pooled sync", server, lambda: run_sync(client, args.calls, args.threads))
+        async_client = OllamaClient(host=server.url, model="stub", parallel=args.parallel)
+        timed("pooled async", server, lambda: asyncio.run(run_async(async_client, args.calls)))
+
+        text = "".join(client.stream(PROMPT, system="stub system"))
+        print(f" streamed answer valid: {_is_json(text)}")
+        client.warm()
+        print(f" system prompt sent separately: {server.counts['with_system']} calls, "
+              f"keep_alive sent: {server.counts['with_keep_alive']} calls")
+        print(f" sync stats:  {client.stats()}")
+        print(f" async stats: {async_client.stats()}")
+        client.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.models import SIGLIP_MODEL
+from src.detector import detector_weights
+from src.embedding_service import EmbeddingService
+from src.onnx_backend import (
+    SIGLIP_ONNX, OnnxSiglipVision, onnx_path, yolo_onnx_name, collect_calibration_images, has_dynamic_batch
+)
+
+DATA_YAML = "datasets/training_vision/data.yaml"
+
+
+def time_calls(fn, items, batch):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(0, len(items), batch):
+        t0 = time.perf_counter()
+        fn(items[i:i + batch])
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "items_per_sec": len(items) / elapsed,
+    }
+
+
+def bench_siglip(images, batch):
+    from transformers import AutoProcessor, AutoModel
+    processor = AutoProcessor.from_pretrained(SIGLIP_MODEL)
+    variants = {"torch": AutoModel.from_pretrained(SIGLIP_MODEL)}
+    for label, int8 in (("onnx", False), ("onnx-int8", True)):
+        path = onnx_path(SIGLIP_ONNX, int8=int8)
+        if os.path.exists(path):
+            variants[label] = OnnxSiglipVision(path)
+
+    baseline = None
+    print(f"\n SigLIP ({len(images)} images, batch {batch})")
+    print(f" {'backend':<10} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'cos drift (mean/min)':>22}")
+    for label, model in variants.items():
+        # max_wait 0: embed_many already hands over full batches.
+        service = EmbeddingService(processor, model, max_batch_size=batch, max_wait_ms=0)
+        service.embed_many(images[:batch])
+        timing = time_calls(service.embed_many, images, batch)
+        vectors = np.array(service.embed_many(images))
+        if baseline is None:
+            baseline = vectors
+            drift = "baseline"
+        else:
+            cos = np.sum(vectors * baseline, axis=1)
+            drift = f"{1 - cos.mean():.5f} / {cos.min():.4f}"
+        print(f" {label:<10} {timing['p50_ms']:>8.1f} {timing['p95_ms']:>8.1f} {timing['items_per_sec']:>8.1f} {drift:>22}")
+
+
+def dataset_names(data_yaml):
+    import yaml
+    with open(data_yaml) as f:
+        names = yaml.safe_load(f).get("names") or {}
+    return dict(enumerate(names)) if isinstance(names, list) else {int(k): v for k, v in names.items()}
+
+
+def bench_yolo(images, batch, weights, data_yaml):
+    from ultralytics import YOLO
+    if data_yaml and os.path.exists(data_yaml):
+        # mAP of a detector against someone else's labels is noise, not drift.
+        expected, actual = dataset_names(data_yaml), dict(YOLO(weights).names)
+        if expected != actual:
+            raise SystemExit(f" {weights} classes {actual} do not match {data_yaml} {expected}; "
+                             f"pass the weights trained on it with --yolo-weights or another --data.")
+    variants = {"torch": weights}
+    for label, int8 in (("onnx", False), ("onnx-int8", True)):
+        path = onnx_path(yolo_onnx_name(weights), int8=int8)
+        if os.path.exists(path):
+            variants[label] = path
+
+    print(f"\n YOLO ({len(images)} images)")
+    print(f" {'backend':<10} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'mAP50':>8} {'mAP50-95':>9} {'mAP drift':>10}")
+    base_map = None
+    for label, path in variants.items():
+        model = YOLO(path, task="detect")
+        # Exports made before dynamic=True have a fixed batch of 1.
+        step = batch if label == "torch" or has_dynamic_batch(path) else 1
+        model.predict(images[:1], verbose=False)
+        timing = time_calls(lambda chunk: model.predict(chunk, verbose=False), images, step)
+        map50 = map5095 = drift = float("nan")
+        if data_yaml and os.path.exists(data_yaml):
+            metrics = model.val(data=data_yaml, imgsz=640, batch=1, plots=False, verbose=False)
+            map50, map5095 = metrics.box.map50, metrics.box.map
+            if base_map is None:
+                base_map = map5095
+            drift = map5095 - base_map
+        print(f" {label:<10} {timing['p50_ms']:>8.1f} {timing['p95_ms']:>8.1f} {timing['items_per_sec']:>8.1f} "
+              f"{map50:>8.3f} {map5095:>9.3f} {drift:>+10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Torch vs ONNX Runtime (fp32/int8) comparison")
+    parser.add_argument("--images", default="datasets")
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--models", default="siglip,yolo")
+    parser.add_argument("--yolo-weights", default=detector_weights()["rail_defect"],
+                        help="Defaults to the rail defect detector, the one trained on --data")
+    parser.add_argument("--data", default=DATA_YAML, help="YOLO data.yaml for mAP drift")
+    args = parser.parse_args()
+
+    paths = collect_calibration_images(args.images, args.count)
+    if paths:
+        images = [Image.open(p).convert("RGB") for p in paths]
+    else:
+        print(" No images found, using synthetic frames (drift numbers will be meaningless).")
+        rng = np.random.default_rng(0)
+        images = [Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)) for _ in range(args.count)]
+
+    targets = args.models.split(",")
+    if "siglip" in targets:
+        bench_siglip(images, args.batch)
+    if "yolo" in targets:
+        bench_yolo(images, args.batch, args.yolo_weights, args.data)
+
+
+if __name__ == "__main__":
+    main()
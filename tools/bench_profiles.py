@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from qdrant_client import models
+from src.qdrant_backend import create_client
+from src.schema import COLLECTION_PROFILES, hnsw_config, image_vectors_config, knowledge_vectors_config
+from tools.bench_binary_lane import synthetic_vectors, recall
+
+COLLECTION = "bench_profiles"
+LANES = {"offline_lane": 768, "fast_lane": 1536, "text_vector": 384}
+
+
+def lane_params(profile, lane):
+    if lane == "text_vector":
+        return knowledge_vectors_config(profile)[lane]
+    return image_vectors_config(prefixes=[], profile=profile)[lane]
+
+
+def ram_per_million(profile, params):
+    """
+    Estimated resident bytes per point: float vectors unless on disk, the
+    quantized copy, and the level-0 HNSW links (2*m ids of 4 bytes, ~10% more
+    for upper levels) unless the graph is on disk. Payloads are not counted.
+    """
+    dim = params.size
+    per_point = 0 if params.on_disk else dim * 4
+    quant = params.quantization_config
+    if isinstance(quant, models.BinaryQuantization):
+        per_point += dim / 8
+    elif isinstance(quant, models.ScalarQuantization):
+        per_point += dim
+    if not profile.hnsw_on_disk:
+        per_point += profile.m * 2 * 4 * 1.1
+    return per_point * 1_000_000 / 2 ** 20
+
+
+def build(client, lane, params, profile, vectors):
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    started = time.perf_counter()
+    client.create_collection(collection_name=COLLECTION, vectors_config={lane: params}, hnsw_config=hnsw_config(profile))
+    for i in range(0, len(vectors), 1000):
+        client.upsert(
+            collection_name=COLLECTION,
+            points=models.Batch(ids=list(range(i, min(i + 1000, len(vectors)))), vectors={lane: vectors[i:i + 1000].tolist()}),
+            wait=True
+        )
+    # Build time includes HNSW/quantization indexing, which the server finishes asynchronously.
+    while client.get_collection(COLLECTION).status != models.CollectionStatus.GREEN:
+        time.sleep(0.2)
+    return time.perf_counter() - started
+
+
+def measure(client, lane, profile, queries, k, oversampling):
+    params = models.SearchParams(
+        hnsw_ef=profile.hnsw_ef,
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    )
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        points = client.query_points(
+            collection_name=COLLECTION, query=q.tolist(), using=lane, limit=k, search_params=params
+        ).points
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append([p.id for p in points])
+    return found, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep collection profiles: recall@k, latency, build time, RAM")
+    parser.add_argument("--url", default=os.environ.get("QDRANT_URL"), help="Qdrant server (HNSW and quantization need server mode)")
+    parser.add_argument("--profiles", default=",".join(COLLECTION_PROFILES))
+    parser.add_argument("--lane", default="offline_lane", choices=sorted(LANES))
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.url:
+        client = create_client("server", url=args.url)
+    else:
+        print(" Warning: no --url/QDRANT_URL, local mode scans exact floats and ignores HNSW/quantization.")
+        client = create_client("memory")
+
+    dim = LANES[args.lane]
+    vectors = synthetic_vectors(args.points, dim)
+    queries = synthetic_vectors(args.queries, dim, seed=1)
+    truth = [np.argsort(-(vectors @ q))[:args.k].tolist() for q in queries]
+
+    print(f" {args.lane}: {args.points} points x {dim}d, {args.queries} queries, k={args.k}")
+    print(f" {'profile':<16} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'RAM MiB/1M':>11}")
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        profile = COLLECTION_PROFILES[name]
+        params = lane_params(profile, args.lane)
+        build_seconds = build(client, args.lane, params, profile, vectors)
+        found, p50, p99 = measure(client, args.lane, profile, queries, args.k, args.oversampling)
+        print(f" {name:<16} {recall(found, truth):>9.3f} {p50:>8.2f} {p99:>8.2f} {build_seconds:>8.1f} "
+              f"{ram_per_million(profile, params):>11.0f}")
+
+    client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from qdrant_client import models
+from src.qdrant_backend import create_client
+
+COLLECTION = "bench_backends"
+DIM = 768
+
+
+def launch_server(image, http_port, grpc_port):
+    """Starts a throwaway Qdrant container and waits until it answers /readyz."""
+    name = f"felix-bench-qdrant-{os.getpid()}"
+    subprocess.run(
+        ["docker", "run", "-d", "--rm", "--name", name,
+         "-p", f"{http_port}:6333", "-p", f"{grpc_port}:6334", image],
+        check=True, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://localhost:{http_port}/readyz", timeout=1)
+            return name
+        except Exception:
+            time.sleep(0.5)
+    subprocess.run(["docker", "stop", name], stdout=subprocess.DEVNULL)
+    raise RuntimeError("Qdrant container did not become ready")
+
+
+def load(client, vectors, batch=500):
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config={"offline_lane": models.VectorParams(size=DIM, distance=models.Distance.COSINE)}
+    )
+    started = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        client.upsert(
+            collection_name=COLLECTION,
+            points=[
+                models.PointStruct(id=i + j, vector={"offline_lane": v.tolist()}, payload={"status": "OK"})
+                for j, v in enumerate(vectors[i:i + batch])
+            ],
+            wait=True
+        )
+    return len(vectors) / (time.perf_counter() - started)
+
+
+def query(client, vector, k):
+    return client.query_points(
+        collection_name=COLLECTION, query=vector, using="offline_lane", limit=k, with_payload=True
+    ).points
+
+
+def measure(client, queries, k, threads):
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        query(client, q, k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda q: query(client, q, k), queries))
+    qps = len(queries) / (time.perf_counter() - started)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), qps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query latency / throughput per Qdrant backend")
+    parser.add_argument("--url", default=os.environ.get("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--launch", action="store_true", help="Start a local Qdrant in Docker for the server modes")
+    parser.add_argument("--image", default="qdrant/qdrant:latest")
+    parser.add_argument("--modes", default="memory,embedded,server-http,server-grpc")
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.points, DIM)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, DIM)).astype(np.float32).tolist()
+
+    container = None
+    tmp_dir = tempfile.mkdtemp(prefix="felix-bench-qdrant-")
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    try:
+        if args.launch and any(m.startswith("server") for m in modes):
+            container = launch_server(args.image, 6333, 6334)
+            args.url = "http://localhost:6333"
+
+        print(f" {args.points} points x {DIM}d, {args.queries} queries, k={args.k}, {args.threads} threads")
+        print(f" {'backend':<12} {'upsert/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'qps':>8}")
+        for mode in modes:
+            if mode == "embedded":
+                client = create_client("embedded", path=os.path.join(tmp_dir, "qdrant_db"))
+            elif mode == "memory":
+                client = create_client("memory")
+            else:
+                client = create_client("server", url=args.url, prefer_grpc=mode == "server-grpc")
+            try:
+                ingest_rate = load(client, vectors)
+                p50, p99, qps = measure(client, queries, args.k, args.threads)
+                print(f" {mode:<12} {ingest_rate:>9.0f} {p50:>8.2f} {p99:>8.2f} {qps:>8.0f}")
+                client.delete_collection(COLLECTION)
+            except Exception as e:
+                print(f" {mode:<12} failed: {e}")
+            finally:
+                client.close()
+    finally:
+        if container:
+            subprocess.run(["docker", "stop", container], stdout=subprocess.DEVNULL)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
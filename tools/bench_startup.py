@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGETS = [
+    "src.strategies.cloud",
+    "src.strategies.local",
+    "src.memory",
+    "main",
+    "backend_api",
+]
+
+FIRST_REQUEST_SNIPPET = """
+import sys, time, json
+t0 = time.perf_counter()
+from src.strategies.cloud import CloudMatryoshkaStrategy
+from src.strategies.local import PrivateStrategy, OfflineStrategy
+from src.models import registry
+imported = time.perf_counter() - t0
+strategy = {{"cloud": CloudMatryoshkaStrategy, "local": PrivateStrategy, "fast": OfflineStrategy}}["{mode}"]()
+t1 = time.perf_counter()
+error = None
+try:
+    strategy.process({image!r}, "bench", user_context="startup benchmark")
+except Exception as e:
+    error = str(e)
+first = time.perf_counter() - t1
+print(json.dumps({{"import": imported, "first_request": first, "error": error, "models": registry.status()}}))
+"""
+
+
+def run_python(code):
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=root_path, capture_output=True, text=True
+    )
+    for line in reversed(out.stdout.strip().splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"error": (out.stderr.strip().splitlines() or ["no output"])[-1]}
+
+
+def measure_import(module):
+    code = (
+        "import time, json\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({'import': time.perf_counter() - t0}))\n"
+    )
+    return run_python(code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup and first-request latency per entry point")
+    parser.add_argument("--image", default=None, help="Image used for the first-request measurement")
+    parser.add_argument("--modes", default="cloud,local,fast")
+    args = parser.parse_args()
+
+    print(" Cold import time (fresh interpreter each):")
+    for module in IMPORT_TARGETS:
+        r = measure_import(module)
+        if "import" in r:
+            print(f"   {module:<24} {r['import'] * 1000:8.0f} ms")
+        else:
+            print(f"   {module:<24}   failed: {r['error']}")
+
+    print("\n First request per strategy (includes lazy model loads):")
+    for mode in args.modes.split(","):
+        r = run_python(FIRST_REQUEST_SNIPPET.format(mode=mode, image=args.image))
+        if "first_request" not in r:
+            print(f"   {mode:<8} failed: {r['error']}")
+            continue
+        loaded = {name: round(s["load_seconds"], 2) for name, s in r["models"].items() if s["load_seconds"]}
+        print(f"   {mode:<8} import {r['import'] * 1000:6.0f} ms | first request {r['first_request']:6.2f} s | loads {loaded}")
+        if r["error"]:
+            print(f"            (request error: {r['error']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,14 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from qdrant_client import QdrantClient
-
-DB_PATH = "qdrant_db"
+from src.qdrant_backend import get_client, backend_info
 
 print(f"--- Qdrant Diagnostic for Windows ---")
 print(f"Python Version: {sys.version}")
-print(f"Database Path: {os.path.abspath(DB_PATH)}")
+print(f"Backend: {backend_info()}")
 
 try:
-    client = QdrantClient(path=DB_PATH)
+    client = get_client()
 
     collections = client.get_collections().collections
     print(f" Connection Successful.")
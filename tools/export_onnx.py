@@ -0,0 +1,51 @@
+import os
+import sys
+import argparse
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.models import SIGLIP_MODEL, YOLO_WEIGHTS
+from src.onnx_backend import (
+    ONNX_DIR, SIGLIP_ONNX, onnx_path, export_siglip, export_yolo, quantize_int8,
+    collect_calibration_images, siglip_calibration_arrays, yolo_calibration_arrays
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export SigLIP / YOLO to ONNX and optionally quantize to int8")
+    parser.add_argument("--models", default="siglip,yolo")
+    parser.add_argument("--yolo-weights", default=YOLO_WEIGHTS)
+    parser.add_argument("--int8", action="store_true", help="Also write *.int8.onnx variants")
+    parser.add_argument("--method", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--calibration-dir", default="datasets")
+    parser.add_argument("--calibration-size", type=int, default=64)
+    args = parser.parse_args()
+
+    targets = args.models.split(",")
+    calibration = []
+    if args.int8 and args.method == "static":
+        calibration = collect_calibration_images(args.calibration_dir, args.calibration_size)
+        print(f" Calibration set: {len(calibration)} images from {args.calibration_dir}")
+
+    if "siglip" in targets:
+        from transformers import AutoProcessor, AutoModel
+        print(f" Loading SigLIP ({SIGLIP_MODEL})...")
+        processor = AutoProcessor.from_pretrained(SIGLIP_MODEL)
+        model = AutoModel.from_pretrained(SIGLIP_MODEL)
+        fp32 = export_siglip(model, onnx_path(SIGLIP_ONNX))
+        if args.int8:
+            quantize_int8(fp32, siglip_calibration_arrays(processor, calibration),
+                          onnx_path(SIGLIP_ONNX, int8=True), method=args.method)
+
+    if "yolo" in targets:
+        fp32 = export_yolo(args.yolo_weights, ONNX_DIR)
+        if args.int8:
+            quantize_int8(fp32, yolo_calibration_arrays(calibration),
+                          onnx_path(os.path.basename(fp32), int8=True), method=args.method)
+
+    print(f"\n Done. Set FELIX_INFERENCE_BACKEND=onnx{'-int8' if args.int8 else ''} to serve these files.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import argparse
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.qdrant_backend import get_client, backend_info
+from src.schema import COLLECTION_IMAGES
+from src.maintenance import (
+    DUPLICATE_THRESHOLD, RETENTION_RULES, collection_report, expire_incidents, find_duplicate_groups,
+    merge_duplicates, optimize_collection, parse_retention_rules, sample_queries
+)
+
+
+def print_report(label, report):
+    latency = f"p50 {report['p50_ms']:.2f} ms / p99 {report['p99_ms']:.2f} ms" if report["p50_ms"] is not None else "no queries"
+    print(f" {label:<7} {report['points']} points, {report['segments']} segments, {latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retention, near-duplicate merging and compaction for rail_safety_logs")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="Cosine similarity above which incidents merge")
+    parser.add_argument("--retention", default=RETENTION_RULES, help="e.g. 'severity=low:30,severity=medium:180,*:365'")
+    parser.add_argument("--skip-merge", action="store_true")
+    parser.add_argument("--skip-expire", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    client = get_client()
+    print(f" Qdrant backend: {backend_info()}")
+    queries = sample_queries(client)
+    before = collection_report(client, queries)
+
+    if not args.skip_expire:
+        expired = expire_incidents(client, parse_retention_rules(args.retention), dry_run=args.dry_run)
+        for rule, count in expired.items():
+            print(f"   expire {rule}: {count} points")
+
+    if not args.skip_merge:
+        groups, payloads = find_duplicate_groups(client, threshold=args.threshold)
+        removed = merge_duplicates(client, groups, payloads, dry_run=args.dry_run)
+        print(f"   merge: {len(groups)} near-duplicate groups, {removed} points folded into representatives")
+
+    if args.dry_run:
+        print_report("before", before)
+        return
+    if not optimize_collection(client):
+        print(f" Warning: '{COLLECTION_IMAGES}' still optimizing, latency below may not be final.")
+    print_report("before", before)
+    print_report("after", collection_report(client, queries))
+
+
+if __name__ == "__main__":
+    main()
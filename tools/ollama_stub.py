@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+ANSWER = {
+    "analysis": "Stub analysis.",
+    "severity": "Medium",
+    "advice": "Stub advice.",
+    "detected_issues": "Stub issue"
+}
+
+
+class OllamaStub(ThreadingHTTPServer):
+    """
+    Mimics Ollama's POST /api/generate (plain and streamed NDJSON) for tests
+    and benchmarks. Like Ollama, it runs `parallel` generations at once and
+    queues the rest. Every `invalid_every`-th answer is not valid JSON.
+    Counts connections and requests so clients can be checked for reuse.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.05, chunks=8, parallel=4, invalid_every=0):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.chunks = chunks
+        self.slots = threading.Semaphore(parallel)
+        self.invalid_every = invalid_every
+        self.lock = threading.Lock()
+        self.counts = {"connections": 0, "requests": 0, "with_system": 0, "with_keep_alive": 0}
+
+    def count(self, field):
+        with self.lock:
+            self.counts[field] += 1
+            return self.counts[field]
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, body):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        number = self.server.count("requests")
+        if request.get("system"):
+            self.server.count("with_system")
+        if request.get("keep_alive"):
+            self.server.count("with_keep_alive")
+        if not request.get("prompt"):
+            # A prompt-less call only loads the model.
+            self._send({"model": request.get("model"), "response": "", "done": True})
+            return
+
+        invalid = self.server.invalid_every and number % self.server.invalid_every == 0
+        answer = "{not json" if invalid else json.dumps(ANSWER)
+        with self.server.slots:
+            if not request.get("stream"):
+                time.sleep(self.server.latency)
+                self._send({"model": request.get("model"), "response": answer, "done": True,
+                            "prompt_eval_count": len(request["prompt"].split()), "eval_count": len(answer.split())})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            step = max(1, len(answer) // self.server.chunks)
+            for i in range(0, len(answer), step):
+                time.sleep(self.server.latency / self.server.chunks)
+                self._chunk({"response": answer[i:i + step], "done": False})
+            self._chunk({"response": "", "done": True, "eval_count": len(answer.split())})
+            self.wfile.write(b"0\r\n\r\n")
+
+
+def serve_in_thread(host="127.0.0.1", port=0, **options):
+    """Starts a stub on a free port in a daemon thread; call .shutdown() when done."""
+    server = OllamaStub((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama /api/generate server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per generation")
+    parser.add_argument("--parallel", type=int, default=4, help="Generations served at once")
+    parser.add_argument("--invalid-every", type=int, default=0, help="Every Nth answer is invalid JSON")
+    args = parser.parse_args()
+
+    server = OllamaStub((args.host, args.port), latency=args.latency, parallel=args.parallel,
+                        invalid_every=args.invalid_every)
+    print(f" Ollama stub listening on {server.url} (point FELIX_OLLAMA_HOST at it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f" {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
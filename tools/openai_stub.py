@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+ANSWER = json.dumps({
+    "detected_issues": "Stub issue",
+    "severity": "Medium",
+    "analysis": "Stub analysis.",
+    "advice": "Stub advice."
+})
+EMBED_DIM = 1536
+
+
+def stub_embedding(text, dim=EMBED_DIM):
+    """Deterministic unit vector per input text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class OpenAIStub(ThreadingHTTPServer):
+    """
+    Minimal OpenAI-compatible server: POST /chat/completions (plain and SSE
+    streamed) and POST /embeddings. Every `rate_limit_every`-th request is
+    answered 429 with a Retry-After header. Counts requests, connections and
+    embedding inputs so batching and retries can be checked from outside.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.05, embed_latency=0.01, rate_limit_every=0, retry_after=0.05):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.embed_latency = embed_latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.counts = {"connections": 0, "requests": 0, "rate_limited": 0, "chat": 0,
+                       "embedding_requests": 0, "embedding_inputs": 0}
+
+    def count(self, field, value=1):
+        with self.lock:
+            self.counts[field] += value
+            return self.counts[field]
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _event(self, data):
+        payload = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):X}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        number = self.server.count("requests")
+        if self.server.rate_limit_every and number % self.server.rate_limit_every == 0:
+            self.server.count("rate_limited")
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                       {"Retry-After": str(self.server.retry_after)})
+            return
+        if self.path.endswith("/embeddings"):
+            self._embeddings(request)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(request)
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def _embeddings(self, request):
+        inputs = request.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        self.server.count("embedding_requests")
+        self.server.count("embedding_inputs", len(inputs))
+        time.sleep(self.server.embed_latency)
+        tokens = sum(len(text.split()) for text in inputs)
+        self._send(200, {
+            "object": "list",
+            "model": request.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": stub_embedding(text)}
+                     for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    def _chat(self, request):
+        self.server.count("chat")
+        time.sleep(self.server.latency)
+        prompt_tokens = sum(len(str(m.get("content")).split()) for m in request.get("messages", []))
+        completion_tokens = len(ANSWER.split())
+        if not request.get("stream"):
+            self._send(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": ANSWER}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(ANSWER), 16):
+            self._event(json.dumps({
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "delta": {"content": ANSWER[i:i + 16]}, "finish_reason": None}]
+            }))
+        self._event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve_in_thread(host="127.0.0.1", port=0, **options):
+    """Starts a stub on a free port in a daemon thread; call .shutdown() when done."""
+    server = OpenAIStub((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="openai-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat/embeddings server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per chat completion")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    args = parser.parse_args()
+
+    server = OpenAIStub((args.host, args.port), latency=args.latency, rate_limit_every=args.rate_limit_every)
+    print(f" OpenAI stub listening on {server.url} (point FELIX_OPENAI_BASE_URL at it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f" {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+
+from PIL import Image
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.concurrency import model_pool
+from src.detector import DetectorService
+from src.image_input import ImageInput
+
+COLORS = {(255, 0, 0): 0, (0, 255, 0): 1, (0, 0, 255): 2, (255, 255, 0): 3}
+
+
+class RacyYOLO:
+    """Keeps the current batch on the instance like the Ultralytics predictor does."""
+    names = {0: "red", 1: "green", 2: "blue", 3: "yellow"}
+
+    def predict(self, images, **_):
+        self._batch = images
+        time.sleep(0.02)
+        return [SimpleNamespace(boxes=SimpleNamespace(cls=[COLORS[im.getpixel((0, 0))]])) for im in self._batch]
+
+
+def test_concurrent_requests_get_their_own_labels():
+    service = DetectorService(weights={"check": "check.pt"}, half=False)
+    service._models["check.pt"] = RacyYOLO()
+    requests = [ImageInput.from_image(Image.new("RGB", (32, 32), color), name=str(color))
+                for color in list(COLORS) * 4]
+
+    async def analyze_all():
+        # The same path as backend_api.detect_objects: one model_pool call per request.
+        return await asyncio.gather(*(model_pool.run(service.labels, "check", [r]) for r in requests))
+
+    results = asyncio.run(analyze_all())
+    for request, labels in zip(requests, results):
+        assert labels == [[RacyYOLO.names[COLORS[request.image.getpixel((0, 0))]]]], (request.name, labels)
+    assert service.stats()["detectors"]["check"]["calls"] == len(requests)
+    print(f" OK: {len(requests)} concurrent requests each got their own labels")
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_get_their_own_labels()
@@ -0,0 +1,57 @@
+import os
+import sys
+import math
+import time
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from qdrant_client import QdrantClient, models
+from src.maintenance import find_duplicate_groups, merge_duplicates
+
+COLLECTION = "duplicates_check"
+# A point 10 degrees away is a duplicate, 20 degrees is not.
+THRESHOLD = math.cos(math.radians(15))
+
+
+def incident(point_id, degrees, severity="low", status="DANGER"):
+    angle = math.radians(degrees)
+    payload = {"timestamp": time.time() - point_id, "severity": severity, "status": status}
+    return models.PointStruct(id=point_id, vector={"offline_lane": [math.cos(angle), math.sin(angle)]}, payload=payload)
+
+
+def collection_with(points):
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        COLLECTION, vectors_config={"offline_lane": models.VectorParams(size=2, distance=models.Distance.COSINE)}
+    )
+    client.upsert(COLLECTION, points, wait=True)
+    return client
+
+
+def test_non_transitive_triple():
+    # 1~2 and 2~3, but 1 and 3 are 20 degrees apart: 3 must not be folded into 1.
+    client = collection_with([incident(1, 0), incident(2, 10), incident(3, 20)])
+    groups, payloads = find_duplicate_groups(client, collection=COLLECTION, threshold=THRESHOLD)
+    assert groups == [[1, 2]], groups
+
+    assert merge_duplicates(client, groups, payloads, collection=COLLECTION) == 1
+    left = {p.id: p.payload for p in client.scroll(COLLECTION, limit=10)[0]}
+    assert set(left) == {1, 3}
+    assert left[1]["occurrences"] == 2
+    print(" OK: non-transitive triple grouped around its representative")
+
+
+def test_different_severity_or_status_is_not_merged():
+    client = collection_with([
+        incident(1, 0), incident(2, 5, severity="High"), incident(3, 5, status="SAFE"), incident(4, 5, severity="Low")
+    ])
+    groups, _ = find_duplicate_groups(client, collection=COLLECTION, threshold=THRESHOLD)
+    # 4 only differs in the casing of a legacy severity.
+    assert groups == [[1, 4]], groups
+    print(" OK: near-identical images with different severity or status kept apart")
+
+
+if __name__ == "__main__":
+    test_non_transitive_triple()
+    test_different_severity_or_status_is_not_merged()
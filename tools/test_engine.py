@@ -7,7 +7,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.memory import MemorySystem
 import uuid
 def simulate_test():
-    memory = MemorySystem(path="qdrant_db")
+    memory = MemorySystem()
     print(" Memory System Connected.")
     fake_siglip_vector = np.random.randn(768)
     fake_siglip_vector /= np.linalg.norm(fake_siglip_vector)
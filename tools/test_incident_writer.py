@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import uuid
+import sqlite3
+import tempfile
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src import incident_writer
+from src.incident_writer import IncidentWriter, incident_record
+
+# Above the Linux pid_max ceiling (2^22), so never a live process.
+DEAD_PID = 4194305
+
+
+class FakeClient:
+    def __init__(self):
+        self.points = []
+
+    def upsert(self, collection_name, points, wait=True):
+        self.points.extend(points)
+
+
+class FakeMemory:
+    collection_images = "rail_safety_logs"
+    fast_prefixes = ()
+
+    def __init__(self):
+        self.client = FakeClient()
+
+    def rules_for(self, summaries):
+        return {summary: [] for summary in summaries}
+
+    def _pad_vector(self, vector, size):
+        return list(vector) + [0.0] * (size - len(vector))
+
+
+def journaled(path, count):
+    """A journal as a crashed worker leaves it: `count` incidents that never reached Qdrant."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS pending (seq INTEGER PRIMARY KEY AUTOINCREMENT, record TEXT)")
+    ids = []
+    for _ in range(count):
+        result = {"analysis": json.dumps({"severity": "High", "detected_issues": "Broken rail"})}
+        record = incident_record(str(uuid.uuid4()), "local", [0.1] * 8, ["crack"], result)
+        conn.execute("INSERT INTO pending (record) VALUES (?)", (json.dumps(record),))
+        ids.append(record["id"])
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def test_journals_left_behind_are_replayed_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "incident_journal.sqlite")
+        legacy = journaled(base, 2)
+        dead_worker = journaled(os.path.join(tmp, f"incident_journal.{DEAD_PID}.sqlite"), 3)
+
+        memory = FakeMemory()
+        writer = IncidentWriter(memory, batch_size=2, journal_path=base)
+        writer.start()
+        assert writer.pending() == 5
+        writer.close()
+
+        assert sorted(str(p.id) for p in memory.client.points) == sorted(legacy + dead_worker)
+        assert all(len(p.vector["offline_lane"]) == 768 for p in memory.client.points)
+        assert writer.pending() == 0
+        leftovers = [name for name in os.listdir(tmp) if not name.endswith(".lock")]
+        assert leftovers == [], leftovers
+        print(" OK: legacy and dead-worker journals replayed and removed")
+
+
+def test_second_worker_does_not_replay():
+    if incident_writer.fcntl is None:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "incident_journal.sqlite")
+        journaled(base, 2)
+        owner = IncidentWriter(FakeMemory(), journal_path=base)
+        assert owner._own_replay()
+        # flock() conflicts between two open handles even within one process.
+        other = IncidentWriter(FakeMemory(), journal_path=base)
+        assert not other._own_replay()
+        owner._replay_lock.close()
+        print(" OK: only the lock holder replays")
+
+
+if __name__ == "__main__":
+    test_journals_left_behind_are_replayed_once()
+    test_second_worker_does_not_replay()
@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.ingest_manifest import IngestManifest, content_point_id, file_sha256
+
+
+def write(path, data, mtime_ns=None):
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def ingest(manifest, kind, path, point_count=1):
+    """What bulk_ingest does for one file: check, then record once its points are stored."""
+    state = manifest.check(path)
+    return state, (manifest.record(kind, state, point_count) if state else None)
+
+
+def test_change_detection():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = IngestManifest(os.path.join(tmp, "manifest.sqlite"))
+        image = os.path.join(tmp, "rail.jpg")
+        write(image, b"first", mtime_ns=1_000_000_000)
+
+        state, obsolete = ingest(manifest, "image", image)
+        assert state is not None and state.sha256 == file_sha256(image) and obsolete == []
+        # Unchanged: skipped on stat() alone.
+        assert manifest.stat_changed(image) is None and manifest.check(image) is None
+
+        # Touched but identical: no re-ingestion, and the new mtime is remembered.
+        write(image, b"first", mtime_ns=2_000_000_000)
+        assert manifest.check(image) is None
+        assert manifest.stat_changed(image) is None
+
+        # Edited: ingested again, and the previous version's point is reported obsolete.
+        old_id = content_point_id(state.sha256)
+        write(image, b"second", mtime_ns=3_000_000_000)
+        state, obsolete = ingest(manifest, "image", image)
+        assert state is not None and obsolete == [old_id]
+        assert manifest.check(image) is None
+        print(" OK: new, touched and edited files detected")
+
+
+def test_shared_content_is_not_obsolete():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = IngestManifest(os.path.join(tmp, "manifest.sqlite"))
+        first, copy = os.path.join(tmp, "a.jpg"), os.path.join(tmp, "b.jpg")
+        write(first, b"same")
+        write(copy, b"same")
+        ingest(manifest, "image", first)
+        ingest(manifest, "image", copy)
+
+        write(first, b"edited", mtime_ns=5_000_000_000)
+        _, obsolete = ingest(manifest, "image", first)
+        # b.jpg still holds the old content, so its point stays.
+        assert obsolete == []
+        print(" OK: content still held by another file is kept")
+
+
+def test_removal_of_deleted_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = IngestManifest(os.path.join(tmp, "manifest.sqlite"))
+        kept, deleted = os.path.join(tmp, "kept.pdf"), os.path.join(tmp, "deleted.pdf")
+        write(kept, b"rulebook")
+        write(deleted, b"old circular")
+        ingest(manifest, "document", kept, point_count=2)
+        state, _ = ingest(manifest, "document", deleted, point_count=3)
+
+        os.remove(deleted)
+        removed = manifest.remove_missing("document", {kept})
+        assert removed == sorted(content_point_id(state.sha256, i) for i in range(3))
+        assert manifest.count("document") == 1
+        assert manifest.remove_missing("document", {kept}) == []
+        # Other kinds are untouched by a document sweep.
+        assert manifest.remove_missing("image", set()) == []
+        print(" OK: deleted files forgotten with all their chunk points")
+
+
+if __name__ == "__main__":
+    test_change_detection()
+    test_shared_content_is_not_obsolete()
+    test_removal_of_deleted_files()
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.llm_cache import LLMCache
+
+SEVERE = '{"severity": "High", "advice": "Stop traffic, replace the rail section."}'
+
+
+def same_direction(text):
+    """What bge-small does to short negated contexts: practically the same vector."""
+    return np.ones(8, dtype=np.float32) / np.sqrt(8)
+
+
+def test_negated_context_is_not_served_by_default():
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return same_direction(text)
+
+    cache = LLMCache(path=None, embed_fn=embed)
+    _, vector = cache.get("ollama", "v1", "crack", "crack on rail")
+    cache.set("ollama", "v1", "crack", "crack on rail", SEVERE, vector)
+
+    value, _ = cache.get("ollama", "v1", "crack", "no crack on rail")
+    assert value is None, "a negated context was served the cached answer"
+    assert calls == [], "the semantic tier must stay off unless a threshold is set"
+    assert cache.get("ollama", "v1", "crack", "Crack  on RAIL")[0] == SEVERE
+    print(" OK: negated context misses, exact (normalized) context hits")
+
+
+def test_opt_in_threshold_is_what_enables_semantic_reuse():
+    cache = LLMCache(path=None, threshold=0.95, embed_fn=same_direction)
+    _, vector = cache.get("ollama", "v1", "crack", "crack on rail")
+    cache.set("ollama", "v1", "crack", "crack on rail", SEVERE, vector)
+    # The reason it is opt-in: with a threshold the negation is a hit.
+    assert cache.get("ollama", "v1", "crack", "no crack on rail")[0] == SEVERE
+    print(" OK: semantic reuse only with an explicit threshold")
+
+
+if __name__ == "__main__":
+    test_negated_context_is_not_served_by_default()
+    test_opt_in_threshold_is_what_enables_semantic_reuse()
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import asyncio
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from src.cache import LRUCache, ResultCache
+
+
+def test_lru_ttl_and_eviction():
+    cache = LRUCache(max_items=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "a" was just used, so "b" is the least recent one and goes first.
+    cache.set("c", 3)
+    assert cache.get("b", None) is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    time.sleep(0.06)
+    assert cache.get("a", None) is None
+    assert len(cache) == 1
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    cache = ResultCache(max_items=16, ttl=60, cache_dir=None)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "vector"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("siglip", "digest", compute) for _ in range(8)))
+
+    assert asyncio.run(run()) == ["vector"] * 8
+    assert len(calls) == 1
+    counters = cache.stats()["stages"]["siglip"]
+    assert counters["misses"] == 1 and counters["coalesced"] == 7
+    assert cache.lookup("siglip", "digest") == "vector"
+
+
+def test_cacheable_veto():
+    cache = ResultCache(max_items=16, ttl=60, cache_dir=None)
+
+    async def failed():
+        return None
+
+    asyncio.run(cache.get_or_compute("siglip", "digest", failed, cacheable=lambda v: v is not None))
+    assert cache.lookup("siglip", "digest", default="absent") == "absent"
+
+
+def test_cancelled_leader_hands_over_to_waiters():
+    cache = ResultCache(max_items=16, ttl=60, cache_dir=None)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "analysis"
+
+    async def run():
+        leader = asyncio.ensure_future(cache.get_or_compute("analysis", "key", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get_or_compute("analysis", "key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        return leader, results
+
+    leader, results = asyncio.run(run())
+    assert leader.cancelled()
+    assert results == ["analysis"] * 3
+    # The leader's computation was abandoned; exactly one waiter redid it.
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    test_lru_ttl_and_eviction()
+    test_single_flight_coalesces_concurrent_misses()
+    test_cacheable_veto()
+    test_cancelled_leader_hands_over_to_waiters()
+    print(" OK: result cache")
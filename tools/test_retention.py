@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import time
+import uuid
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_path)
+
+from qdrant_client import QdrantClient, models
+from src.incident_writer import incident_record
+from src.maintenance import expire_incidents, parse_retention_rules
+
+COLLECTION = "retention_check"
+
+
+def aged_incident(severity, days, severity_in_payload=None):
+    """An incident_record() as the writer stores it, `days` old."""
+    result = {"analysis": json.dumps({"severity": severity, "detected_issues": "Loose fishplate"})}
+    record = incident_record(str(uuid.uuid4()), "local", [0.1] * 8, ["bolt"], result)
+    payload = dict(record["payload"], timestamp=time.time() - days * 86400)
+    if severity_in_payload:
+        payload["severity"] = severity_in_payload
+    return models.PointStruct(id=record["id"], vector={"offline_lane": [0.1] * 8}, payload=payload)
+
+
+def test_aged_low_incident_expires():
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        COLLECTION, vectors_config={"offline_lane": models.VectorParams(size=8, distance=models.Distance.COSINE)}
+    )
+    low_old = aged_incident("Low", 45)
+    low_recent = aged_incident("Low", 5)
+    high_old = aged_incident("High", 400)
+    # Written before incident_record normalized the LLM's casing.
+    legacy_low = aged_incident("Low", 45, severity_in_payload="Low")
+    client.upsert(COLLECTION, [low_old, low_recent, high_old, legacy_low], wait=True)
+
+    assert low_old.payload["severity"] == "low"
+    removed = expire_incidents(client, parse_retention_rules(), collection=COLLECTION)
+    print(f" expired: {removed}")
+
+    left = {p.id for p in client.scroll(COLLECTION, limit=10)[0]}
+    assert low_old.id not in left, "aged Low incident was not expired"
+    assert legacy_low.id not in left, "aged legacy 'Low' incident was not expired"
+    assert low_recent.id in left and high_old.id in left
+    print(" OK: aged Low incidents expired, recent and High ones kept")
+
+
+if __name__ == "__main__":
+    test_aged_low_incident_expires()